@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite — throughput of every simulator stage at growing stream lengths.
+Usage:  python benchmark.py [--bench 'engine.*'] [--sizes 1000,10000,...] [--baseline base.json]
+                            [--save-baseline] [--require-baseline] [--tolerance 0.25]
+
+Each benchmark is timed at every size (1k → 10M items by default) so
+non-linear scaling shows up as falling throughput.  Input generation is
+excluded from the timings.  Results are written as JSON; with a baseline,
+any (benchmark, size) whose throughput fell by more than --tolerance is a
+regression and the exit status is 1.
+Without a baseline file the check is skipped and says so; the exit status
+is then 0, or 2 with --require-baseline (for CI, where a missing baseline
+must not pass silently).
+"""
+
+import sys, os, argparse, fnmatch, json, math, platform, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from pdr_engine import KalmanFilter, OrientationEstimator, PDREngine, SensorBatch, StepDetector
+import path_simulator as ps
+from validator import validate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+DEFAULT_OUT = os.path.join(RESULTS_DIR, "benchmark.json")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "benchmark_baseline.json")
+SCHEMA_VERSION = 1
+
+# Streams are fed in chunks of this many samples (memory stays flat at 10M).
+_CHUNK = 1 << 16
+# Small sizes are repeated until this much time has been spent; best run wins.
+_MIN_TIME_S = 0.2
+
+
+# ---------------------------------------------------------------------------
+# Inputs
+# ---------------------------------------------------------------------------
+
+_BASE: Optional[SensorBatch] = None
+
+
+def _base_stream() -> SensorBatch:
+    """One chunk of walking with turns, generated once per process."""
+    global _BASE
+    if _BASE is None:
+        legs = [(h, 40.0) for h in (0.0, math.pi / 2, math.pi, 3 * math.pi / 2)] * 8
+        _BASE = ps.simulate_legs_batch(legs, rng=np.random.default_rng(0))[0][:_CHUNK]
+    return _BASE
+
+
+def stream_chunks(n: int) -> Iterator[SensorBatch]:
+    """*n* samples of continuous walking, as chunks with increasing timestamps."""
+    base = _base_stream()
+    span = int(base.timestamp[-1]) + ps.DT_NS
+    for k, lo in enumerate(range(0, n, len(base))):
+        part = base[:min(len(base), n - lo)]
+        yield SensorBatch(part.timestamp + k * span, part.acc, part.gyro, part.mag)
+
+
+def _trajectory(n: int) -> np.ndarray:
+    """*n* noisy points around the 40 × 40 m loop."""
+    rng = np.random.default_rng(0)
+    return _loop(np.linspace(0, 160, n, endpoint=False)) + rng.normal(0, 1.0, (n, 2))
+
+
+def _loop(s: np.ndarray) -> np.ndarray:
+    """Point at arclength *s* around the 40 m square starting at the origin."""
+    leg, u = np.divmod(s, 40.0)
+    x = np.select([leg == 0, leg == 1, leg == 2], [0 * u, u, 40.0 + 0 * u], 40.0 - u)
+    y = np.select([leg == 0, leg == 1, leg == 2], [u, 40.0 + 0 * u, 40.0 - u], 0 * u)
+    return np.column_stack((x, y))
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks — each takes a size and returns the timed seconds
+# ---------------------------------------------------------------------------
+
+def bench_step_detector_stream(n: int) -> float:
+    det = StepDetector()
+    elapsed = 0.0
+    for chunk in stream_chunks(n):
+        ts = chunk.timestamp.tolist()
+        acc = chunk.acc.tolist()
+        t0 = time.perf_counter()
+        for (x, y, z), t in zip(acc, ts):
+            det.on_accelerometer_update(x, y, z, t)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_step_detector_batch(n: int) -> float:
+    det = StepDetector()
+    elapsed = 0.0
+    for chunk in stream_chunks(n):
+        t0 = time.perf_counter()
+        det.detect_batch(chunk.acc, chunk.timestamp)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_orientation_update(n: int) -> float:
+    est = OrientationEstimator()
+    elapsed = 0.0
+    for chunk in stream_chunks(n):
+        samples = list(chunk.as_samples())
+        t0 = time.perf_counter()
+        for s in samples:
+            est.update(s)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_kalman_update(n: int) -> float:
+    kf = KalmanFilter()
+    rng = np.random.default_rng(0)
+    elapsed = 0.0
+    for lo in range(0, n, _CHUNK):
+        values = rng.normal(0, 1, min(_CHUNK, n - lo)).tolist()
+        t0 = time.perf_counter()
+        for v in values:
+            kf.update(v)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_kalman_series(n: int) -> float:
+    kf = KalmanFilter()
+    rng = np.random.default_rng(0)
+    elapsed = 0.0
+    for lo in range(0, n, _CHUNK):
+        values = rng.normal(0, 1, min(_CHUNK, n - lo))
+        t0 = time.perf_counter()
+        kf.filter_series(values)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_fusion(n: int) -> float:
+    from fusion import FusionEngine, VIOStream
+    engine = FusionEngine()
+    rng = np.random.default_rng(0)
+    elapsed = 0.0
+    for lo in range(0, n, _CHUNK):
+        c = min(_CHUNK, n - lo)
+        t = (lo + np.arange(c)) / 30.0
+        truth = np.column_stack((10 * np.cos(t / 20), 10 * np.sin(t / 20)))
+        # Two-second dropout every minute.
+        tracking = (t % 60) >= 2
+        vio = VIOStream((t * 1e9).astype(np.int64), truth + rng.normal(0, 0.05, (c, 2)),
+                        tracking, truth, np.empty(0, dtype=np.int64))
+        pdr = truth + rng.normal(0, 0.01, (c, 2))
+        t0 = time.perf_counter()
+        engine.run(vio, pdr)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_particle_filter(n: int) -> float:
+    from map_matching import GarageMap, synthetic_garage
+    from particle_filter import ParticleFilter
+    walls = GarageMap.from_dict(synthetic_garage(1, 10, 10)).wall_grid("B1")
+    pf = ParticleFilter(1000, walls, rng=np.random.default_rng(0))
+    pf.reset((72.0, 72.0))
+    # Laps of one 16 m block (23 steps per side).
+    headings = np.repeat([0.0, np.pi / 2, np.pi, 3 * np.pi / 2], 23)
+    headings = np.resize(headings, n)
+    t0 = time.perf_counter()
+    pf.run(np.full(n, 0.7), headings)
+    return time.perf_counter() - t0
+
+
+def bench_engine_stream(n: int) -> float:
+    engine = PDREngine()
+    elapsed = 0.0
+    for chunk in stream_chunks(n):
+        samples = list(chunk.as_samples())
+        t0 = time.perf_counter()
+        for s in samples:
+            engine.on_sensor_update(s)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def bench_engine_batch(n: int) -> float:
+    engine = PDREngine()
+    elapsed = 0.0
+    for chunk in stream_chunks(n):
+        t0 = time.perf_counter()
+        engine.process_batch(chunk)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def _seconds(n: int) -> float:
+    return n / ps.SAMPLE_RATE
+
+
+def _walk_distance(n: int) -> float:
+    """Distance whose straight walk yields about *n* samples at 0.7 m steps."""
+    return _seconds(n) * ps.WALK_FREQ * 0.7
+
+
+# name -> (n, suffix, rng) -> call of simulate_<name><suffix> producing about n samples.
+_GENERATORS: Dict[str, Callable[[int, str, np.random.Generator], Callable[[], object]]] = {
+    "straight": lambda n, sfx, rng: lambda: getattr(ps, "simulate_straight" + sfx)(
+        _walk_distance(n), 0.0, rng=rng),
+    "turn": lambda n, sfx, rng: lambda: getattr(ps, "simulate_turn" + sfx)(
+        0.0, math.pi / 2, _seconds(n), rng=rng),
+    "l_shape": lambda n, sfx, rng: lambda: getattr(ps, "simulate_l_shape" + sfx)(
+        _walk_distance(n) / 2, _walk_distance(n) / 2, rng=rng),
+    "rectangle": lambda n, sfx, rng: lambda: getattr(ps, "simulate_rectangle" + sfx)(
+        _walk_distance(n) / 4, _walk_distance(n) / 4, rng=rng),
+    "stationary": lambda n, sfx, rng: lambda: getattr(ps, "simulate_stationary" + sfx)(
+        _seconds(n), rng=rng),
+    "parking_scenario": lambda n, sfx, rng: lambda: getattr(ps, "simulate_parking_scenario" + sfx)(
+        rng=rng),
+}
+
+
+def _bench_generator(name: str, suffix: str) -> Callable[[int], float]:
+    def run(n: int) -> float:
+        fn = _GENERATORS[name](n, suffix, np.random.default_rng(0))
+        t0 = time.perf_counter()
+        fn()
+        return time.perf_counter() - t0
+    return run
+
+
+def bench_validate(n: int) -> float:
+    traj = _trajectory(n)
+    gt = _loop(np.linspace(0, 160, 4001))
+    t0 = time.perf_counter()
+    validate("bench", traj, gt, n, 160.0, 5.0)
+    return time.perf_counter() - t0
+
+
+def bench_plot_trajectory(n: int) -> float:
+    from visualizer import plot_trajectory
+
+    traj = [tuple(p) for p in _trajectory(n).tolist()]
+    gt = [tuple(p) for p in _loop(np.arange(0, 161, 40.0)).tolist()]
+    t0 = time.perf_counter()
+    path = plot_trajectory("bench", traj, gt, 0.0, filename="_benchmark.png")
+    elapsed = time.perf_counter() - t0
+    os.remove(path)
+    return elapsed
+
+
+@dataclass
+class Benchmark:
+    name: str
+    run: Callable[[int], float]
+    unit: str = "samples"
+    max_n: Optional[int] = None       # larger sizes are skipped
+    fixed_n: Optional[int] = None     # size-independent workload of this many items
+
+
+def _parking_samples() -> int:
+    return len(ps.simulate_parking_scenario_batch(rng=np.random.default_rng(0))[0])
+
+
+def _benchmarks() -> List[Benchmark]:
+    benches = [
+        Benchmark("step_detector.stream", bench_step_detector_stream),
+        Benchmark("step_detector.batch", bench_step_detector_batch),
+        Benchmark("orientation.update", bench_orientation_update),
+        Benchmark("kalman.update", bench_kalman_update, unit="measurements"),
+        Benchmark("kalman.filter_series", bench_kalman_series, unit="measurements"),
+        Benchmark("fusion.engine", bench_fusion, unit="frames"),
+        Benchmark("particle_filter.step", bench_particle_filter, unit="steps", max_n=10_000),
+        Benchmark("engine.on_sensor_update", bench_engine_stream),
+        Benchmark("engine.process_batch", bench_engine_batch),
+    ]
+    parking = _parking_samples()
+    for name in _GENERATORS:
+        fixed = parking if name == "parking_scenario" else None
+        benches.append(Benchmark(f"simulate.{name}_batch", _bench_generator(name, "_batch"),
+                                 fixed_n=fixed))
+        # The list wrappers materialise one SensorData per sample.
+        benches.append(Benchmark(f"simulate.{name}", _bench_generator(name, ""),
+                                 max_n=1_000_000, fixed_n=fixed))
+    benches += [
+        Benchmark("validator.validate", bench_validate, unit="points"),
+        Benchmark("visualizer.plot_trajectory", bench_plot_trajectory, unit="points",
+                  max_n=1_000_000),
+    ]
+    return benches
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Measurement:
+    bench: str
+    n: int
+    seconds: float
+    rate: float  # items per second
+    unit: str
+    repeats: int
+
+
+def measure(bench: Benchmark, n: int, repeat: int = 5) -> Measurement:
+    """Best of up to *repeat* runs; stops repeating once _MIN_TIME_S is spent."""
+    best = math.inf
+    spent = 0.0
+    runs = 0
+    while runs < repeat and (runs == 0 or spent < _MIN_TIME_S):
+        t = bench.run(n)
+        best = min(best, t)
+        spent += t
+        runs += 1
+    best = max(best, 1e-9)
+    return Measurement(bench.name, n, best, n / best, bench.unit, runs)
+
+
+def run_benchmarks(patterns: Optional[Sequence[str]] = None,
+                   sizes: Sequence[int] = DEFAULT_SIZES, repeat: int = 5,
+                   max_seconds: float = 60.0, log=print) -> List[Measurement]:
+    """Run every benchmark matching *patterns* at each size.
+
+    A size is skipped when the previous size's throughput predicts it would
+    take longer than *max_seconds*.
+    """
+    out = []
+    for bench in _benchmarks():
+        if patterns and not any(fnmatch.fnmatch(bench.name, p) for p in patterns):
+            continue
+        todo = [bench.fixed_n] if bench.fixed_n else \
+            [n for n in sizes if bench.max_n is None or n <= bench.max_n]
+        rate = None
+        for n in todo:
+            if rate is not None and n / rate > max_seconds:
+                log(f"  {bench.name:<32} n={n:<10,} skipped (~{n / rate:.0f} s)")
+                break
+            m = measure(bench, n, repeat)
+            rate = m.rate
+            log(f"  {bench.name:<32} n={n:<10,} {m.rate:>14,.0f} {m.unit}/s")
+            out.append(m)
+    return out
+
+
+def to_json(results: Sequence[Measurement]) -> Dict:
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": [asdict(m) for m in results],
+    }
+
+
+def save(path: str, results: Sequence[Measurement]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(to_json(results), f, indent=2)
+
+
+def load(path: str) -> List[Measurement]:
+    with open(path) as f:
+        data = json.load(f)
+    return [Measurement(**r) for r in data["results"]]
+
+
+@dataclass
+class Comparison:
+    bench: str
+    n: int
+    rate: float
+    baseline_rate: float
+    tolerance: float
+
+    @property
+    def ratio(self) -> float:
+        return self.rate / self.baseline_rate
+
+    @property
+    def regressed(self) -> bool:
+        return self.ratio < 1.0 - self.tolerance
+
+
+def compare(results: Sequence[Measurement], baseline: Sequence[Measurement],
+            tolerance: float = 0.25) -> List[Comparison]:
+    """Pair up (benchmark, size) entries present in both runs."""
+    base = {(m.bench, m.n): m.rate for m in baseline}
+    return [Comparison(m.bench, m.n, m.rate, base[(m.bench, m.n)], tolerance)
+            for m in results if (m.bench, m.n) in base]
+
+
+def format_table(results: Sequence[Measurement]) -> str:
+    """Throughput per benchmark and size, plus per-item cost growth.
+
+    'scale' is the per-item cost at the largest size divided by the cost at
+    the smallest size of at least 10k (1.0 = linear).
+    """
+    sizes = sorted({m.n for m in results})
+    by_bench: Dict[str, Dict[int, Measurement]] = {}
+    for m in results:
+        by_bench.setdefault(m.bench, {})[m.n] = m
+    header = f"{'benchmark':<32}" + "".join(f"{_short(n):>10}" for n in sizes) + f"{'scale':>8}"
+    lines = [header, "-" * len(header)]
+    for name, row in by_bench.items():
+        cells = "".join(f"{_short(row[n].rate) + '/s' if n in row else '':>10}" for n in sizes)
+        ref = [n for n in sorted(row) if n >= 10_000] or sorted(row)
+        scale = row[ref[0]].rate / row[max(row)].rate if len(row) > 1 else 1.0
+        lines.append(f"{name:<32}{cells}{scale:>7.2f}x")
+    return "\n".join(lines)
+
+
+def _short(x: float) -> str:
+    for div, suffix in ((1e9, "G"), (1e6, "M"), (1e3, "k")):
+        if x >= div:
+            return f"{x / div:.3g}{suffix}"
+    return f"{x:.3g}"
+
+
+def format_comparison(comparisons: Sequence[Comparison]) -> str:
+    lines = []
+    for c in comparisons:
+        flag = "REGRESSED" if c.regressed else "ok"
+        lines.append(f"  {c.bench:<32} n={c.n:<10,} {c.ratio * 100:>6.1f}% of baseline  {flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Simulator pipeline benchmarks")
+    ap.add_argument("--bench", action="append", metavar="PATTERN",
+                    help="only run benchmarks matching this glob (repeatable)")
+    ap.add_argument("--sizes", type=lambda s: [int(float(x)) for x in s.split(",")],
+                    default=list(DEFAULT_SIZES), help="comma-separated stream lengths")
+    ap.add_argument("--repeat", type=int, default=5, help="max runs per size (best is kept)")
+    ap.add_argument("--max-seconds", type=float, default=60.0,
+                    help="skip sizes predicted to take longer than this")
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--require-baseline", action="store_true",
+                    help="exit with 2 when there is no baseline to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="allowed fractional throughput drop vs baseline")
+    args = ap.parse_args(argv)
+
+    print(f"Benchmarking (sizes {', '.join(_short(n) for n in args.sizes)})")
+    results = run_benchmarks(args.bench, args.sizes, args.repeat, args.max_seconds)
+    print()
+    print(format_table(results))
+    save(args.out, results)
+    print(f"\nResults saved to: {args.out}")
+
+    if args.save_baseline:
+        save(args.baseline, results)
+        print(f"Baseline saved to: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}: regression check SKIPPED "
+              f"(create one with --save-baseline)")
+        return 2 if args.require_baseline else 0
+
+    comparisons = compare(results, load(args.baseline), args.tolerance)
+    regressions = [c for c in comparisons if c.regressed]
+    print(f"\nBaseline {args.baseline} (tolerance {args.tolerance * 100:.0f}%):")
+    print(format_comparison(comparisons))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Parameter calibration — searches Weinberg K, peak threshold, step interval
+and complementary-filter alpha over a fixed set of sensor streams.
+Usage:  python calibration.py [--method coord|grid] [--seeds 3] [--workers 4] [--out best.json] [--cache]
+
+Every stream is generated once and shipped to each worker once (pool
+initializer); candidates are then scored against the same data.  Score is
+the mean of metric / threshold over all cases (lower is better).  The best
+config is written as JSON; load it with PDREngine(PDRConfig.load(path)).
+"""
+
+import sys, os, argparse, itertools
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, astuple, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pdr_engine import PDRConfig, PDREngine, SensorBatch
+from path_simulator import SAMPLE_RATE
+from scenarios import SCENARIOS, run_seed
+from stream_cache import DEFAULT_CACHE_DIR, StreamCache
+from validator import validate
+
+DEFAULT_GRID: Dict[str, List] = {
+    "weinberg_k": [0.40, 0.425, 0.45, 0.475, 0.50, 0.525, 0.55, 0.575, 0.60],
+    "peak_threshold": [0.8, 1.0, 1.2, 1.4, 1.6],
+    "min_step_interval_ns": [250_000_000, 300_000_000, 350_000_000, 400_000_000],
+    "alpha": [0.95, 0.96, 0.97, 0.98, 0.99],
+}
+
+
+@dataclass
+class CalibrationCase:
+    name: str
+    batch: SensorBatch
+    ground_truth: List[Tuple[float, float]]
+    total_distance: float
+    threshold: float
+    metric: str = "endpoint_error"
+    sample_rate: float = SAMPLE_RATE    # Hz of *batch*; overrides the config's
+
+
+@dataclass
+class CalibrationResult:
+    config: PDRConfig
+    score: float
+    passed: int
+    metric_values: np.ndarray  # one per case
+
+    @property
+    def total(self) -> int:
+        return len(self.metric_values)
+
+
+def scenario_cases(seeds: int = 1, master_seed: int = 0,
+                   scenario_names: Optional[Sequence[str]] = None,
+                   cache_dir: Optional[str] = None) -> List[CalibrationCase]:
+    """Generate each catalogue scenario under *seeds* independent seeds.
+
+    With *cache_dir* the streams are memory-mapped from a StreamCache and
+    reach the workers as file paths rather than pickled arrays.
+    """
+    cache = StreamCache(cache_dir) if cache_dir else None
+    cases = []
+    for i, sc in enumerate(SCENARIOS):
+        if scenario_names and sc.name not in scenario_names:
+            continue
+        for run in range(seeds):
+            batch, gt = sc.generate(run_seed(master_seed, i, run), cache)
+            cases.append(CalibrationCase(f"{sc.name} #{run}", batch, gt, sc.total_distance,
+                                         sc.threshold, sc.metric, sc.sample_rate))
+    return cases
+
+
+def evaluate(config: PDRConfig, cases: Sequence[CalibrationCase]) -> CalibrationResult:
+    values = np.empty(len(cases))
+    passed = 0
+    ratio = 0.0
+    for j, c in enumerate(cases):
+        engine = PDREngine(replace(config, sample_rate=c.sample_rate))
+        engine.process_batch(c.batch)
+        r = validate(c.name, engine.trajectory_array, c.ground_truth, engine.step_detector.step_count,
+                     c.total_distance, c.threshold, c.metric)
+        values[j] = r.metric_value()
+        ratio += values[j] / c.threshold
+        passed += r.passed
+    score = ratio / len(cases) if cases else 0.0
+    return CalibrationResult(config, score, passed, values)
+
+
+# ---------------------------------------------------------------------------
+# Parallel evaluator
+# ---------------------------------------------------------------------------
+
+_WORKER_CASES: List[CalibrationCase] = []
+
+
+def _init_worker(cases: List[CalibrationCase]):
+    global _WORKER_CASES
+    _WORKER_CASES = cases
+
+
+def _evaluate_in_worker(config: PDRConfig) -> CalibrationResult:
+    return evaluate(config, _WORKER_CASES)
+
+
+class Evaluator:
+    """Scores configs against shared cases, memoised, fanned out over a process pool."""
+
+    def __init__(self, cases: List[CalibrationCase], workers: Optional[int] = None):
+        self.cases = cases
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._memo: Dict[tuple, CalibrationResult] = {}
+
+    def __enter__(self):
+        if self.workers != 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.cases,))
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def map(self, configs: Sequence[PDRConfig]) -> List[CalibrationResult]:
+        todo = list({astuple(c): c for c in configs if astuple(c) not in self._memo}.values())
+        if self._pool:
+            results = self._pool.map(_evaluate_in_worker, todo, chunksize=max(1, len(todo) // 32))
+        else:
+            results = (evaluate(c, self.cases) for c in todo)
+        for c, r in zip(todo, results):
+            self._memo[astuple(c)] = r
+        return [self._memo[astuple(c)] for c in configs]
+
+    def all_results(self) -> List[CalibrationResult]:
+        return rank(self._memo.values())
+
+
+def rank(results) -> List[CalibrationResult]:
+    return sorted(results, key=lambda r: (-r.passed, r.score))
+
+
+# ---------------------------------------------------------------------------
+# Search strategies
+# ---------------------------------------------------------------------------
+
+def grid_search(evaluator: Evaluator, grid: Dict[str, List] = DEFAULT_GRID,
+                base: PDRConfig = PDRConfig()) -> List[CalibrationResult]:
+    names = list(grid)
+    configs = [replace(base, **dict(zip(names, values)))
+               for values in itertools.product(*(grid[n] for n in names))]
+    return rank(evaluator.map(configs))
+
+
+def coordinate_descent(evaluator: Evaluator, grid: Dict[str, List] = DEFAULT_GRID,
+                       start: PDRConfig = PDRConfig(), max_rounds: int = 5) -> List[CalibrationResult]:
+    """Optimise one parameter at a time over its grid until nothing improves."""
+    best = evaluator.map([start])[0]
+    for _ in range(max_rounds):
+        improved = False
+        for name, values in grid.items():
+            candidates = [replace(best.config, **{name: v}) for v in values]
+            top = rank(evaluator.map(candidates) + [best])[0]
+            if top is not best:
+                best, improved = top, True
+        if not improved:
+            break
+    return evaluator.all_results()
+
+
+def format_table(results: Sequence[CalibrationResult], top: int = 10) -> str:
+    lines = [f"{'#':>3} {'K':>6} {'thresh':>7} {'interval':>9} {'alpha':>6} {'pass':>7} {'score':>7}"]
+    for i, r in enumerate(results[:top], 1):
+        c = r.config
+        lines.append(f"{i:>3} {c.weinberg_k:>6.3f} {c.peak_threshold:>7.2f} "
+                     f"{c.min_step_interval_ns / 1e6:>7.0f}ms {c.alpha:>6.3f} "
+                     f"{r.passed:>3}/{r.total:<3} {r.score:>7.3f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="PDR parameter calibration")
+    ap.add_argument("--method", choices=("coord", "grid"), default="coord")
+    ap.add_argument("--seeds", type=int, default=3, help="streams per scenario")
+    ap.add_argument("--seed", type=int, default=0, help="master seed")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--scenario", action="append", help="only use this scenario (repeatable)")
+    ap.add_argument("--top", type=int, default=10, help="rows in the ranked table")
+    ap.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, default=None, metavar="DIR",
+                    help="reuse generated streams from a stream cache")
+    ap.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "results", "best_config.json"))
+    args = ap.parse_args(argv)
+
+    cases = scenario_cases(args.seeds, args.seed, args.scenario, args.cache)
+    with Evaluator(cases, args.workers) as ev:
+        if args.method == "grid":
+            results = grid_search(ev)
+        else:
+            results = coordinate_descent(ev)
+
+    print(f"\nEvaluated {len(results)} configs on {len(cases)} streams ({args.method})\n")
+    print(format_table(results, args.top))
+    best = results[0].config
+    best.save(args.out)
+    print(f"\nBest config saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+VIO + PDR fusion — simulated ARCore-style position stream fused with PDR steps.
+Usage:  python fusion.py [--spec layouts/parking.json | --laps 20] [--dims 2|3] [--seed 0]
+                         [--dropout-every 60] [--dropout-len 3] [--jump 0.5] [--drift 0.005]
+
+simulate_vio() turns a true track into what a VIO tracker reports: white
+noise, a slowly drifting frame (random walk), tracking dropouts and a
+relocalisation jump of the frame when tracking comes back.
+
+device_fusion() is what MainActivity does: one scalar KalmanFilter per
+axis over the VIO position while tracking, the raw PDR position otherwise.
+
+FusionEngine is the multi-axis filter: PDR displacement drives the
+prediction, VIO positions are the measurements, dropouts dead-reckon on PDR
+and innovations above *gate* metres are taken as relocalisation jumps and
+absorbed into a VIO → fused frame offset instead of dragging the estimate.
+Its gain is time-varying only after a dropout; once it settles the filter
+runs as a constant-gain linear recurrence (pdr_engine.linear_recurrence).
+
+Columns are (x, z) — east, north — plus height in 3-D.
+"""
+
+import sys, os, argparse, json, math, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from pdr_engine import KalmanFilter, PDREngine, TrajectoryBuffer, linear_recurrence
+
+VIO_RATE = 30.0          # Hz, ARCore frame rate
+_STEADY_BLOCK = 4096     # frames per constant-gain block before jump checks
+
+
+# ---------------------------------------------------------------------------
+# Simulated VIO
+# ---------------------------------------------------------------------------
+
+@dataclass
+class VIOStream:
+    timestamp: np.ndarray    # (n,) int64 ns
+    position: np.ndarray     # (n, d) in the VIO frame
+    tracking: np.ndarray     # (n,) bool
+    truth: np.ndarray        # (n, d) true position at each frame
+    jumps: np.ndarray        # frame indices where the frame was relocalised
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @property
+    def dims(self) -> int:
+        return self.position.shape[1]
+
+
+def _dropout_mask(t_s: np.ndarray, every: float, length: float, rng) -> Tuple[np.ndarray, np.ndarray]:
+    """(tracking mask, dropout end times) for exponential gaps and lengths."""
+    if not every or not length or not len(t_s):
+        return np.ones(len(t_s), dtype=bool), np.empty(0)
+    span = float(t_s[-1])
+    k = int(span / (every + length)) * 2 + 8
+    gaps = rng.exponential(every, k)
+    lens = rng.exponential(length, k)
+    while gaps.sum() + lens.sum() < span:
+        gaps = np.concatenate((gaps, rng.exponential(every, k)))
+        lens = np.concatenate((lens, rng.exponential(length, k)))
+    starts = np.cumsum(gaps) + np.concatenate(([0.0], np.cumsum(lens)[:-1]))
+    ends = starts + lens
+    bounds = np.column_stack((starts, ends)).ravel()
+    tracking = np.searchsorted(bounds, t_s, side="right") % 2 == 0
+    return tracking, ends[ends < span]
+
+
+def simulate_vio(sample_ts: np.ndarray, truth: np.ndarray, rate: float = VIO_RATE,
+                 noise: float = 0.02, drift: float = 0.005, dropout_every: float = 60.0,
+                 dropout_len: float = 3.0, jump: float = 0.5, dims: int = 2,
+                 rng=None) -> VIOStream:
+    """VIO frames at *rate* Hz over the true track (*truth* at *sample_ts*).
+
+    *noise* (m) is white, *drift* (m/√s) a random walk of the frame,
+    dropouts arrive every *dropout_every* s on average and last
+    *dropout_len* s on average (both exponential), and every recovery
+    moves the frame by N(0, *jump*) m horizontally.  *rng* is a
+    np.random.Generator; a fresh unseeded one by default.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    ts = np.asarray(sample_ts, dtype=np.int64)
+    frame_ts = np.arange(int(ts[0]), int(ts[-1]) + 1, int(round(1e9 / rate)), dtype=np.int64)
+    m = len(frame_ts)
+    true = np.zeros((m, dims))
+    src = np.asarray(truth, dtype=np.float64)
+    for c in range(min(dims, src.shape[1])):
+        true[:, c] = np.interp(frame_ts, ts, src[:, c])
+
+    t_s = (frame_ts - frame_ts[0]) * 1e-9
+    tracking, ends = _dropout_mask(t_s, dropout_every, dropout_len, rng)
+    dt = 1.0 / rate
+    offset = np.cumsum(rng.normal(0.0, drift * math.sqrt(dt), (m, dims)), axis=0)
+    recover = np.searchsorted(t_s, ends)
+    recover = recover[recover < m]
+    recover = np.unique(recover[tracking[recover]])
+    if len(recover) and jump:
+        steps = np.zeros((m, dims))
+        steps[recover, :2] = rng.normal(0.0, jump, (len(recover), 2))
+        offset += np.cumsum(steps, axis=0)
+    position = true + offset + rng.normal(0.0, noise, (m, dims))
+    return VIOStream(frame_ts, position, tracking, true, recover)
+
+
+def pdr_at(track: TrajectoryBuffer, timestamps: np.ndarray) -> np.ndarray:
+    """(n, 2) PDR position in effect at each timestamp (last step at or before it)."""
+    idx = np.searchsorted(track.timestamp, timestamps, side="right") - 1
+    return track.xy[np.maximum(idx, 0)]
+
+
+# ---------------------------------------------------------------------------
+# Fusion
+# ---------------------------------------------------------------------------
+
+@dataclass
+class FusionResult:
+    name: str
+    timestamp: np.ndarray
+    position: np.ndarray
+    truth: Optional[np.ndarray] = None
+    jumps: Optional[np.ndarray] = None       # frames treated as relocalisation jumps
+    seconds: float = 0.0
+
+    def errors(self) -> np.ndarray:
+        """Horizontal distance to the truth at every frame."""
+        d = self.position[:, :2] - self.truth[:, :2]
+        return np.hypot(d[:, 0], d[:, 1])
+
+    def to_dict(self) -> dict:
+        e = self.errors()
+        return {"name": self.name, "frames": len(self.timestamp),
+                "rms_error": float(np.sqrt(np.mean(e * e))), "max_error": float(e.max()),
+                "final_error": float(e[-1]),
+                "jumps": None if self.jumps is None else len(self.jumps),
+                "seconds": self.seconds}
+
+    def report(self) -> str:
+        d = self.to_dict()
+        rate = d["frames"] / self.seconds if self.seconds > 0 else 0.0
+        lines = [f"=== {self.name} — {d['frames']:,} frames ===",
+                 f"  RMS error      : {d['rms_error']:.3f} m",
+                 f"  Max error      : {d['max_error']:.3f} m",
+                 f"  Final error    : {d['final_error']:.3f} m"]
+        if d["jumps"] is not None:
+            lines.append(f"  Jumps absorbed : {d['jumps']}")
+        if self.seconds > 0:
+            lines.append(f"  Throughput     : {rate:,.0f} frames/s ({self.seconds * 1e3:.1f} ms)")
+        return "\n".join(lines)
+
+
+def device_fusion(vio: VIOStream, pdr: np.ndarray) -> np.ndarray:
+    """MainActivity's fusion: per-axis KalmanFilter over the VIO position while
+    tracking (the filters only see tracked frames), raw PDR otherwise."""
+    out = np.zeros((len(vio), vio.dims))
+    tracked = vio.tracking
+    for c in range(vio.dims):
+        if c < 2:
+            out[tracked, c] = KalmanFilter().filter_series(vio.position[tracked, c])
+            out[~tracked, c] = pdr[~tracked, c]
+        else:
+            out[tracked, c] = vio.position[tracked, c]  # height is passed through
+    return out
+
+
+class FusionEngine:
+    """Multi-axis VIO + PDR Kalman filter with dropout and jump handling.
+
+    Per axis: predict x⁻ = x + Δpdr, P⁻ = P + Q; update with the VIO position
+    (minus the current frame offset) while tracking.  Axes are independent
+    (diagonal covariance), so each has a scalar gain.  State carries over
+    between run() calls, so traces can be fed in chunks.
+    """
+
+    def __init__(self, dims: int = 2, process_noise: Union[float, np.ndarray] = 0.01,
+                 measurement_noise: Union[float, np.ndarray] = 0.1, gate: float = 1.0,
+                 tol: float = 1e-12):
+        self.dims = dims
+        self.Q = np.broadcast_to(np.asarray(process_noise, dtype=np.float64), (dims,)).copy()
+        self.R = np.broadcast_to(np.asarray(measurement_noise, dtype=np.float64), (dims,)).copy()
+        self.gate = gate
+        self.tol = tol
+        predicted = (self.Q + np.sqrt(self.Q * self.Q + 4 * self.Q * self.R)) / 2
+        self.gain = predicted / (predicted + self.R)
+        self.steady_cov = (1 - self.gain) * predicted
+        self.reset()
+
+    def reset(self):
+        self.x = np.zeros(self.dims)
+        self.P = np.ones(self.dims)
+        self.offset = np.zeros(self.dims)   # VIO frame minus fused frame
+        self.jumps: List[int] = []
+        self._last_pdr: Optional[np.ndarray] = None
+        self._initialized = False
+        self._frames = 0
+
+    def run(self, vio: VIOStream, pdr: np.ndarray) -> np.ndarray:
+        """Fuse one chunk; *pdr* is the (n, 2) PDR position at every frame."""
+        n, d = len(vio), self.dims
+        pdr = np.asarray(pdr, dtype=np.float64)
+        out = np.empty((n, d))
+        if n == 0:
+            return out
+        u = np.zeros((n, d))
+        u[:, :2] = np.diff(pdr, axis=0, prepend=pdr[:1] if self._last_pdr is None
+                           else self._last_pdr[None, :])
+        self._last_pdr = pdr[-1].copy()
+        z = vio.position[:, :d]
+        tracking = vio.tracking
+        if not self._initialized:
+            self.x = z[0].copy() if tracking[0] else np.concatenate((pdr[0], np.zeros(d - 2)))
+            self._initialized = True
+
+        change = np.flatnonzero(tracking[1:] != tracking[:-1]) + 1
+        bounds = np.concatenate(([0], change, [n]))
+        for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            if tracking[lo]:
+                self._tracked(z, u, out, lo, hi)
+            else:
+                out[lo:hi] = self.x + np.cumsum(u[lo:hi], axis=0)
+                self.x = out[hi - 1].copy()
+                self.P = self.P + self.Q * (hi - lo)
+        self._frames += n
+        return out
+
+    def _step(self, z: np.ndarray, u: np.ndarray, out: np.ndarray, k: int):
+        """One exact filter step at frame *k*, with the jump gate."""
+        prior = self.x + u[k]
+        predicted = self.P + self.Q
+        innovation = z[k] - self.offset - prior
+        if math.sqrt(float(np.dot(innovation, innovation))) > self.gate:
+            self.offset += innovation
+            self.jumps.append(self._frames + k)
+            innovation = np.zeros(self.dims)
+        K = predicted / (predicted + self.R)
+        self.x = prior + K * innovation
+        self.P = (1 - K) * predicted
+        out[k] = self.x
+
+    def _tracked(self, z: np.ndarray, u: np.ndarray, out: np.ndarray, lo: int, hi: int):
+        gain, a = self.gain, 1 - self.gain
+        k = lo
+        while k < hi:
+            predicted = self.P + self.Q
+            K = predicted / (predicted + self.R)
+            if not np.all(np.abs(K - gain) <= self.tol * gain):
+                self._step(z, u, out, k)
+                k += 1
+                continue
+            # Settled: constant-gain recurrence x = a (x + u) + K (z - offset).
+            e = min(k + _STEADY_BLOCK, hi)
+            meas = z[k:e] - self.offset
+            xs = linear_recurrence(a, a * u[k:e] + gain * meas, self.x)
+            prior = np.concatenate((self.x[None, :], xs[:-1])) + u[k:e]
+            innov = meas - prior
+            bad = np.flatnonzero(np.einsum("ij,ij->i", innov, innov) > self.gate * self.gate)
+            ok = int(bad[0]) if len(bad) else e - k
+            if ok:
+                out[k:k + ok] = xs[:ok]
+                self.x = xs[ok - 1].copy()
+                self.P = self.steady_cov.copy()
+                k += ok
+            if k < e:
+                self._step(z, u, out, k)
+                k += 1
+
+    def process(self, vio: VIOStream, pdr: np.ndarray, name: str = "FusionEngine") -> FusionResult:
+        t0 = time.perf_counter()
+        jumps0 = len(self.jumps)
+        position = self.run(vio, pdr)
+        return FusionResult(name, vio.timestamp, position, vio.truth,
+                            np.array(self.jumps[jumps0:], dtype=np.int64),
+                            time.perf_counter() - t0)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _rectangle_spec(laps: int) -> dict:
+    lap = [{"walk": {"heading": h, "distance": d}} for h, d in ((0, 10), (90, 20), (180, 10), (270, 20))]
+    return {"name": f"Rectangle 20x10 x{laps}", "segments": lap * laps}
+
+
+def main(argv=None):
+    from scenario_dsl import compile_scenario, load_specs
+
+    ap = argparse.ArgumentParser(description="Fuse simulated VIO with PDR and score against truth")
+    ap.add_argument("--spec", help="scenario DSL file (default: rectangle laps)")
+    ap.add_argument("--laps", type=int, default=20, help="rectangle laps when no --spec")
+    ap.add_argument("--dims", type=int, choices=(2, 3), default=2)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--rate", type=float, default=VIO_RATE, help="VIO frame rate (Hz)")
+    ap.add_argument("--noise", type=float, default=0.02, help="VIO white noise (m)")
+    ap.add_argument("--drift", type=float, default=0.005, help="VIO frame drift (m/√s)")
+    ap.add_argument("--dropout-every", type=float, default=60.0, help="mean seconds between dropouts")
+    ap.add_argument("--dropout-len", type=float, default=3.0, help="mean dropout length (s)")
+    ap.add_argument("--jump", type=float, default=0.5, help="relocalisation jump std (m)")
+    ap.add_argument("--process-noise", type=float, default=0.01)
+    ap.add_argument("--measurement-noise", type=float, default=0.1)
+    ap.add_argument("--gate", type=float, default=1.0, help="innovation (m) treated as a jump")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args(argv)
+
+    spec = load_specs(args.spec)[0] if args.spec else _rectangle_spec(args.laps)
+    compiled = compile_scenario(spec)
+    rng = np.random.default_rng(args.seed)
+    batch, _ = compiled.generate(rng)
+    engine = PDREngine(compiled.engine_config())
+    engine.process_batch(batch)
+    vio = simulate_vio(batch.timestamp, compiled.true_positions(), args.rate, args.noise,
+                       args.drift, args.dropout_every, args.dropout_len, args.jump, args.dims,
+                       rng)
+    pdr = pdr_at(engine.track, vio.timestamp)
+
+    t0 = time.perf_counter()
+    device = FusionResult("Device fusion (per-axis KalmanFilter)", vio.timestamp,
+                          device_fusion(vio, pdr), vio.truth)
+    device.seconds = time.perf_counter() - t0
+    fused = FusionEngine(args.dims, args.process_noise, args.measurement_noise,
+                         args.gate).process(vio, pdr)
+    results = [FusionResult("PDR only", vio.timestamp, pdr, vio.truth),
+               FusionResult("VIO only", vio.timestamp, vio.position, vio.truth),
+               device, fused]
+    if args.json:
+        print(json.dumps({"scenario": compiled.name, "vio_jumps": len(vio.jumps),
+                          "tracking": float(vio.tracking.mean()),
+                          "results": [r.to_dict() for r in results]}, indent=2))
+        return 0
+    print(f"{compiled.name}: {len(batch):,} samples, {len(vio):,} VIO frames, "
+          f"{vio.tracking.mean():.1%} tracked, {len(vio.jumps)} relocalisation jumps")
+    for r in results:
+        print()
+        print(r.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
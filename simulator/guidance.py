@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Return-to-car guidance — a recorded PDR trajectory simplified into a
+return path, with O(log n) progress lookup for live position updates.
+Usage:  python guidance.py [--spec layouts/] [--synthetic RxC] [--seed 0]
+                           [--sizes 10000,100000,1000000] [--tolerance 0.5]
+
+The app's PathRecorder.getReversePath() hands navigation the raw point
+list reversed.  ReturnPath instead:
+
+  1. simplifies the recording with Douglas–Peucker (*tolerance* m) and
+     reverses it, so the car is the last vertex;
+  2. extracts corners — vertices where the path turns by more than
+     *corner_angle* — as the waypoints announced to the walker;
+  3. indexes the vertices by cumulative arclength s[i].
+
+update(position) projects the position onto the segments whose arclength
+lies within (distance moved since the last update + *window*) of the
+last progress: two binary searches on s and a handful of projections,
+O(log n) whatever the recording's length.  Only when the walker is
+further than *off_route* m from that window is the whole path searched
+(SegmentTree, also O(log n)), so a walker who took a shortcut is picked up
+again further along.  The result is a Guidance: progress, distance
+remaining, next corner and the bearing to it.
+
+Walk-back scenarios replay a DSL route out from the car, record it with
+PDREngine, then walk the reversed route back (a fresh sensor stream that
+starts where the PDR estimate ended) and guide it with the recording.
+"""
+
+import sys, os, argparse, math, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from spatial_index import SegmentTree, _segment_distance, as_xy, project_to_segments
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+# ---------------------------------------------------------------------------
+# Simplification
+# ---------------------------------------------------------------------------
+
+def douglas_peucker(points, tolerance: float) -> np.ndarray:
+    """Indices of the vertices Douglas–Peucker keeps (first and last always).
+
+    Iterative (no recursion limit on long recordings); each split measures
+    all points of its range against the chord in one vectorized pass.
+    """
+    p = as_xy(points)
+    n = len(p)
+    if n <= 2:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        d, _ = _segment_distance(p[i + 1:j, 0], p[i + 1:j, 1], p[i, 0], p[i, 1], p[j, 0], p[j, 1])
+        k = int(d.argmax())
+        if d[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.append((i, k))
+            stack.append((k, j))
+    return np.flatnonzero(keep)
+
+
+def corners(vertices, min_angle: float) -> np.ndarray:
+    """Indices of interior vertices where the path turns by more than *min_angle* rad."""
+    v = as_xy(vertices)
+    if len(v) < 3:
+        return np.zeros(0, dtype=np.intp)
+    d = np.diff(v, axis=0)
+    heading = np.arctan2(d[:, 0], d[:, 1])
+    turn = np.abs((np.diff(heading) + math.pi) % (2 * math.pi) - math.pi)
+    return np.flatnonzero(turn > min_angle) + 1
+
+
+# ---------------------------------------------------------------------------
+# Return path
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Guidance:
+    progress: float          # m along the return path
+    remaining: float         # m along the path to the car
+    waypoint: int            # vertex index of the next corner (the car once past the last)
+    to_waypoint: float       # m along the path to it
+    bearing: float           # direction to it, rad clockwise from north
+    cross_track: float       # m off the path
+    off_route: bool
+    arrived: bool
+
+
+class ReturnPath:
+    def __init__(self, recorded, tolerance: float = 0.5, corner_angle: float = math.radians(30),
+                 window: float = 5.0, off_route: float = 8.0, arrive: float = 2.0):
+        pts = as_xy(recorded)
+        pts = pts[np.all(np.isfinite(pts), axis=1)]
+        if not len(pts):
+            raise ValueError("empty recording")
+        self.recorded = len(pts)
+        self.vertices = pts[douglas_peucker(pts, tolerance)][::-1].copy()
+        if len(self.vertices) == 1:
+            self.vertices = np.repeat(self.vertices, 2, axis=0)
+        self.a, self.b = self.vertices[:-1], self.vertices[1:]
+        seg_len = np.hypot(*(self.b - self.a).T)
+        self.s = np.concatenate(([0.0], np.cumsum(seg_len)))
+        self.length = float(self.s[-1])
+        self.corners = np.append(corners(self.vertices, corner_angle), len(self.vertices) - 1)
+        self._corner_s = self.s[self.corners]
+        self.tree = SegmentTree(self.a, self.b)
+        self.window = window
+        self.off_route = off_route
+        self.arrive = arrive
+        self.reset()
+
+    def reset(self):
+        self.progress = 0.0
+        self.relocations = 0
+        self._last: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.vertices)
+
+    def update(self, position) -> Guidance:
+        """Guidance for the walker's current (x, z)."""
+        p = np.asarray(position, dtype=np.float64).reshape(2)
+        moved = 0.0 if self._last is None else float(np.hypot(*(p - self._last)))
+        self._last = p
+        span = moved + self.window
+        lo = max(int(np.searchsorted(self.s, self.progress - span, side="right")) - 1, 0)
+        hi = min(int(np.searchsorted(self.s, self.progress + span, side="left")), len(self.a) - 1)
+        d, t = project_to_segments(p, self.a[lo:hi + 1], self.b[lo:hi + 1])
+        k = int(d.argmin())
+        dist, seg, tpar = float(d[k]), lo + k, float(t[k])
+        if dist > self.off_route:
+            gd, gs, gt = self.tree.nearest(p[None, :])
+            if gd[0] < dist:
+                dist, seg, tpar = float(gd[0]), int(gs[0]), float(gt[0])
+                self.relocations += 1
+        self.progress = float(self.s[seg] + tpar * (self.s[seg + 1] - self.s[seg]))
+        remaining = self.length - self.progress
+        c = min(int(np.searchsorted(self._corner_s, self.progress, side="right")), len(self.corners) - 1)
+        waypoint = int(self.corners[c])
+        wx, wz = self.vertices[waypoint] - p
+        return Guidance(self.progress, remaining, waypoint, float(self.s[waypoint]) - self.progress,
+                        math.atan2(wx, wz), dist, dist > self.off_route,
+                        remaining <= self.arrive and dist <= self.off_route)
+
+    def track(self, positions) -> List[Guidance]:
+        return [self.update(p) for p in as_xy(positions)]
+
+
+# ---------------------------------------------------------------------------
+# Walk-back scenarios
+# ---------------------------------------------------------------------------
+
+def walk_back_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """DSL spec retracing *spec*'s ground truth from its end back to its start."""
+    from scenario_dsl import compile_scenario
+
+    gt = compile_scenario(spec).ground_truth[::-1]
+    segments = []
+    for (x0, z0), (x1, z1) in zip(gt[:-1], gt[1:]):
+        dist = math.hypot(x1 - x0, z1 - z0)
+        if dist > 0:
+            heading = math.degrees(math.atan2(x1 - x0, z1 - z0)) % 360
+            segments.append({"walk": {"heading": round(heading, 9), "distance": dist}})
+    back = {k: v for k, v in spec.items() if k in ("noise_scale", "turn_duration", "disturbances", "noise")}
+    back.update(name=f"{spec.get('name', 'scenario')} — walk back", segments=segments,
+                threshold=spec.get("threshold", 5.0),
+                start={"x": gt[0][0], "z": gt[0][1],
+                       **({"heading": segments[0]["walk"]["heading"]} if segments else {})})
+    return back
+
+
+@dataclass
+class WalkBackResult:
+    scenario: str
+    recorded: int            # PDR points recorded on the way out
+    vertices: int            # after simplification
+    corners: int
+    length: float            # m, return path
+    arrival_error: float     # m, true distance to the car when guidance said "arrived" (or at the end)
+    arrived: bool
+    final_remaining: float   # m still to go by the guidance at the end of the walk
+    max_cross_track: float
+    relocations: int
+    updates: int
+    seconds: float
+
+    def report(self) -> str:
+        status = "arrived" if self.arrived else "not arrived"
+        return "\n".join([
+            f"=== {self.scenario} ===",
+            f"  Recording      : {self.recorded:,} points → {self.vertices:,} vertices, "
+            f"{self.corners} corners, {self.length:.1f} m",
+            f"  Arrival        : {status}, {self.arrival_error:.2f} m from the car "
+            f"(guidance: {self.final_remaining:.2f} m to go at the end)",
+            f"  Cross-track    : max {self.max_cross_track:.2f} m, {self.relocations} relocations",
+            f"  Updates        : {self.updates:,} ({self.updates / max(self.seconds, 1e-9):,.0f}/s)",
+        ])
+
+
+def _run_pdr(compiled, origin, rng, chunk_size: int = 4096):
+    from pdr_engine import PDREngine
+
+    engine = PDREngine(compiled.engine_config())
+    engine.pos_x, engine.pos_z = origin
+    engine.track.reset(engine.position)
+    for batch, _ in compiled.stream(chunk_size, rng):
+        engine.process_batch(batch)
+    return engine
+
+
+def walk_back(spec: Dict[str, Any], rng=None, **path_options) -> WalkBackResult:
+    """Record *spec* out from the car, then guide the walk back along it."""
+    from scenario_dsl import compile_scenario
+
+    rng = np.random.default_rng() if rng is None else rng
+    out = compile_scenario(spec)
+    car = np.asarray(out.ground_truth[0], dtype=np.float64)
+    recorded = _run_pdr(out, tuple(car), rng).trajectory_array.copy()
+    path = ReturnPath(recorded, **path_options)
+
+    back = compile_scenario(walk_back_spec(spec))
+    engine = _run_pdr(back, tuple(recorded[-1]), rng)
+    pdr = engine.trajectory_array
+    # True position at each step: the step's timestamp on the walk-back route.
+    truth = back.true_positions()
+    step_ts = engine.track.timestamp
+    sample_ts = np.arange(len(truth)) * (1e9 / back.sample_rate)
+    at = np.clip(np.searchsorted(sample_ts, step_ts), 0, len(truth) - 1)
+
+    t0 = time.perf_counter()
+    guidance = path.track(pdr)
+    spent = time.perf_counter() - t0
+    arrived = next((i for i, g in enumerate(guidance) if g.arrived), None)
+    stop = len(guidance) - 1 if arrived is None else arrived
+    return WalkBackResult(
+        back.name, path.recorded, len(path), len(path.corners) - 1, path.length,
+        float(np.hypot(*(truth[at[stop]] - car))), arrived is not None,
+        guidance[-1].remaining, max(g.cross_track for g in guidance), path.relocations,
+        len(guidance), spent)
+
+
+# ---------------------------------------------------------------------------
+# Throughput
+# ---------------------------------------------------------------------------
+
+def synthetic_recording(n: int, rng, step: float = 0.7, leg_steps: int = 30) -> np.ndarray:
+    """(n, 2) PDR-like track: legs of ~leg_steps steps joined by right-angle
+    turns, with heading and step-length noise."""
+    legs = n // leg_steps + 1
+    turns = rng.choice([-math.pi / 2, math.pi / 2], legs)
+    heading = np.repeat(np.cumsum(turns), leg_steps)[:n] + rng.normal(0, 0.03, n)
+    length = step + rng.normal(0, 0.03, n)
+    steps = np.column_stack((length * np.sin(heading), length * np.cos(heading)))
+    return np.cumsum(steps, axis=0)
+
+
+@dataclass
+class Throughput:
+    points: int
+    vertices: int
+    build_s: float
+    updates_per_s: float
+    scan_updates_per_s: float     # nearest-point scan over the whole raw recording
+
+    def row(self) -> str:
+        return (f"  {self.points:>10,} {self.vertices:>9,} {self.points / self.build_s:>12,.0f} "
+                f"{self.updates_per_s:>11,.0f} {self.scan_updates_per_s:>11,.0f}")
+
+
+def measure_throughput(n: int, rng, updates: int = 20_000, scan_updates: int = 200,
+                       tolerance: float = 0.5) -> Throughput:
+    recorded = synthetic_recording(n, rng)
+    t0 = time.perf_counter()
+    path = ReturnPath(recorded, tolerance)
+    build = time.perf_counter() - t0
+    # Walk back along the recording: every step, with 0.5 m of noise.
+    walk = recorded[::-1][:updates] + rng.normal(0, 0.5, (min(updates, n), 2))
+    t0 = time.perf_counter()
+    path.track(walk)
+    rate = len(walk) / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for p in walk[:scan_updates]:
+        int(np.argmin(np.hypot(recorded[:, 0] - p[0], recorded[:, 1] - p[1])))
+    scan = min(scan_updates, len(walk)) / (time.perf_counter() - t0)
+    return Throughput(n, len(path), build, rate, scan)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    from scenario_dsl import load_specs
+    from scenarios import run_seed
+
+    ap = argparse.ArgumentParser(description="Return-to-car guidance along a recorded PDR path")
+    ap.add_argument("--spec", default=os.path.join(os.path.dirname(__file__), "layouts"),
+                    help="DSL spec file or directory of outbound routes")
+    ap.add_argument("--synthetic", metavar="RxC", default="10x10",
+                    help="also walk back a random grid walk of this many aisles ('' to skip)")
+    ap.add_argument("--legs", type=int, default=40, help="legs of the synthetic walk")
+    ap.add_argument("--sizes", type=lambda s: [int(float(x)) for x in s.split(",")],
+                    default=list(DEFAULT_SIZES), help="recording lengths for the throughput table")
+    ap.add_argument("--tolerance", type=float, default=0.5, help="Douglas–Peucker tolerance (m)")
+    ap.add_argument("--seed", type=int, default=0, help="master seed")
+    args = ap.parse_args(argv)
+
+    specs = load_specs(args.spec)
+    if args.synthetic:
+        from map_matching import grid_walk_spec
+        rows, cols = (int(v) for v in args.synthetic.lower().split("x"))
+        specs.append(grid_walk_spec(rows, cols, 16.0, args.legs, np.random.default_rng(args.seed)))
+    for i, spec in enumerate(specs):
+        result = walk_back(spec, np.random.default_rng(run_seed(args.seed, i, 0)),
+                           tolerance=args.tolerance)
+        print(result.report())
+        print()
+
+    rng = np.random.default_rng(run_seed(args.seed, len(specs), 0))
+    print("=== Throughput ===")
+    print(f"  {'points':>10} {'vertices':>9} {'build pts/s':>12} {'updates/s':>11} {'scan upd/s':>11}")
+    for n in args.sizes:
+        print(measure_throughput(n, rng, tolerance=args.tolerance).row())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,669 @@
+#!/usr/bin/env python3
+"""
+Live ingest — runs one PDREngine per session on sensor packets streamed over
+TCP, UDP or stdin, and streams position updates back.
+Usage:  python ingest_server.py serve [--tcp 127.0.0.1:7700] [--udp 127.0.0.1:7701] [--stdin]
+        python ingest_server.py load --tcp 127.0.0.1:7700 [--sessions 200] [--seconds 10]
+        python ingest_server.py load --spawn [--sessions 200]   # in-process server
+
+Wire formats (auto-detected per connection / datagram):
+  binary  fixed 88-byte frames, little-endian:
+          magic "PN" | u16 version | u32 session | i64 timestamp ns | 9 × f64 acc, gyro, mag
+          updates go back as 44-byte frames:
+          magic "PO" | u16 version | u32 session | i64 timestamp | f64 x, z, heading | u32 steps
+  CSV     DataExporter sensor rows (header optional); the session is the
+          connection unless a "#session <id>" line selects one.  Updates go
+          back as "session,timestamp,x,z,heading,steps" lines.
+
+Each session buffers at most --queue packets.  When it is full the
+--policy decides: drop-oldest / drop-newest discard packets (and count
+them), block stops reading from that TCP connection or stdin until the
+engine catches up (UDP cannot be paused and drops the newest).  Queued
+packets are fed to the engine as one SensorBatch of up to --max-batch
+rows, and one update is sent per batch.
+
+A TCP or stdin connection's anonymous session is closed when the
+connection ends.  Named sessions and UDP senders have no end of stream;
+they are closed after --idle-timeout seconds without packets.
+"""
+
+import sys, os, argparse, asyncio, struct, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from pdr_engine import PDRConfig, PDREngine, SensorBatch
+
+VERSION = 1
+FRAME = struct.Struct("<2sHIq9d")
+UPDATE = struct.Struct("<2sHIqdddI")
+FRAME_MAGIC = b"PN"
+UPDATE_MAGIC = b"PO"
+FRAME_DTYPE = np.dtype([("magic", "S2"), ("version", "<u2"), ("session", "<u4"),
+                        ("timestamp", "<i8"), ("imu", "<f8", (9,))])
+UPDATE_DTYPE = np.dtype([("magic", "S2"), ("version", "<u2"), ("session", "<u4"),
+                         ("timestamp", "<i8"), ("x", "<f8"), ("z", "<f8"),
+                         ("heading", "<f8"), ("steps", "<u4")])
+POLICIES = ("drop-oldest", "drop-newest", "block")
+PERCENTILES = (50, 90, 99, 99.9)
+_CSV_FIELDS = 10  # timestamp + 9 IMU columns; DataExporter's extra columns are ignored
+_UNIT_SCALE = {"ns": 1, "ms": 1_000_000}
+
+# One queued packet: (timestamp ns, 9 IMU values, arrival perf_counter()).
+Packet = Tuple[int, Sequence[float], float]
+# One outgoing update: (session, timestamp, x, z, heading, steps).
+Update = Tuple[int, int, float, float, float, int]
+
+
+def encode_frames(session: int, batch: SensorBatch) -> bytes:
+    """Binary frames for every row of *batch*."""
+    out = np.zeros(len(batch), dtype=FRAME_DTYPE)
+    out["magic"] = FRAME_MAGIC
+    out["version"] = VERSION
+    out["session"] = session
+    out["timestamp"] = batch.timestamp
+    out["imu"] = np.hstack((batch.acc, batch.gyro, batch.mag))
+    return out.tobytes()
+
+
+def _encode_update_binary(u: Update) -> bytes:
+    return UPDATE.pack(UPDATE_MAGIC, VERSION, *u)
+
+
+def _encode_update_csv(u: Update) -> bytes:
+    s, t, x, z, h, n = u
+    return f"{s},{t},{x:.4f},{z:.4f},{h:.5f},{n}\n".encode()
+
+
+# ---------------------------------------------------------------------------
+# Latency
+# ---------------------------------------------------------------------------
+
+class LatencyRecorder:
+    """Most recent *capacity* latencies (seconds) in a ring buffer."""
+
+    def __init__(self, capacity: int = 1 << 20):
+        self._buf = np.empty(capacity)
+        self._pos = 0
+        self.count = 0
+
+    def add(self, values: np.ndarray):
+        values = values[-len(self._buf):]
+        k = len(values)
+        end = self._pos + k
+        if end <= len(self._buf):
+            self._buf[self._pos:end] = values
+        else:
+            split = len(self._buf) - self._pos
+            self._buf[self._pos:] = values[:split]
+            self._buf[:k - split] = values[split:]
+        self._pos = end % len(self._buf)
+        self.count += k
+
+    def values(self) -> np.ndarray:
+        return self._buf[:min(self.count, len(self._buf))]
+
+    def percentiles(self, ps: Sequence[float] = PERCENTILES) -> Dict[float, float]:
+        v = self.values()
+        if not len(v):
+            return {p: float("nan") for p in ps}
+        return dict(zip(ps, np.percentile(v, ps).tolist()))
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+
+class Session:
+    """One engine, its bounded packet queue and the task that drains it."""
+
+    def __init__(self, sid: int, server: "IngestServer"):
+        self.id = sid
+        self.server = server
+        self.engine = PDREngine(server.config)
+        self.queue: Deque[Packet] = deque()
+        self.sink: Optional[Callable[[Update], None]] = None
+        self.received = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_seen = time.perf_counter()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def put(self, packets: List[Packet], can_block: bool = True):
+        limit = self.server.queue_size
+        policy = self.server.policy
+        self.received += len(packets)
+        self.last_seen = time.perf_counter()
+        if policy == "block" and can_block:
+            for i in range(0, len(packets), limit):
+                while len(self.queue) >= limit:
+                    self._space.clear()
+                    await self._space.wait()
+                self.queue.extend(packets[i:i + limit])
+                self._ready.set()
+            return
+        if policy == "drop-oldest":
+            self.queue.extend(packets)
+            excess = len(self.queue) - limit
+            if excess > 0:
+                self.dropped += excess
+                for _ in range(excess):
+                    self.queue.popleft()
+        else:
+            room = max(limit - len(self.queue), 0)
+            self.dropped += max(len(packets) - room, 0)
+            self.queue.extend(packets[:room])
+        if self.queue:
+            self._ready.set()
+
+    def _take(self) -> List[Packet]:
+        k = min(len(self.queue), self.server.max_batch)
+        rows = [self.queue.popleft() for _ in range(k)]
+        if not self.queue:
+            self._ready.clear()
+        self._space.set()
+        return rows
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            if self.server.linger > 0:
+                await asyncio.sleep(self.server.linger)
+            rows = self._take()
+            if rows:
+                self._process(rows)
+            # Let readers and other sessions run between batches.
+            await asyncio.sleep(0)
+
+    def _process(self, rows: List[Packet]):
+        ts = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        imu = np.array([r[1] for r in rows], dtype=np.float64)
+        e = self.engine
+        e.process_batch(SensorBatch(ts, imu[:, 0:3], imu[:, 3:6], imu[:, 6:9]))
+        self.batches += 1
+        update = (self.id, int(ts[-1]), e.pos_x, e.pos_z,
+                  e.orientation_estimator.heading, e.step_detector.step_count)
+        if self.sink is not None:
+            try:
+                self.sink(update)
+            except (ConnectionError, RuntimeError):
+                self.sink = None
+        now = time.perf_counter()
+        self.server.latency.add(now - np.fromiter((r[2] for r in rows), dtype=np.float64,
+                                                  count=len(rows)))
+
+    async def drain(self):
+        """Wait until every queued packet has been processed."""
+        while self.queue:
+            self._space.clear()
+            await self._space.wait()
+
+    def close(self):
+        self._task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ServerStats:
+    sessions: int
+    received: int
+    dropped: int
+    processed: int
+    batches: int
+    elapsed_s: float
+    latency_ms: Dict[float, float]
+
+    def report(self) -> str:
+        rate = self.processed / self.elapsed_s if self.elapsed_s > 0 else 0.0
+        pct = "  ".join(f"p{p:g} {v:.2f}" for p, v in self.latency_ms.items())
+        per_batch = self.processed / self.batches if self.batches else 0.0
+        return "\n".join([
+            "=== Ingest server ===",
+            f"  Sessions       : {self.sessions}",
+            f"  Packets        : {self.received} received, {self.dropped} dropped, "
+            f"{self.processed} processed ({rate:,.0f}/s)",
+            f"  Batches        : {self.batches} ({per_batch:.1f} packets/batch)",
+            f"  Latency (ms)   : {pct}",
+        ])
+
+
+class IngestServer:
+    def __init__(self, config: Optional[PDRConfig] = None, queue_size: int = 1024,
+                 policy: str = "drop-oldest", max_batch: int = 256, linger_ms: float = 0.0,
+                 csv_unit: str = "ms", idle_timeout: float = 300.0):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.config = config
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000.0
+        self.csv_scale = _UNIT_SCALE[csv_unit]
+        self.idle_timeout = idle_timeout
+        self._reaper: Optional[asyncio.Future] = None
+        self._udp_senders: Dict[tuple, int] = {}  # CSV datagram sender -> its session
+        self.sessions: Dict[int, Session] = {}
+        self.latency = LatencyRecorder()
+        self._servers = []
+        self._next_anon = 1 << 31  # session ids for connections that never name one
+        self._retired = {"received": 0, "dropped": 0, "batches": 0}  # closed sessions
+        self._started = time.perf_counter()
+
+    def session(self, sid: int) -> Session:
+        s = self.sessions.get(sid)
+        if s is None:
+            s = self.sessions[sid] = Session(sid, self)
+            if self.idle_timeout > 0 and self._reaper is None:
+                self._reaper = asyncio.ensure_future(self._reap())
+        return s
+
+    async def _reap(self):
+        """Close sessions that received nothing for idle_timeout seconds."""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            cutoff = time.perf_counter() - self.idle_timeout
+            for sid, s in list(self.sessions.items()):
+                if s.last_seen < cutoff and not s.queue:
+                    self._retire(sid)
+            self._udp_senders = {a: sid for a, sid in self._udp_senders.items()
+                                 if sid in self.sessions}
+
+    def _anon_session(self) -> int:
+        self._next_anon += 1
+        return self._next_anon
+
+    # -- decoding -----------------------------------------------------------
+
+    def _decode_frames(self, buf: bytes, now: float) -> Dict[int, List[Packet]]:
+        frames = np.frombuffer(buf, dtype=FRAME_DTYPE)
+        if not np.all(frames["magic"] == FRAME_MAGIC):
+            raise ValueError("bad frame magic")
+        if not np.all(frames["version"] == VERSION):
+            bad = sorted(set(frames["version"][frames["version"] != VERSION].tolist()))
+            raise ValueError(f"unsupported frame version {bad}, expected {VERSION}")
+        out: Dict[int, List[Packet]] = {}
+        for sid, t, imu in zip(frames["session"].tolist(), frames["timestamp"].tolist(),
+                               frames["imu"].tolist()):
+            out.setdefault(sid, []).append((t, imu, now))
+        return out
+
+    def _decode_csv(self, lines: List[bytes], sid: int, now: float
+                    ) -> Tuple[int, Dict[int, List[Packet]]]:
+        out: Dict[int, List[Packet]] = {}
+        scale = self.csv_scale
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(b"timestamp"):
+                continue
+            if line.startswith(b"#session"):
+                try:
+                    sid = int(line.split()[1])
+                except (IndexError, ValueError):
+                    pass  # malformed selector: keep the current session
+                continue
+            parts = line.split(b",", _CSV_FIELDS)
+            if len(parts) < _CSV_FIELDS:
+                continue  # truncated row
+            try:
+                row = (int(parts[0]) * scale, [float(v) for v in parts[1:_CSV_FIELDS]], now)
+            except ValueError:
+                continue
+            out.setdefault(sid, []).append(row)
+        return sid, out
+
+    async def _dispatch(self, packets: Dict[int, List[Packet]], sink, can_block: bool = True):
+        """Queue decoded packets on their sessions; returns the session ids."""
+        for sid, rows in packets.items():
+            s = self.session(sid)
+            s.sink = sink
+            await s.put(rows, can_block)
+        return packets.keys()
+
+    # -- transports ---------------------------------------------------------
+
+    async def handle_stream(self, reader: asyncio.StreamReader,
+                            write: Callable[[bytes], None]):
+        """Read packets from a byte stream until EOF (TCP connection or stdin),
+        then wait for the sessions it fed to process everything queued.
+
+        The connection's anonymous session is closed afterwards; named
+        sessions outlive it (a device may reconnect) but stop sending to it.
+        """
+        try:
+            head = await reader.readexactly(2)
+        except asyncio.IncompleteReadError as exc:
+            head = exc.partial
+        if not head:
+            return
+        fed = set()
+        binary = head == FRAME_MAGIC
+        encode = _encode_update_binary if binary else _encode_update_csv
+        sink = lambda u: write(encode(u))
+        buf = head
+        sid = anon = self._anon_session()
+        while True:
+            chunk = await reader.read(1 << 16)
+            buf += chunk
+            now = time.perf_counter()
+            if binary:
+                usable = len(buf) - len(buf) % FRAME.size
+                if usable:
+                    fed.update(await self._dispatch(self._decode_frames(buf[:usable], now), sink))
+                    buf = buf[usable:]
+            else:
+                if chunk:
+                    lines = buf.split(b"\n")
+                    buf = lines.pop()
+                else:
+                    lines, buf = [buf], b""
+                sid, packets = self._decode_csv(lines, sid, now)
+                fed.update(await self._dispatch(packets, sink))
+            if not chunk:
+                break
+        for s in fed:
+            await self.sessions[s].drain()
+        for s in fed:
+            if s == anon:
+                self._retire(s)
+            elif self.sessions[s].sink is sink:
+                self.sessions[s].sink = None
+
+    def _retire(self, sid: int):
+        """Close session *sid* and fold its counters into the server totals."""
+        s = self.sessions.pop(sid)
+        s.close()
+        self._retired["received"] += s.received
+        self._retired["dropped"] += s.dropped
+        self._retired["batches"] += s.batches
+
+    async def start_tcp(self, host: str, port: int) -> int:
+        async def on_client(reader, writer):
+            try:
+                await self.handle_stream(reader, writer.write)
+            except (ValueError, ConnectionError) as exc:
+                print(f"ingest: dropping connection: {exc}", file=sys.stderr)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(on_client, host, port)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def start_udp(self, host: str, port: int) -> int:
+        ingest = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                now = time.perf_counter()
+                sink = lambda u: self.transport.sendto(
+                    (_encode_update_binary if binary else _encode_update_csv)(u), addr)
+                binary = data[:2] == FRAME_MAGIC
+                try:
+                    if binary:
+                        usable = len(data) - len(data) % FRAME.size
+                        packets = ingest._decode_frames(data[:usable], now)
+                    else:
+                        sid = ingest._udp_senders.get(addr) or ingest._anon_session()
+                        sid, packets = ingest._decode_csv(data.split(b"\n"), sid, now)
+                        ingest._udp_senders[addr] = sid
+                except ValueError:
+                    return
+                asyncio.ensure_future(ingest._dispatch(packets, sink, can_block=False))
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(Protocol, local_addr=(host, port))
+        self._servers.append(transport)
+        return transport.get_extra_info("sockname")[1]
+
+    async def serve_stdin(self):
+        """Read packets from stdin; updates are written to stdout."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        out = sys.stdout.buffer
+        await self.handle_stream(reader, lambda b: (out.write(b), out.flush()))
+
+    async def drain(self):
+        for s in list(self.sessions.values()):
+            await s.drain()
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for srv in self._servers:
+            srv.close()
+        for s in self.sessions.values():
+            s.close()
+
+    def stats(self) -> ServerStats:
+        ss = self.sessions.values()
+        r = self._retired
+        return ServerStats(
+            sessions=len(self.sessions),
+            received=r["received"] + sum(s.received for s in ss),
+            dropped=r["dropped"] + sum(s.dropped for s in ss),
+            processed=self.latency.count,
+            batches=r["batches"] + sum(s.batches for s in ss),
+            elapsed_s=time.perf_counter() - self._started,
+            latency_ms={p: v * 1e3 for p, v in self.latency.percentiles().items()},
+        )
+
+
+# ---------------------------------------------------------------------------
+# Replay load client
+# ---------------------------------------------------------------------------
+
+@dataclass
+class LoadResult:
+    sessions: int
+    sent: int
+    updates: int
+    elapsed_s: float
+    latency_ms: Dict[float, float]
+
+    def report(self) -> str:
+        pct = "  ".join(f"p{p:g} {v:.2f}" for p, v in self.latency_ms.items())
+        return "\n".join([
+            f"=== Load client — {self.sessions} sessions ===",
+            f"  Packets sent   : {self.sent} ({self.sent / self.elapsed_s:,.0f}/s)",
+            f"  Updates        : {self.updates}",
+            f"  Round trip (ms): {pct}",
+        ])
+
+
+def _session_stream(sid: int, csv_path: Optional[str]) -> SensorBatch:
+    if csv_path:
+        from replay import read_sensor_csv
+        return SensorBatch.concatenate([c.batch for c in read_sensor_csv(csv_path)])
+    from scenarios import SCENARIOS, run_seed
+    sc = SCENARIOS[sid % len(SCENARIOS)]
+    return sc.generate(run_seed(0, sid % len(SCENARIOS), sid))[0]
+
+
+async def _replay_session(host: str, port: int, sid: int, batch: SensorBatch, seconds: float,
+                          speed: float, frames_per_write: int, latency: List[float]
+                          ) -> Tuple[int, int]:
+    reader, writer = await asyncio.open_connection(host, port)
+    pending: Deque[Tuple[int, float]] = deque()  # (last timestamp in write, send time)
+    updates = 0
+
+    async def receive():
+        nonlocal updates
+        buf = b""
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                return
+            buf += chunk
+            usable = len(buf) - len(buf) % UPDATE.size
+            if not usable:
+                continue
+            now = time.perf_counter()
+            for t in np.frombuffer(buf[:usable], dtype=UPDATE_DTYPE)["timestamp"].tolist():
+                updates += 1
+                while pending and pending[0][0] <= t:
+                    latency.append(now - pending.popleft()[1])
+            buf = buf[usable:]
+
+    rx = asyncio.ensure_future(receive())
+    frames = encode_frames(sid, batch)
+    n = len(batch)
+    dt = (1.0 / 50) / speed * frames_per_write
+    span = int(batch.timestamp[-1] - batch.timestamp[0]) + 20_000_000
+    start = time.perf_counter()
+    sent = 0
+    lap = 0
+    while time.perf_counter() - start < seconds:
+        for lo in range(0, n, frames_per_write):
+            hi = min(lo + frames_per_write, n)
+            chunk = bytearray(frames[lo * FRAME.size:hi * FRAME.size])
+            last_ts = int(batch.timestamp[hi - 1]) + lap * span
+            if lap:
+                recs = np.frombuffer(chunk, dtype=FRAME_DTYPE).copy()
+                recs["timestamp"] += lap * span
+                chunk = recs.tobytes()
+            pending.append((last_ts, time.perf_counter()))
+            writer.write(chunk)
+            sent += hi - lo
+            await writer.drain()
+            target = start + (sent / frames_per_write) * dt
+            await asyncio.sleep(max(0.0, target - time.perf_counter()))
+            if time.perf_counter() - start >= seconds:
+                break
+        lap += 1
+    await asyncio.sleep(0.2)
+    writer.close()
+    rx.cancel()
+    return sent, updates
+
+
+async def run_load(host: str, port: int, sessions: int = 100, seconds: float = 10.0,
+                   speed: float = 1.0, frames_per_write: int = 5,
+                   csv_path: Optional[str] = None) -> LoadResult:
+    """Replay one stream per session over TCP at *speed* × real time (50 Hz)."""
+    latency: List[float] = []
+    streams = [_session_stream(i, csv_path) for i in range(sessions)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        _replay_session(host, port, i, streams[i], seconds, speed, frames_per_write, latency)
+        for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    lat = np.asarray(latency) * 1e3
+    pct = dict(zip(PERCENTILES, np.percentile(lat, PERCENTILES).tolist())) if len(lat) \
+        else {p: float("nan") for p in PERCENTILES}
+    return LoadResult(sessions, sum(r[0] for r in results), sum(r[1] for r in results),
+                      elapsed, pct)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _addr(text: str) -> Tuple[str, int]:
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _server_from_args(args) -> IngestServer:
+    config = PDRConfig.load(args.config) if args.config else None
+    return IngestServer(config, args.queue, args.policy, args.max_batch, args.linger_ms,
+                        args.csv_unit, args.idle_timeout)
+
+
+async def _serve(args):
+    server = _server_from_args(args)
+    if args.tcp:
+        port = await server.start_tcp(*_addr(args.tcp))
+        print(f"ingest: TCP on port {port}", file=sys.stderr)
+    if args.udp:
+        port = await server.start_udp(*_addr(args.udp))
+        print(f"ingest: UDP on port {port}", file=sys.stderr)
+
+    async def stats():
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            print(server.stats().report(), file=sys.stderr)
+
+    ticker = asyncio.ensure_future(stats()) if args.stats_interval > 0 else None
+    try:
+        if args.stdin:
+            await server.serve_stdin()
+        else:
+            await asyncio.Event().wait()
+    finally:
+        if ticker:
+            ticker.cancel()
+        await server.close()
+        print(server.stats().report(), file=sys.stderr)
+
+
+async def _load(args):
+    server = None
+    if args.spawn:
+        server = _server_from_args(args)
+        host, port = "127.0.0.1", await server.start_tcp("127.0.0.1", 0)
+    else:
+        host, port = _addr(args.tcp)
+    result = await run_load(host, port, args.sessions, args.seconds, args.speed,
+                            args.frames_per_write, args.csv)
+    print(result.report())
+    if server:
+        await server.drain()
+        await server.close()
+        print()
+        print(server.stats().report())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Live PDR ingest server")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve", help="run the server")
+    load = sub.add_parser("load", help="replay streams against a server")
+    for p in (serve, load):
+        p.add_argument("--config", help="PDRConfig JSON")
+        p.add_argument("--queue", type=int, default=1024, help="packets buffered per session")
+        p.add_argument("--policy", choices=POLICIES, default="drop-oldest")
+        p.add_argument("--max-batch", type=int, default=256, help="packets per engine batch")
+        p.add_argument("--linger-ms", type=float, default=0.0,
+                       help="wait this long for more packets before running a batch")
+        p.add_argument("--csv-unit", choices=("ms", "ns"), default="ms",
+                       help="timestamp unit of CSV rows (DataExporter writes ms)")
+        p.add_argument("--idle-timeout", type=float, default=300.0,
+                       help="close sessions idle this many seconds (0 = never)")
+    serve.add_argument("--tcp", metavar="HOST:PORT")
+    serve.add_argument("--udp", metavar="HOST:PORT")
+    serve.add_argument("--stdin", action="store_true", help="read packets from stdin")
+    serve.add_argument("--stats-interval", type=float, default=10.0, help="seconds; 0 = off")
+    load.add_argument("--tcp", metavar="HOST:PORT", help="server to load")
+    load.add_argument("--spawn", action="store_true", help="start an in-process server")
+    load.add_argument("--sessions", type=int, default=100)
+    load.add_argument("--seconds", type=float, default=10.0)
+    load.add_argument("--speed", type=float, default=1.0, help="× real time")
+    load.add_argument("--frames-per-write", type=int, default=5)
+    load.add_argument("--csv", help="replay this DataExporter CSV in every session")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "serve" and not (args.tcp or args.udp or args.stdin):
+        ap.error("serve needs --tcp, --udp or --stdin")
+    if args.cmd == "load" and not (args.tcp or args.spawn):
+        ap.error("load needs --tcp or --spawn")
+    try:
+        asyncio.run(_serve(args) if args.cmd == "serve" else _load(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
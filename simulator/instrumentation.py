@@ -0,0 +1,263 @@
+"""
+Instrumentation — opt-in stage timing, counters and an event trace for PDREngine.
+
+    instr = Instrumentation(trace=RingBufferTrace(10_000))
+    engine.instrument(instr)
+    ...
+    print(instr.report("Parking"))
+    engine.instrument(None)
+
+Stages: "step_detection", "orientation", "position".  Counters: samples,
+steps, peaks_rejected_threshold, peaks_rejected_refractory,
+heading_resets_gap (dt > 1 s) and heading_resets_backwards (dt <= 0).
+Trace events are dicts: {"event": "step", "t", "n", "length", "heading",
+"x", "z"} and {"event": "heading_reset", "t", "dt"}.
+"""
+
+import json
+import time
+import numpy as np
+from collections import Counter, deque
+from typing import Dict, IO, List, Optional, Union
+
+from pdr_engine import PDREngine, SensorBatch, SensorData, StepEvent
+
+STAGES = ("step_detection", "orientation", "position")
+COUNTERS = ("samples", "steps", "peaks_rejected_threshold", "peaks_rejected_refractory",
+            "heading_resets_gap", "heading_resets_backwards")
+_GRAVITY = 9.81  # as in StepDetector
+_RESET_GAP_NS = 1_000_000_000  # OrientationEstimator re-seeds on dt > 1.0 s
+
+
+# ---------------------------------------------------------------------------
+# Trace sinks
+# ---------------------------------------------------------------------------
+
+class RingBufferTrace:
+    """Keeps the last *maxlen* events in memory."""
+
+    def __init__(self, maxlen: int = 10_000):
+        self._events = deque(maxlen=maxlen)
+        self.dropped = 0
+
+    def emit(self, event: Dict):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+
+    def events(self) -> List[Dict]:
+        return list(self._events)
+
+    def close(self):
+        pass
+
+
+class JsonlTrace:
+    """Appends one JSON object per line to a file (path or open text file)."""
+
+    def __init__(self, target: Union[str, IO[str]]):
+        self._own = isinstance(target, str)
+        self._f = open(target, "w") if self._own else target
+
+    def emit(self, event: Dict):
+        self._f.write(json.dumps(event) + "\n")
+
+    def close(self):
+        if self._own:
+            self._f.close()
+        else:
+            self._f.flush()
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+class Instrumentation:
+    """Per-stage wall time, counters and an optional event trace for one engine.
+
+    Attach with PDREngine.instrument(); the engine's own methods are not
+    modified, so an engine without instrumentation pays nothing.
+    """
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self.seconds: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.counters: Counter = Counter(dict.fromkeys(COUNTERS, 0))
+        self.engine: Optional[PDREngine] = None
+        self._listener = None
+        self._position_s = 0.0
+
+    # -- wiring -------------------------------------------------------------
+
+    def attach(self, engine: PDREngine):
+        if self.engine is not None:
+            raise ValueError("instrumentation is already attached to an engine")
+        self.engine = engine
+        det = engine.step_detector
+        self._listener = det._listener
+        det.set_on_step_listener(self._on_step)
+        engine.on_sensor_update = self.on_sensor_update
+        engine.process_batch = self.process_batch
+        engine.instrumentation = self
+
+    def detach(self):
+        engine = self.engine
+        if engine is None:
+            return
+        engine.step_detector.set_on_step_listener(self._listener)
+        engine.__dict__.pop("on_sensor_update", None)
+        engine.__dict__.pop("process_batch", None)
+        engine.instrumentation = None
+        self.engine = None
+        self._listener = None
+        if self.trace is not None:
+            self.trace.close()
+
+    def _emit(self, event: Dict):
+        if self.trace is not None:
+            self.trace.emit(event)
+
+    # -- streaming path -----------------------------------------------------
+
+    def _on_step(self, event: StepEvent):
+        engine = self.engine
+        t0 = time.perf_counter()
+        self._listener(event)
+        self._position_s += time.perf_counter() - t0
+        self.counters["steps"] += 1
+        self._emit({"event": "step", "t": event.timestamp, "n": engine.step_detector.step_count,
+                    "length": event.step_length,
+                    "heading": engine.orientation_estimator.heading,
+                    "x": engine.pos_x, "z": engine.pos_z})
+
+    def on_sensor_update(self, data: SensorData):
+        engine = self.engine
+        det = engine.step_detector
+        c = self.counters
+        c["samples"] += 1
+
+        steps = det.step_count
+        self._position_s = 0.0
+        t0 = time.perf_counter()
+        det.on_accelerometer_update(data.accX, data.accY, data.accZ, data.timestamp)
+        t1 = time.perf_counter()
+        if det.step_count == steps:
+            self._count_rejected_peak(det)
+
+        self._check_reset(data.timestamp)
+        engine.orientation_estimator.update(data)
+        t2 = time.perf_counter()
+
+        self.seconds["step_detection"] += t1 - t0 - self._position_s
+        self.seconds["position"] += self._position_s
+        self.seconds["orientation"] += t2 - t1
+
+    def _count_rejected_peak(self, det):
+        w = det._window
+        if len(w) < det._window_size:
+            return
+        a_max = max(w)
+        if w[len(w) // 2] != a_max:
+            return
+        if (a_max - _GRAVITY) > det.peak_threshold:
+            self.counters["peaks_rejected_refractory"] += 1
+        else:
+            self.counters["peaks_rejected_threshold"] += 1
+
+    def _check_reset(self, timestamp: int):
+        est = self.engine.orientation_estimator
+        if not est._initialized:
+            return
+        dt = timestamp - est._last_timestamp
+        if dt <= 0 or dt > _RESET_GAP_NS:
+            self._count_resets(np.array([dt]))
+            self._emit({"event": "heading_reset", "t": timestamp, "dt": dt * 1e-9})
+
+    def _count_resets(self, dt: np.ndarray) -> np.ndarray:
+        """Count the heading resets among sample gaps *dt*; returns their mask."""
+        backwards = dt <= 0
+        gap = dt > _RESET_GAP_NS
+        self.counters["heading_resets_backwards"] += int(np.count_nonzero(backwards))
+        self.counters["heading_resets_gap"] += int(np.count_nonzero(gap))
+        return backwards | gap
+
+    # -- batch path ---------------------------------------------------------
+
+    def process_batch(self, batch: SensorBatch):
+        engine = self.engine
+        n = len(batch)
+        if n == 0:
+            return
+        self.counters["samples"] += n
+        det = engine.step_detector
+        est = engine.orientation_estimator
+
+        t0 = time.perf_counter()
+        step_idx, step_len = det._detect_indices(batch.acc, batch.timestamp, self.counters)
+        t1 = time.perf_counter()
+        ts = batch.timestamp
+        if est._initialized:
+            dt = np.diff(ts, prepend=est._last_timestamp)
+            reset_idx = np.flatnonzero(self._count_resets(dt))
+        else:
+            dt = np.diff(ts, prepend=ts[0])
+            reset_idx = np.flatnonzero(self._count_resets(dt[1:])) + 1
+        headings = engine._fuse_headings(batch, step_idx)
+        t2 = time.perf_counter()
+        engine._advance(ts[step_idx], step_len, headings)
+        t3 = time.perf_counter()
+
+        self.seconds["step_detection"] += t1 - t0
+        self.seconds["orientation"] += t2 - t1
+        self.seconds["position"] += t3 - t2
+        self.counters["steps"] += len(step_idx)
+        if self.trace is not None:
+            self._emit_batch(step_idx, reset_idx, ts, dt)
+
+    def _emit_batch(self, step_idx: np.ndarray, reset_idx: np.ndarray,
+                    ts: np.ndarray, dt: np.ndarray):
+        """Emit a batch's step and heading-reset events in sample order.
+
+        Within one sample the step comes first, as in on_sensor_update
+        (step detection runs before the orientation update).
+        """
+        engine = self.engine
+        n0 = engine.step_detector.step_count - len(step_idx)
+        track = engine.track
+        rows = slice(len(track) - len(step_idx), len(track))
+        steps = [{"event": "step", "t": t, "n": n0 + k, "length": length,
+                  "heading": heading, "x": x, "z": z}
+                 for k, (t, length, heading, (x, z)) in enumerate(
+                     zip(track.timestamp[rows].tolist(), track.step_length[rows].tolist(),
+                         track.heading[rows].tolist(), track.xy[rows].tolist()), 1)]
+        resets = [{"event": "heading_reset", "t": t, "dt": d * 1e-9}
+                  for t, d in zip(ts[reset_idx].tolist(), dt[reset_idx].tolist())]
+        order = np.argsort(np.concatenate((step_idx * 2, reset_idx * 2 + 1)), kind="stable")
+        events = steps + resets
+        for k in order.tolist():
+            self.trace.emit(events[k])
+
+    # -- reporting ----------------------------------------------------------
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+    def to_dict(self) -> Dict:
+        return {"seconds": dict(self.seconds), "counters": dict(self.counters)}
+
+    def report(self, title: str = "Profile") -> str:
+        total = self.total_seconds
+        samples = self.counters["samples"]
+        rate = samples / total if total > 0 else 0.0
+        lines = [f"=== {title} — {samples} samples, {total * 1e3:.1f} ms ({rate:,.0f} samples/s) ==="]
+        for stage in STAGES:
+            s = self.seconds[stage]
+            share = s / total * 100 if total > 0 else 0.0
+            lines.append(f"  {stage:<26}: {s * 1e3:>9.2f} ms  {share:5.1f}%")
+        for name in COUNTERS[1:]:
+            lines.append(f"  {name:<26}: {self.counters[name]}")
+        if isinstance(self.trace, RingBufferTrace) and self.trace.dropped:
+            lines.append(f"  {'trace events dropped':<26}: {self.trace.dropped}")
+        return "\n".join(lines)
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Map matching — PDR steps snapped onto a garage floor plan (roadmap Phase 2, 地圖匹配).
+Usage:  python map_matching.py [--map maps/parking_b1.json] [--spec layouts/parking.json] [--seed 0]
+        python map_matching.py --synthetic 3x20x20 [--legs 300] [--seed 0]
+
+A garage map is JSON in the PDR frame (x east, z north, metres, origin
+where the walk starts):
+
+    {
+      "name": "B1",
+      "aisles": [{"id": "A1", "level": "B1", "points": [[0, 0], [0, 30], [-15, 30]]}],
+      "ramps":  [{"id": "R1", "from": "B1", "to": "B2", "points": [[-15, 30], [-15, 45]]}],
+      "bays":   [{"id": "B1-017", "level": "B1", "polygon": [[1, 5], [3.5, 5], [3.5, 10], [1, 10]]}],
+      "walls":  [{"level": "B1", "points": [[-2.5, 2.5], [-12.5, 2.5], [-12.5, 27.5]]}]
+    }
+
+Aisles and ramps form one undirected graph; polylines join where they
+share a vertex on the same level (a ramp's first vertex is on "from", its
+last on "to", the ones between on the ramp itself), so crossing aisles need
+a vertex at the crossing.  Levels may overlap in plan: a walker only
+changes level along a ramp, because matching follows the graph.  Walls
+(optional) are polylines a walker cannot cross — the outlines of parked-car
+blocks, pillars and the perimeter — used by particle_filter.
+
+MapMatcher is an HMM over candidate edges (Newson & Krumm): the emission
+score falls off with the distance from the observation to the edge
+(sigma), the transition score with the difference between the route
+distance along the graph and the PDR step length (beta).  Candidates are
+the edges within *radius* of the observation, found in O(log n) with the
+garage's SegmentTree.  Steps are matched as they arrive: add() / extend() /
+update() return the filtered (best-so-far) position, path() the Viterbi
+path over everything seen.  Observations are anchored: the PDR point plus
+an offset that follows matched − raw slowly (anchor_gain per step), so PDR
+drift never carries the walker out of the search radius, while a wrong
+turn picked at a junction is not locked in.  The offset's along-aisle part
+is only corrected at turns; when an observation has no edge within radius
+at all the offset is dropped and matching restarts from the raw PDR point.
+"""
+
+import sys, os, argparse, heapq, json, math, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from spatial_index import SegmentGrid, SegmentTree, as_xy, polyline_segments, project_to_segments
+
+MAPS_DIR = os.path.join(os.path.dirname(__file__), "maps")
+_PREFETCH = 256          # steps per batched candidate lookup in extend()
+
+
+# ---------------------------------------------------------------------------
+# Garage map
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Bay:
+    id: str
+    level: str
+    polygon: np.ndarray      # (k, 2)
+
+    def contains(self, x: float, z: float) -> bool:
+        """Even-odd rule."""
+        px, pz = self.polygon[:, 0], self.polygon[:, 1]
+        qx, qz = np.roll(px, -1), np.roll(pz, -1)
+        crosses = (pz > z) != (qz > z)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at = px + (z - pz) * (qx - px) / (qz - pz)
+        return bool(np.count_nonzero(crosses & (x < at)) % 2)
+
+
+class GarageMap:
+    """Aisle/ramp graph with a segment index, plus parking bays and walls."""
+
+    def __init__(self, name: str, nodes: np.ndarray, edges: np.ndarray, edge_level: Sequence[str],
+                 edge_way: Sequence[str], bays: Sequence[Bay] = (),
+                 walls: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None):
+        self.name = name
+        self.nodes = nodes                      # (v, 2)
+        self.edges = edges                      # (m, 2) node indices
+        self.edge_level = list(edge_level)
+        self.edge_way = list(edge_way)
+        self.a = nodes[edges[:, 0]]
+        self.b = nodes[edges[:, 1]]
+        self.length = np.hypot(*(self.b - self.a).T)
+        self._edge_list = edges.tolist()
+        self._length_list = self.length.tolist()
+        self.tree = SegmentTree(self.a, self.b)
+        self.adjacency: List[List[Tuple[int, float]]] = [[] for _ in range(len(nodes))]
+        for (u, v), length in zip(edges.tolist(), self.length.tolist()):
+            self.adjacency[u].append((v, length))
+            self.adjacency[v].append((u, length))
+        self.bays = list(bays)
+        self._bay_tree = None
+        self.walls = dict(walls or {})          # level -> (starts, ends)
+        self._wall_grids: Dict[Tuple[str, float], SegmentGrid] = {}
+        self._routes: Dict[int, Tuple[float, Dict[int, float]]] = {}
+
+    @classmethod
+    def from_dict(cls, doc: dict) -> "GarageMap":
+        index: Dict[Tuple[str, float, float], int] = {}
+        nodes: List[Tuple[float, float]] = []
+        edges, levels, ways = [], [], []
+
+        def node(level: str, x: float, z: float) -> int:
+            key = (level, round(x, 6), round(z, 6))
+            if key not in index:
+                index[key] = len(nodes)
+                nodes.append((x, z))
+            return index[key]
+
+        def add_way(way: str, points, vertex_levels: Sequence[str], edge_level: str) -> None:
+            pts = as_xy(points)
+            if len(pts) < 2:
+                raise ValueError(f"{way}: needs at least two points")
+            ids = [node(level, x, z) for level, (x, z) in zip(vertex_levels, pts.tolist())]
+            for u, v in zip(ids[:-1], ids[1:]):
+                if u != v:
+                    edges.append((u, v))
+                    levels.append(edge_level)
+                    ways.append(way)
+
+        for i, aisle in enumerate(doc.get("aisles", [])):
+            level = str(aisle.get("level", ""))
+            add_way(str(aisle.get("id", f"aisle {i}")), aisle["points"],
+                    [level] * len(aisle["points"]), level)
+        for i, ramp in enumerate(doc.get("ramps", [])):
+            way = str(ramp.get("id", f"ramp {i}"))
+            lo, hi = str(ramp["from"]), str(ramp["to"])
+            inner = [way] * (len(ramp["points"]) - 2)
+            add_way(way, ramp["points"], [lo] + inner + [hi], f"{lo}/{hi}")
+        if not edges:
+            raise ValueError("map has no aisles")
+        bays = [Bay(str(b.get("id", f"bay {i}")), str(b.get("level", "")), as_xy(b["polygon"]))
+                for i, b in enumerate(doc.get("bays", []))]
+        pieces: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        for wall in doc.get("walls", []):
+            pieces.setdefault(str(wall.get("level", "")), []).append(polyline_segments(wall["points"]))
+        walls = {level: (np.concatenate([a for a, _ in segs]), np.concatenate([b for _, b in segs]))
+                 for level, segs in pieces.items()}
+        return cls(str(doc.get("name", "garage")), np.array(nodes, dtype=np.float64),
+                   np.array(edges, dtype=np.intp), levels, ways, bays, walls)
+
+    @classmethod
+    def load(cls, path: str) -> "GarageMap":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    # -- routing --------------------------------------------------------------
+
+    def node_distances(self, source: int, limit: float) -> Dict[int, float]:
+        """Graph distance from *source* to every node within *limit* (Dijkstra, cached)."""
+        cached = self._routes.get(source)
+        if cached is not None and cached[0] >= limit:
+            return cached[1]
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        adjacency = self.adjacency
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, math.inf):
+                continue
+            for v, w in adjacency[u]:
+                nd = d + w
+                if nd <= limit and nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        self._routes[source] = (limit, dist)
+        return dist
+
+    def route_distance(self, e1: int, t1: float, e2: int, t2: float, limit: float) -> float:
+        """Shortest walk along the graph between two points on edges (inf beyond *limit*)."""
+        if e1 == e2:
+            return abs(t2 - t1) * self._length_list[e1]
+        l1, l2 = self._length_list[e1], self._length_list[e2]
+        u1, v1 = self._edge_list[e1]
+        u2, v2 = self._edge_list[e2]
+        best = math.inf
+        for a, off_a in ((u1, t1 * l1), (v1, (1 - t1) * l1)):
+            da = self.node_distances(a, limit)
+            for b, off_b in ((u2, t2 * l2), (v2, (1 - t2) * l2)):
+                d = da.get(b)
+                if d is not None and off_a + d + off_b < best:
+                    best = off_a + d + off_b
+        return best
+
+    def route_matrix(self, e1: np.ndarray, t1: np.ndarray, e2: np.ndarray, t2: np.ndarray,
+                     limit: float) -> np.ndarray:
+        """route_distance() for every pair of (e1[i], t1[i]) and (e2[j], t2[j])."""
+        ends1, ends2 = self.edges[e1], self.edges[e2]                  # (k, 2) node ids
+        off1 = np.column_stack((t1, 1 - t1)) * self.length[e1][:, None]
+        off2 = np.column_stack((t2, 1 - t2)) * self.length[e2][:, None]
+        src, src_idx = np.unique(ends1, return_inverse=True)
+        dst, dst_idx = np.unique(ends2, return_inverse=True)
+        src_idx, dst_idx = src_idx.reshape(-1, 2), dst_idx.reshape(-1, 2)
+        dst_list = dst.tolist()
+        inf = math.inf
+        nodes = np.array([[d.get(b, inf) for b in dst_list]
+                          for d in (self.node_distances(a, limit) for a in src.tolist())])
+        route = np.full((len(e1), len(e2)), inf)
+        for i in range(2):
+            for j in range(2):
+                np.minimum(route, off1[:, i, None] + nodes[src_idx[:, i]][:, dst_idx[:, j]]
+                           + off2[None, :, j], out=route)
+        same = e1[:, None] == e2[None, :]
+        if same.any():
+            along = np.abs(t2[None, :] - t1[:, None]) * self.length[e1][:, None]
+            route = np.where(same, along, route)
+        return route
+
+    # -- walls ----------------------------------------------------------------
+
+    def wall_grid(self, level: str, cell: float = 2.0) -> SegmentGrid:
+        """Crossing index over *level*'s walls (empty if it has none), built once."""
+        key = (level, cell)
+        if key not in self._wall_grids:
+            a, b = self.walls.get(level, (np.empty((0, 2)), np.empty((0, 2))))
+            self._wall_grids[key] = SegmentGrid(a, b, cell)
+        return self._wall_grids[key]
+
+    # -- bays -----------------------------------------------------------------
+
+    def nearest_bay(self, x: float, z: float, level: Optional[str] = None
+                    ) -> Tuple[Optional[Bay], float]:
+        """Closest bay (on *level*, if given) and its distance (0 inside)."""
+        if not self.bays:
+            return None, math.inf
+        if self._bay_tree is None:
+            starts, ends, owner = [], [], []
+            for i, bay in enumerate(self.bays):
+                starts.append(bay.polygon)
+                ends.append(np.roll(bay.polygon, -1, axis=0))
+                owner.append(np.full(len(bay.polygon), i))
+            self._bay_owner = np.concatenate(owner)
+            self._bay_tree = SegmentTree(np.concatenate(starts), np.concatenate(ends))
+        radius = 10.0
+        while True:
+            _, seg, d, _ = self._bay_tree.within([(x, z)], radius)
+            for s, dist in zip(seg.tolist(), d.tolist()):
+                bay = self.bays[self._bay_owner[s]]
+                if level is None or bay.level == level:
+                    return bay, 0.0 if bay.contains(x, z) else dist
+            if len(seg) == len(self._bay_owner) or radius > 1e6:
+                return None, math.inf
+            radius *= 4
+
+
+# ---------------------------------------------------------------------------
+# HMM matcher
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _Step:
+    obs: np.ndarray          # (2,) anchored observation
+    edge: np.ndarray         # (k,) candidate edges (k = 0: unmatched)
+    t: np.ndarray            # (k,) position along each edge
+    proj: np.ndarray         # (k, 2) candidate points
+    score: np.ndarray        # (k,) log-probability of the best path ending here
+    back: np.ndarray         # (k,) best predecessor in the previous step, -1 at a chain start
+
+
+class MapMatcher:
+    def __init__(self, garage: GarageMap, radius: float = 6.0, sigma: float = 2.0, beta: float = 1.0,
+                 max_candidates: int = 8, max_route: float = 30.0, anchor_gain: float = 0.1,
+                 start_level: Optional[str] = None):
+        """*max_route*: longest graph distance considered between consecutive
+        candidates (farther pairs cannot follow each other).  *anchor_gain*:
+        fraction of the matched − raw difference taken into the observation
+        offset per step (0: match raw PDR points).  *start_level* settles
+        which of several overlapping levels the walk starts on."""
+        self.garage = garage
+        self.radius = radius
+        self.sigma = sigma
+        self.beta = beta
+        self.max_candidates = max_candidates
+        self.max_route = max_route
+        self.anchor_gain = anchor_gain
+        self.start_level = start_level
+        self.reset()
+
+    def reset(self):
+        self.steps: List[_Step] = []
+        self.breaks = 0
+        self.lookups = 0                 # index queries (batched ones count once)
+        self._offset = np.zeros(2)       # matched minus raw, for anchoring
+        self._last_raw: Optional[np.ndarray] = None
+        self._level = self.start_level
+        self._consumed = 0               # TrajectoryBuffer rows already matched
+
+    # -- feeding --------------------------------------------------------------
+
+    def add(self, point) -> Tuple[float, float]:
+        """Match one PDR point; returns the filtered position."""
+        x, z = self.extend(as_xy(point))[0].tolist()
+        return x, z
+
+    def extend(self, points) -> np.ndarray:
+        """Match consecutive PDR points; (n, 2) filtered positions."""
+        p = as_xy(points)
+        out = np.empty((len(p), 2))
+        for lo in range(0, len(p), _PREFETCH):
+            chunk = p[lo:lo + _PREFETCH]
+            # One index walk for the chunk, with the radius widened by as much
+            # as the anchoring offset may still move; step() falls back to a
+            # single-point query if that was not enough.
+            qi, seg, _, _ = self.garage.tree.within(chunk + self._offset, 2 * self.radius)
+            self.lookups += 1
+            bounds = np.searchsorted(qi, np.arange(len(chunk) + 1))
+            for i in range(len(chunk)):
+                out[lo + i] = self._step(chunk[i], seg[bounds[i]:bounds[i + 1]])
+        return out
+
+    def update(self, track) -> np.ndarray:
+        """Match the rows of a pdr_engine.TrajectoryBuffer added since the last call."""
+        total = track.dropped + len(track)
+        new = total - self._consumed
+        if new < 0:                      # the buffer was reset
+            new = total
+        self._consumed = total
+        return self.extend(track.xy[max(len(track) - new, 0):])
+
+    # -- HMM ------------------------------------------------------------------
+
+    def _candidates(self, obs: np.ndarray, edges: np.ndarray):
+        g = self.garage
+        if len(edges):
+            d, t = project_to_segments(obs, g.a[edges], g.b[edges])
+            keep = d <= self.radius
+            edges, d, t = edges[keep], d[keep], t[keep]
+        if not len(edges):
+            _, edges, d, t = g.tree.within(obs[None, :], self.radius)
+            self.lookups += 1
+        return edges, d, t
+
+    def _step(self, raw: np.ndarray, prefetched: np.ndarray) -> np.ndarray:
+        obs = raw + self._offset
+        edges, d, t = self._candidates(obs, prefetched)
+        prev = self.steps[-1] if self.steps else None
+        step_len = 0.0 if self._last_raw is None else float(np.hypot(*(raw - self._last_raw)))
+        self._last_raw = raw.copy()
+        if not len(edges):
+            self.steps.append(_Step(obs, edges, t, np.empty((0, 2)), np.empty(0),
+                                    np.empty(0, dtype=np.intp)))
+            self.breaks += prev is not None and len(prev.edge) > 0
+            # Off every aisle: the anchor itself is suspect, fall back to raw PDR.
+            self._offset[:] = 0.0
+            return obs
+
+        g = self.garage
+        score = -0.5 * (d / self.sigma) ** 2
+        back = np.full(len(edges), -1, dtype=np.intp)
+        if prev is not None and len(prev.edge):
+            route = g.route_matrix(prev.edge, prev.t, edges, t, self.max_route)
+            total = prev.score[:, None] - np.abs(route - step_len) / self.beta
+            best = total.max(axis=0)
+            # Candidates no previous one can reach are dropped (e.g. the same
+            # aisle on another level); if none is reachable the chain breaks.
+            reachable = np.isfinite(best)
+            if reachable.any():
+                edges, t = edges[reachable], t[reachable]
+                back = total.argmax(axis=0)[reachable]
+                score = best[reachable] + score[reachable]
+            else:
+                self.breaks += 1
+                prev = None
+        if prev is None or not len(prev.edge):
+            # A new chain starts on the level the walker was last matched on.
+            on_level = np.array([g.edge_level[e] == self._level for e in edges.tolist()], dtype=bool)
+            if on_level.any():
+                edges, t, score, back = edges[on_level], t[on_level], score[on_level], back[on_level]
+        keep = np.argsort(-score, kind="stable")[:self.max_candidates]
+        edges, t, score, back = edges[keep], t[keep], score[keep], back[keep]
+        proj = g.a[edges] + t[:, None] * (g.b[edges] - g.a[edges])
+        score = score - score[0]
+        self.steps.append(_Step(obs, edges, t, proj, score, back))
+        matched = proj[0]
+        self._level = g.edge_level[int(edges[0])]
+        self._offset += self.anchor_gain * (matched - raw - self._offset)
+        return matched
+
+    # -- results --------------------------------------------------------------
+
+    def path(self) -> np.ndarray:
+        """(n, 2) Viterbi path over every step so far (observations where unmatched)."""
+        out, _ = self._backtrace()
+        return out
+
+    def path_edges(self) -> np.ndarray:
+        """Matched edge per step of path(), -1 where unmatched."""
+        _, edges = self._backtrace()
+        return edges
+
+    def _backtrace(self) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(self.steps)
+        out = np.empty((n, 2))
+        edges = np.full(n, -1, dtype=np.intp)
+        cur = -1
+        for i in range(n - 1, -1, -1):
+            s = self.steps[i]
+            if not len(s.edge):
+                out[i] = s.obs
+                cur = -1
+                continue
+            if cur < 0:
+                cur = int(s.score.argmax())
+            out[i] = s.proj[cur]
+            edges[i] = s.edge[cur]
+            cur = int(s.back[cur])
+        return out, edges
+
+
+# ---------------------------------------------------------------------------
+# Synthetic garages
+# ---------------------------------------------------------------------------
+
+def synthetic_garage(levels: int = 3, rows: int = 20, cols: int = 20, spacing: float = 16.0) -> dict:
+    """Grid garage: aisles along every row and column of each level, a ramp
+    at the east edge between consecutive levels, 2.5 × 5 m bays on both
+    sides of the row aisles, and walls around every block of bays (6 m row
+    and 5 m column aisles) and around the level, open at the ramp mouths."""
+    width, depth = (cols - 1) * spacing, (rows - 1) * spacing
+    xs = [c * spacing for c in range(cols)]
+    zs = [r * spacing for r in range(rows)]
+    doc = {"name": f"Synthetic {levels}x{rows}x{cols}", "aisles": [], "ramps": [], "bays": [],
+           "walls": []}
+    for k in range(levels):
+        level = f"B{k + 1}"
+        for r, z in enumerate(zs):
+            doc["aisles"].append({"id": f"{level}-R{r}", "level": level, "points": [[x, z] for x in xs]})
+        for c, x in enumerate(xs):
+            doc["aisles"].append({"id": f"{level}-C{c}", "level": level, "points": [[x, z] for z in zs]})
+        if k + 1 < levels:
+            doc["ramps"].append({"id": f"{level}-ramp", "from": level, "to": f"B{k + 2}",
+                                 "points": [[width, 0], [width + 6, 0], [width + 6, spacing],
+                                            [width, spacing]]})
+        for r, z in enumerate(zs):
+            for c in range(cols - 1):
+                for j in range(int((spacing - 5) // 2.5)):
+                    x0 = xs[c] + 2.5 + j * 2.5
+                    for side, (z0, z1) in (("N", (z + 3, z + 8)), ("S", (z - 8, z - 3))):
+                        doc["bays"].append({"id": f"{level}-{r}{side}-{c}-{j}", "level": level,
+                                            "polygon": [[x0, z0], [x0 + 2.5, z0],
+                                                        [x0 + 2.5, z1], [x0, z1]]})
+        for z in zs[:-1]:
+            for x in xs[:-1]:
+                x0, x1, z0, z1 = x + 2.5, x + spacing - 2.5, z + 3, z + spacing - 3
+                doc["walls"].append({"level": level,
+                                     "points": [[x0, z0], [x1, z0], [x1, z1], [x0, z1], [x0, z0]]})
+        east = width + 3
+        doc["walls"].append({"level": level, "points": [[east, spacing + 3], [east, depth + 3],
+                                                        [-3, depth + 3], [-3, -3], [east, -3]]})
+        doc["walls"].append({"level": level, "points": [[east, 3], [east, spacing - 3]]})
+    return doc
+
+
+def grid_walk_spec(rows: int, cols: int, spacing: float, legs: int, rng) -> dict:
+    """DSL spec for a random walk along a grid garage's aisles (no U-turns)."""
+    moves = {0: (0, 1), 90: (1, 0), 180: (0, -1), 270: (-1, 0)}
+    r, c = rows // 2, cols // 2
+    segments, heading = [], None
+    for _ in range(legs):
+        options = [h for h, (dc, dr) in moves.items()
+                   if 0 <= r + dr < rows and 0 <= c + dc < cols
+                   and (heading is None or h != (heading + 180) % 360)]
+        heading = options[int(rng.integers(len(options)))]
+        dc, dr = moves[heading]
+        c, r = c + dc, r + dr
+        segments.append({"walk": {"heading": heading, "distance": spacing}})
+    return {"name": f"Grid walk {legs} legs", "start": {"x": (cols // 2) * spacing,
+                                                        "z": (rows // 2) * spacing},
+            "segments": segments, "threshold": 5.0}
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def match_scenario(garage: GarageMap, compiled, matcher: MapMatcher, chunk_size: int = 4096,
+                   rng=None):
+    """Run a compiled DSL scenario through PDREngine chunk by chunk, matching
+    the new steps after every chunk.  *rng* is the np.random.Generator the
+    stream is drawn from.  Returns (engine, raw, matched, seconds spent
+    matching)."""
+    from pdr_engine import PDREngine
+
+    engine = PDREngine(compiled.engine_config())
+    engine.pos_x, engine.pos_z = compiled.ground_truth[0]
+    engine.track.reset(engine.position)
+    spent = 0.0
+    for batch, _ in compiled.stream(chunk_size, rng):
+        engine.process_batch(batch)
+        t0 = time.perf_counter()
+        matcher.update(engine.track)
+        spent += time.perf_counter() - t0
+    return engine, engine.trajectory_array, matcher.path(), spent
+
+
+def main(argv=None):
+    from scenario_dsl import compile_scenario, load_specs
+    from scenarios import run_seed
+    from validator import validate_matched
+
+    ap = argparse.ArgumentParser(description="Map-match PDR trajectories onto a garage map")
+    ap.add_argument("--map", default=os.path.join(MAPS_DIR, "parking_b1.json"))
+    ap.add_argument("--spec", default=os.path.join(os.path.dirname(__file__), "layouts", "parking.json"))
+    ap.add_argument("--synthetic", metavar="LxRxC",
+                    help="use a synthetic grid garage (levels x rows x cols) and a random walk")
+    ap.add_argument("--legs", type=int, default=300, help="legs of the synthetic walk")
+    ap.add_argument("--radius", type=float, default=6.0)
+    ap.add_argument("--sigma", type=float, default=2.0)
+    ap.add_argument("--beta", type=float, default=1.0)
+    ap.add_argument("--level", help="level the walk starts on (default: the first one)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.synthetic:
+        levels, rows, cols = (int(v) for v in args.synthetic.lower().split("x"))
+        t0 = time.perf_counter()
+        garage = GarageMap.from_dict(synthetic_garage(levels, rows, cols))
+        build = time.perf_counter() - t0
+        spec = grid_walk_spec(rows, cols, 16.0, args.legs, np.random.default_rng(args.seed))
+    else:
+        t0 = time.perf_counter()
+        garage = GarageMap.load(args.map)
+        build = time.perf_counter() - t0
+        spec = load_specs(args.spec)[0]
+    compiled = compile_scenario(spec)
+    print(f"{garage.name}: {len(garage):,} edges, {len(garage.bays):,} bays "
+          f"(graph + index built in {build * 1e3:.0f} ms)")
+
+    matcher = MapMatcher(garage, args.radius, args.sigma, args.beta,
+                         start_level=args.level or garage.edge_level[0])
+    engine, raw, matched, spent = match_scenario(
+        garage, compiled, matcher, rng=np.random.default_rng(run_seed(args.seed, 0, 0)))
+    comparison = validate_matched(compiled.name, raw, matched, list(compiled.ground_truth),
+                                  engine.step_detector.step_count, compiled.total_distance,
+                                  compiled.threshold, compiled.metric)
+    print(comparison.report())
+    steps = len(matcher.steps)
+    print(f"  Matching       : {steps:,} steps, {steps / max(spent, 1e-9):,.0f} steps/s, "
+          f"{matcher.lookups} index queries, {matcher.breaks} breaks")
+    edges = matcher.path_edges()
+    if len(edges) and edges[-1] >= 0:
+        x, z = matched[-1]
+        bay, dist = garage.nearest_bay(x, z, garage.edge_level[edges[-1]])
+        if bay is not None:
+            print(f"  End            : {garage.edge_way[edges[-1]]} ({garage.edge_level[edges[-1]]}), "
+                  f"nearest bay {bay.id} at {dist:.1f} m")
+    return 0 if comparison.matched.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
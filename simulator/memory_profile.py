@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Memory profile — peak RSS, tracemalloc peak and top allocation sites per phase.
+Usage:  python memory_profile.py [--sizes 10000,100000,1000000] [--api batch,list]
+                                 [--no-plot] [--top 10] [--baseline base.json]
+                                 [--save-baseline] [--require-baseline] [--tolerance 0.25]
+
+Each run is split into phases (generation, engine, validation, plotting).
+For every phase the report holds the peak resident set size, the tracemalloc
+peak over the phase's starting point, the memory still held at its end, the
+net number of allocated blocks and the peak bytes per processed sample, and
+the source lines that account for most of the retained growth.  Results are
+written as JSON; with a baseline, any (api, size, phase) whose peak grew by
+more than --tolerance is a regression and the exit status is 1.
+Without a baseline file the check is skipped and says so; the exit status
+is then 0, or 2 with --require-baseline (for CI, where a missing baseline
+must not pass silently).
+
+Both engine front-ends are profiled: "batch" (SensorBatch + process_batch)
+and "list" (the legacy list of SensorData + on_sensor_update, with the
+trajectory read back as a list of tuples).
+
+Peak RSS is per phase where the kernel lets the high-water mark be reset
+(/proc/self/clear_refs); elsewhere it is the process peak so far.
+"""
+
+import sys, os, argparse, json, math, platform, time, tracemalloc
+sys.path.insert(0, os.path.dirname(__file__))
+
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_OUT = os.path.join(RESULTS_DIR, "memory.json")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "memory_baseline.json")
+APIS = ("batch", "list")
+SCHEMA_VERSION = 1
+
+# Frames inside these files are bookkeeping, not the code being profiled.
+_IGNORE = (tracemalloc.__file__, "<frozen importlib._bootstrap>",
+           "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+# ---------------------------------------------------------------------------
+# Resident set size
+# ---------------------------------------------------------------------------
+
+def _rss_bytes() -> int:
+    """Current resident set size (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark; False when not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    """RSS high-water mark (VmHWM), or ru_maxrss when /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ---------------------------------------------------------------------------
+# Per-phase measurement
+# ---------------------------------------------------------------------------
+
+@dataclass
+class AllocationSite:
+    where: str          # "file.py:line"
+    size: int           # bytes allocated here during the phase and still held
+    count: int          # blocks allocated here during the phase and still held
+
+
+@dataclass
+class PhaseMemory:
+    phase: str
+    samples: int
+    seconds: float
+    rss_start: int
+    rss_end: int
+    rss_peak: int
+    rss_peak_scope: str          # "phase" or "process"
+    traced_peak: int             # most bytes allocated in the phase and held at once
+    traced_retained: int         # bytes allocated in the phase still held at its end
+    net_blocks: int              # sys.getallocatedblocks() delta
+    top: List[AllocationSite] = field(default_factory=list)
+
+    @property
+    def peak_bytes_per_sample(self) -> float:
+        return self.traced_peak / self.samples if self.samples else 0.0
+
+    @property
+    def blocks_per_sample(self) -> float:
+        return self.net_blocks / self.samples if self.samples else 0.0
+
+    def to_dict(self) -> Dict:
+        return dict(asdict(self), peak_bytes_per_sample=self.peak_bytes_per_sample,
+                    blocks_per_sample=self.blocks_per_sample)
+
+
+class MemoryProfiler:
+    """Records a PhaseMemory per ``with profiler.phase(name, samples):`` block.
+
+        prof = MemoryProfiler()
+        with prof.phase("engine", samples=len(batch)):
+            engine.process_batch(batch)
+        print(prof.report("Parking"))
+
+    tracemalloc is restarted for every phase and stopped after it, so a phase
+    sees only its own allocations: the traced peak is the most it held at
+    once, and whatever it frees from earlier phases is not credited.
+    Starting afresh also keeps the end-of-phase snapshot as small as the
+    phase's survivors (snapshots of millions of traces take minutes).
+    Phases must not nest, and tracemalloc must not already be tracing (e.g.
+    under ``python -X tracemalloc``): phase() raises RuntimeError rather
+    than discard the caller's traces.
+    """
+
+    def __init__(self, top: int = 10, frames: int = 1):
+        self.top = top
+        self.frames = frames
+        self.phases: List[PhaseMemory] = []
+
+    @contextmanager
+    def phase(self, name: str, samples: int = 0) -> Iterator[None]:
+        if tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is already tracing (nested phase or -X tracemalloc); "
+                               "MemoryProfiler needs it to itself")
+        scoped = _reset_peak_rss()
+        rss_start = _rss_bytes()
+        blocks_start = sys.getallocatedblocks()
+        tracemalloc.start(self.frames)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            traced_end, traced_peak = tracemalloc.get_traced_memory()
+            blocks_end = sys.getallocatedblocks()
+            rss_end = _rss_bytes()
+            rss_peak = _peak_rss_bytes()
+            top = self._top_sites() if self.top else []
+            tracemalloc.stop()
+            self.phases.append(PhaseMemory(
+                name, samples, seconds, rss_start, rss_end, rss_peak,
+                "phase" if scoped else "process",
+                traced_peak, traced_end, blocks_end - blocks_start, top))
+
+    def _top_sites(self) -> List[AllocationSite]:
+        stats = tracemalloc.take_snapshot().statistics("lineno")
+        sites = [s for s in stats if s.traceback[0].filename not in _IGNORE][:self.top]
+        return [AllocationSite(f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                               s.size, s.count)
+                for s in sites]
+
+    def set_samples(self, samples: int):
+        """Backfill the sample count of phases recorded before it was known."""
+        for p in self.phases:
+            if not p.samples:
+                p.samples = samples
+
+    def to_dict(self) -> Dict:
+        return {"phases": [p.to_dict() for p in self.phases]}
+
+    def report(self, title: str = "Memory", sites: int = 3) -> str:
+        lines = [f"=== {title} ===",
+                 f"  {'phase':<12}{'seconds':>9}{'RSS peak':>11}{'traced peak':>13}"
+                 f"{'retained':>11}{'B/sample':>10}{'blocks/smp':>12}"]
+        for p in self.phases:
+            lines.append(f"  {p.phase:<12}{p.seconds:>9.3f}{_mb(p.rss_peak):>11}"
+                         f"{_mb(p.traced_peak):>13}{_mb(p.traced_retained):>11}"
+                         f"{p.peak_bytes_per_sample:>10.1f}{p.blocks_per_sample:>12.2f}")
+            for s in p.top[:sites]:
+                lines.append(f"      {s.where:<36}{_mb(s.size):>11}  {s.count:>10,} blocks")
+        if any(p.rss_peak_scope == "process" for p in self.phases):
+            lines.append("  (RSS peak is the process peak so far — high-water mark cannot be reset)")
+        return "\n".join(lines)
+
+
+def _mb(n: float) -> str:
+    if abs(n) < 2 ** 20:
+        return f"{n / 2 ** 10:.1f} kB"
+    return f"{n / 2 ** 20:.1f} MB"
+
+
+# ---------------------------------------------------------------------------
+# Scale runs
+# ---------------------------------------------------------------------------
+
+_SQUARE = [(h, 40.0) for h in (0.0, math.pi / 2, math.pi, 3 * math.pi / 2)]
+
+
+def profile_run(n: int, api: str = "batch", plot: bool = True, top: int = 10,
+                seed: int = 0) -> Tuple[int, MemoryProfiler]:
+    """Walk the 40 m square until *n* samples and profile every phase.
+
+    Returns (samples actually processed, profiler).  The ground truth covers
+    the whole loops generated, so errors are only indicative.
+    """
+    from pdr_engine import PDREngine
+    import path_simulator as ps
+    from validator import validate
+
+    if api not in APIS:
+        raise ValueError(f"unknown api {api!r}; expected one of {APIS}")
+    prof = MemoryProfiler(top)
+    rng = np.random.default_rng(seed)
+    per_loop = len(ps.simulate_legs_batch(_SQUARE, noise_scale=0.0)[0])
+    loops = max(1, math.ceil(n / per_loop))
+    with prof.phase("generation", samples=n):
+        batch, gt = ps.simulate_legs_batch(_SQUARE * loops, rng=rng)
+        batch = batch[:n]
+        samples = list(batch.as_samples()) if api == "list" else batch
+    n = len(batch)
+    del batch
+
+    with prof.phase("engine", samples=n):
+        engine = PDREngine()
+        if api == "list":
+            for s in samples:
+                engine.on_sensor_update(s)
+        else:
+            engine.process_batch(samples)
+
+    with prof.phase("validation", samples=n):
+        traj = list(engine.trajectory) if api == "list" else engine.trajectory_array
+        result = validate("memory", traj, gt, engine.step_detector.step_count,
+                          160.0 * loops, math.inf)
+
+    if plot:
+        # matplotlib's one-off import would swamp the per-sample numbers.
+        from visualizer import plot_trajectory, pyplot
+        pyplot()
+        with prof.phase("plotting", samples=n):
+            path = plot_trajectory("memory", traj, gt, result.endpoint_error,
+                                   filename="_memory_profile.png")
+        os.remove(path)
+    return n, prof
+
+
+@dataclass
+class ScaleRow:
+    api: str
+    n: int
+    phases: List[PhaseMemory]
+
+
+def run_scale(sizes: Sequence[int], apis: Sequence[str], plot: bool = True, top: int = 10,
+              log=print) -> List[ScaleRow]:
+    rows = []
+    for api in apis:
+        for n in sizes:
+            t0 = time.perf_counter()
+            got, prof = profile_run(n, api, plot, top)
+            rows.append(ScaleRow(api, got, prof.phases))
+            peak = max(p.traced_peak for p in prof.phases)
+            log(f"  {api:<6} n={got:<10,} traced peak {_mb(peak):>10}  "
+                f"({time.perf_counter() - t0:.1f} s)")
+    return rows
+
+
+def format_table(rows: Sequence[ScaleRow]) -> str:
+    """Traced peak per phase for every (api, size), plus bytes per sample."""
+    phases = []
+    for r in rows:
+        phases += [p.phase for p in r.phases if p.phase not in phases]
+    header = f"{'api':<7}{'samples':>10}" + "".join(f"{p:>14}" for p in phases) + f"{'B/sample':>10}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        by = {p.phase: p for p in r.phases}
+        cells = "".join(f"{_mb(by[p].traced_peak) if p in by else '':>14}" for p in phases)
+        worst = max(p.peak_bytes_per_sample for p in r.phases)
+        lines.append(f"{r.api:<7}{r.n:>10,}{cells}{worst:>10.0f}")
+    return "\n".join(lines)
+
+
+def format_sites(rows: Sequence[ScaleRow], sites: int = 3) -> str:
+    """Top retained allocation sites per phase at the largest size of each api."""
+    lines = []
+    for api in dict.fromkeys(r.api for r in rows):
+        r = max((r for r in rows if r.api == api), key=lambda r: r.n)
+        lines.append(f"{api} @ {r.n:,} samples:")
+        for p in r.phases:
+            for s in p.top[:sites]:
+                lines.append(f"  {p.phase:<12}{s.where:<36}{_mb(s.size):>11}  {s.count:>10,} blocks")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# JSON and baselines
+# ---------------------------------------------------------------------------
+
+def to_json(rows: Sequence[ScaleRow]) -> Dict:
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": [{"api": r.api, "n": r.n, "phases": [p.to_dict() for p in r.phases]}
+                    for r in rows],
+    }
+
+
+def save(path: str, rows: Sequence[ScaleRow]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(to_json(rows), f, indent=2)
+
+
+def load(path: str) -> Dict[Tuple[str, int, str], int]:
+    """(api, n, phase) -> traced peak bytes of a saved run."""
+    with open(path) as f:
+        data = json.load(f)
+    return {(r["api"], r["n"], p["phase"]): p["traced_peak"]
+            for r in data["results"] for p in r["phases"]}
+
+
+@dataclass
+class Comparison:
+    api: str
+    n: int
+    phase: str
+    peak: int
+    baseline_peak: int
+    tolerance: float
+
+    @property
+    def ratio(self) -> float:
+        return self.peak / self.baseline_peak if self.baseline_peak else 1.0
+
+    @property
+    def regressed(self) -> bool:
+        return self.ratio > 1.0 + self.tolerance
+
+
+def compare(rows: Sequence[ScaleRow], baseline: Dict[Tuple[str, int, str], int],
+            tolerance: float = 0.25) -> List[Comparison]:
+    """Pair up (api, size, phase) entries present in both runs."""
+    return [Comparison(r.api, r.n, p.phase, p.traced_peak, baseline[(r.api, r.n, p.phase)], tolerance)
+            for r in rows for p in r.phases if (r.api, r.n, p.phase) in baseline]
+
+
+def format_comparison(comparisons: Sequence[Comparison]) -> str:
+    lines = []
+    for c in comparisons:
+        flag = "REGRESSED" if c.regressed else "ok"
+        lines.append(f"  {c.api:<6} n={c.n:<10,} {c.phase:<12} {c.ratio * 100:>6.1f}% of baseline  {flag}")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Per-phase memory profile at growing stream lengths")
+    ap.add_argument("--sizes", type=lambda s: [int(float(x)) for x in s.split(",")],
+                    default=list(DEFAULT_SIZES), help="comma-separated stream lengths")
+    ap.add_argument("--api", type=lambda s: s.split(","), default=list(APIS),
+                    help="comma-separated engine front-ends: batch, list")
+    ap.add_argument("--no-plot", action="store_true", help="skip the plotting phase")
+    ap.add_argument("--top", type=int, default=10, help="allocation sites kept per phase")
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--require-baseline", action="store_true",
+                    help="exit with 2 when there is no baseline to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="allowed fractional growth of a phase's traced peak vs baseline")
+    args = ap.parse_args(argv)
+    unknown = [a for a in args.api if a not in APIS]
+    if unknown:
+        ap.error(f"unknown --api {unknown}; expected {', '.join(APIS)}")
+
+    print(f"Memory profile (sizes {', '.join(f'{n:,}' for n in args.sizes)})")
+    rows = run_scale(args.sizes, args.api, not args.no_plot, args.top)
+    print()
+    print(format_table(rows))
+    print()
+    print(format_sites(rows))
+    save(args.out, rows)
+    print(f"\nResults saved to: {args.out}")
+
+    if args.save_baseline:
+        save(args.baseline, rows)
+        print(f"Baseline saved to: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}: regression check SKIPPED "
+              f"(create one with --save-baseline)")
+        return 2 if args.require_baseline else 0
+
+    comparisons = compare(rows, load(args.baseline), args.tolerance)
+    regressions = [c for c in comparisons if c.regressed]
+    print(f"\nBaseline {args.baseline} (tolerance {args.tolerance * 100:.0f}%):")
+    print(format_comparison(comparisons))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo accuracy runner — every scenario N times with independent seeds.
+Usage:  python monte_carlo.py [--runs 1000] [--workers 4] [--seed 0] [--scenario NAME ...] [--cache]
+
+Run *i* of scenario *s* is seeded from SeedSequence(seed, spawn_key=(s, i)),
+so results depend only on the master seed, never on the worker count or on
+how runs are chunked.  Workers return (runs × fields) float arrays, not
+trajectories.
+"""
+
+import sys, os, argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from pdr_engine import PDREngine
+from scenarios import SCENARIOS, run_seed
+from stream_cache import DEFAULT_CACHE_DIR, StreamCache
+from validator import validate
+
+FIELDS = ("endpoint_error", "closure_error", "max_error", "avg_error", "step_count_pdr", "passed")
+PERCENTILES = (50, 90, 99)
+SUMMARY_FIELDS = ("endpoint_error", "closure_error", "max_error")
+
+
+def _run_chunk(scenario_idx: int, master_seed: int, start: int, stop: int,
+               cache_dir: Optional[str] = None) -> np.ndarray:
+    """Worker entry point: metrics for runs [start, stop) as a float array."""
+    sc = SCENARIOS[scenario_idx]
+    cache = StreamCache(cache_dir) if cache_dir else None
+    out = np.empty((stop - start, len(FIELDS)))
+    for row, run in enumerate(range(start, stop)):
+        batch, gt = sc.generate(run_seed(master_seed, scenario_idx, run), cache)
+        engine = PDREngine(sc.engine_config())
+        engine.process_batch(batch)
+        r = validate(sc.name, engine.trajectory_array, gt, engine.step_detector.step_count,
+                     sc.total_distance, sc.threshold, sc.metric)
+        out[row] = [getattr(r, f) for f in FIELDS]
+    return out
+
+
+@dataclass
+class MonteCarloSummary:
+    scenario: str
+    runs: int
+    pass_rate: float
+    percentiles: Dict[str, Dict[int, float]]  # field -> {p: value}
+    metrics: np.ndarray  # (runs, len(FIELDS)), in run order
+
+    def report(self) -> str:
+        lines = [f"=== {self.scenario} — {self.runs} runs, pass rate {self.pass_rate * 100:.1f}% ==="]
+        header = "".join(f"{'p' + str(p):>9}" for p in PERCENTILES)
+        lines.append(f"  {'':<16}{header}")
+        for name in SUMMARY_FIELDS:
+            vals = "".join(f"{self.percentiles[name][p]:>8.2f}m" for p in PERCENTILES)
+            lines.append(f"  {name:<16}{vals}")
+        return "\n".join(lines)
+
+
+def summarize(scenario: str, metrics: np.ndarray) -> MonteCarloSummary:
+    pct = {
+        name: dict(zip(PERCENTILES, np.percentile(metrics[:, FIELDS.index(name)], PERCENTILES).tolist()))
+        for name in SUMMARY_FIELDS
+    }
+    pass_rate = float(metrics[:, FIELDS.index("passed")].mean()) if len(metrics) else 0.0
+    return MonteCarloSummary(scenario, len(metrics), pass_rate, pct, metrics)
+
+
+def run_monte_carlo(runs: int = 1000, workers: Optional[int] = None, seed: int = 0,
+                    scenario_names: Optional[Sequence[str]] = None,
+                    chunk_size: int = 25, cache_dir: Optional[str] = None
+                    ) -> List[MonteCarloSummary]:
+    """Run each selected scenario *runs* times and summarise the metrics.
+
+    With *cache_dir*, streams are generated once into a StreamCache and
+    memory-mapped on later runs with the same master seed.
+    """
+    indices = [i for i, sc in enumerate(SCENARIOS)
+               if not scenario_names or sc.name in scenario_names]
+    tasks = [(i, start, min(start + chunk_size, runs))
+             for i in indices for start in range(0, runs, chunk_size)]
+
+    if workers == 1:
+        chunks = [_run_chunk(i, seed, a, b, cache_dir) for i, a, b in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, i, seed, a, b, cache_dir) for i, a, b in tasks]
+            chunks = [f.result() for f in futures]
+
+    per_scenario: Dict[int, List[np.ndarray]] = {i: [] for i in indices}
+    for (i, _, _), chunk in zip(tasks, chunks):
+        per_scenario[i].append(chunk)
+    return [summarize(SCENARIOS[i].name, np.concatenate(per_scenario[i]))
+            for i in indices]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Monte Carlo PDR accuracy runner")
+    ap.add_argument("--runs", type=int, default=1000, help="runs per scenario")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--seed", type=int, default=0, help="master seed")
+    ap.add_argument("--scenario", action="append", help="only run this scenario (repeatable)")
+    ap.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, default=None, metavar="DIR",
+                    help="reuse generated streams from a stream cache")
+    args = ap.parse_args(argv)
+
+    summaries = run_monte_carlo(args.runs, args.workers, args.seed, args.scenario,
+                                cache_dir=args.cache)
+    print("\n" + "=" * 60)
+    print(f"PDR MONTE CARLO — {args.runs} runs/scenario, seed {args.seed}")
+    print("=" * 60)
+    for s in summaries:
+        print()
+        print(s.report())
+
+
+if __name__ == "__main__":
+    main()
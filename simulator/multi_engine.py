@@ -0,0 +1,230 @@
+"""
+MultiPDREngine — N independent PDR walkers advanced in lock-step as arrays.
+
+State that PDREngine keeps in Python objects (StepDetector window list,
+OrientationEstimator scalars, position) lives here in (n,) and (n, 29)
+arrays, and every tick updates all active walkers with a handful of NumPy
+operations.  Results are bit-identical to running one PDREngine per
+walker: magnetometer headings go through math.atan2 (np.arctan2 can differ
+in the last ulp), and the rare per-step work (Weinberg length, sin/cos of
+the heading, trajectory append) runs in Python scalars exactly as in the
+engine.
+"""
+
+import math
+import numpy as np
+from typing import List, Optional, Sequence, Tuple, Union
+
+from pdr_engine import PDRConfig, SensorBatch, window_samples
+
+WINDOW = 30             # StepDetector window at the default 0.6 s × 50 Hz
+_GRAVITY = 9.81         # as in StepDetector
+_TWO_PI = 2 * math.pi
+
+
+def _mag_headings(mag_x: np.ndarray, mag_y: np.ndarray, exact: bool = True) -> np.ndarray:
+    """OrientationEstimator._mag_heading over arrays (any shape)."""
+    if exact:
+        h = np.fromiter(map(math.atan2, mag_x.ravel().tolist(), mag_y.ravel().tolist()),
+                        dtype=np.float64, count=mag_x.size).reshape(mag_x.shape)
+    else:
+        h = np.arctan2(mag_x, mag_y)
+    return np.where(h < 0, h + _TWO_PI, h)
+
+
+def _sliding_extrema(x: np.ndarray, w: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Max and min of every length-*w* window along the last axis of (n, m) *x*.
+
+    Van Herk / Gil-Werman: per-block prefix and suffix extrema, so each
+    output costs three comparisons instead of *w*.  Exact (no arithmetic).
+    """
+    n, m = x.shape
+    out = m - w + 1
+    blocks = -(-m // w)
+    pad = blocks * w - m
+    results = []
+    for ufunc, fill in ((np.maximum, -np.inf), (np.minimum, np.inf)):
+        xp = np.concatenate((x, np.full((n, pad), fill)), axis=1).reshape(n, blocks, w)
+        prefix = ufunc.accumulate(xp, axis=2).reshape(n, -1)
+        suffix = ufunc.accumulate(xp[:, :, ::-1], axis=2)[:, :, ::-1].reshape(n, -1)
+        results.append(ufunc(suffix[:, :out], prefix[:, w - 1:w - 1 + out]))
+    return results[0], results[1]
+
+
+class MultiPDREngine:
+    """Lock-step PDR for *n* walkers with per-walker PDRConfig parameters.
+
+    Feed one sample per walker per tick with tick(), or whole (ragged)
+    sessions with run().  Walkers that have no sample in a tick are masked
+    out and keep their state.
+    """
+
+    def __init__(self, n: int, configs: Union[None, PDRConfig, Sequence[PDRConfig]] = None,
+                 exact: bool = True):
+        if configs is None or isinstance(configs, PDRConfig):
+            configs = [configs or PDRConfig()] * n
+        if len(configs) != n:
+            raise ValueError(f"expected {n} configs, got {len(configs)}")
+        self.n = n
+        self.exact = exact
+        self.weinberg_k = np.array([c.weinberg_k for c in configs], dtype=np.float64)
+        self.peak_threshold = np.array([c.peak_threshold for c in configs], dtype=np.float64)
+        self.min_step_interval = np.array([c.min_step_interval_ns for c in configs], dtype=np.int64)
+        self.alpha = np.array([c.alpha for c in configs], dtype=np.float64)
+        if any(window_samples(c.step_window_ns, c.sample_rate) != WINDOW for c in configs):
+            raise ValueError(f"MultiPDREngine needs a {WINDOW}-sample step window "
+                             "(step_window_ns × sample_rate)")
+        self._all = np.arange(n)
+        self.reset()
+
+    def reset(self):
+        n = self.n
+        # Step detector: the last WINDOW - 1 acceleration magnitudes per walker
+        # (oldest first) and how many samples each walker has seen.
+        self._recent = np.zeros((n, WINDOW - 1))
+        self._seen = np.zeros(n, dtype=np.int64)
+        self.last_step_time = np.zeros(n, dtype=np.int64)
+        self.step_count = np.zeros(n, dtype=np.int64)
+        # Orientation estimator.
+        self.heading = np.zeros(n)
+        self._last_timestamp = np.zeros(n, dtype=np.int64)
+        self._initialized = np.zeros(n, dtype=bool)
+        # Position.
+        self.pos_x = np.zeros(n)
+        self.pos_z = np.zeros(n)
+        self.trajectories: List[List[Tuple[float, float]]] = [[(0.0, 0.0)] for _ in range(n)]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """(n, 2) array of (x, z)."""
+        return np.column_stack((self.pos_x, self.pos_z))
+
+    def tick(self, timestamp: np.ndarray, acc: np.ndarray, gyro: np.ndarray, mag: np.ndarray,
+             active: Optional[np.ndarray] = None):
+        """Advance every walker by one sample (rows of the (n,) / (n, 3) inputs).
+
+        *active* is an (n,) bool mask; masked-out walkers are left untouched
+        and their input rows are ignored.
+        """
+        valid = np.ones((self.n, 1), dtype=bool) if active is None \
+            else np.asarray(active, dtype=bool).reshape(self.n, 1)
+        acc = np.asarray(acc, dtype=np.float64)
+        mag = np.asarray(mag, dtype=np.float64)
+        ax, ay, az = acc[:, 0], acc[:, 1], acc[:, 2]
+        self._advance(np.asarray(timestamp, dtype=np.int64).reshape(self.n, 1),
+                      np.sqrt(ax * ax + ay * ay + az * az).reshape(self.n, 1),
+                      np.asarray(gyro, dtype=np.float64)[:, 2].reshape(self.n, 1),
+                      _mag_headings(mag[:, 0], mag[:, 1], self.exact).reshape(self.n, 1),
+                      valid)
+
+    def run(self, batches: Sequence[SensorBatch], chunk_ticks: int = 1024) -> "MultiPDREngine":
+        """Replay one SensorBatch per walker; sessions may differ in length.
+
+        Inputs are staged *chunk_ticks* ticks at a time as (n, ticks) arrays;
+        ticks past the end of a session are masked out.
+        """
+        if len(batches) != self.n:
+            raise ValueError(f"expected {self.n} batches, got {len(batches)}")
+        lengths = np.array([len(b) for b in batches], dtype=np.int64)
+        total = int(lengths.max()) if self.n else 0
+        for c0 in range(0, total, chunk_ticks):
+            c = min(chunk_ticks, total - c0)
+            ts = np.zeros((self.n, c), dtype=np.int64)
+            acc = np.zeros((self.n, c, 3))
+            gz = np.zeros((self.n, c))
+            mag = np.zeros((self.n, c, 2))
+            for i, b in enumerate(batches):
+                k = min(max(len(b) - c0, 0), c)
+                if k:
+                    ts[i, :k] = b.timestamp[c0:c0 + k]
+                    acc[i, :k] = b.acc[c0:c0 + k]
+                    gz[i, :k] = b.gyro[c0:c0 + k, 2]
+                    mag[i, :k] = b.mag[c0:c0 + k, :2]
+            ax, ay, az = acc[..., 0], acc[..., 1], acc[..., 2]
+            valid = np.arange(c) < (lengths - c0)[:, None]
+            self._advance(ts, np.sqrt(ax * ax + ay * ay + az * az), gz,
+                          _mag_headings(mag[..., 0], mag[..., 1], self.exact), valid)
+        return self
+
+    # -- core ---------------------------------------------------------------
+
+    def _advance(self, ts: np.ndarray, acc_mag: np.ndarray, gyro_z: np.ndarray,
+                 mag_heading: np.ndarray, valid: np.ndarray):
+        """Advance through (n, c) inputs; each walker's valid ticks must be a
+        prefix of the chunk.
+
+        Sliding max/min for every (walker, tick) come from one
+        sliding_window_view over recent history + chunk.  The tick loop
+        then only does the refractory check for peak candidates (sparse)
+        and the orientation recurrence, which is vectorized across walkers.
+        """
+        n, c = acc_mag.shape
+        hist = np.concatenate((self._recent, acc_mag), axis=1)
+        a_max, a_min = _sliding_extrema(hist, WINDOW)
+        mid_val = hist[:, WINDOW // 2: WINDOW // 2 + c]
+        # Window ending at tick k is complete once the walker has seen WINDOW samples.
+        full = (self._seen[:, None] + np.arange(1, c + 1)) >= WINDOW
+        peak = ((mid_val == a_max) & ((a_max - _GRAVITY) > self.peak_threshold[:, None])
+                & full & valid)
+        cand_tick, cand_walker = np.nonzero(peak.T)
+        bounds = np.searchsorted(cand_tick, np.arange(c + 1))
+
+        counts = valid.sum(axis=1)
+        all_valid = bool(valid.all())
+        for k in range(c):
+            lo, hi = bounds[k], bounds[k + 1]
+            if hi > lo:
+                w = cand_walker[lo:hi]
+                t = ts[w, k]
+                ok = (t - self.last_step_time[w]) > self.min_step_interval[w]
+                if ok.any():
+                    self._take_steps(w[ok], t[ok], a_max[w[ok], k], a_min[w[ok], k])
+            if all_valid:
+                self._orient(slice(None), ts[:, k], gyro_z[:, k], mag_heading[:, k])
+            else:
+                rows = np.flatnonzero(valid[:, k])
+                if len(rows) == n:
+                    rows = slice(None)
+                elif not len(rows):
+                    break
+                self._orient(rows, ts[rows, k], gyro_z[rows, k], mag_heading[rows, k])
+
+        # Keep the last WINDOW - 1 valid magnitudes of every walker.
+        take = counts[:, None] + np.arange(WINDOW - 1)
+        self._recent = hist[np.arange(n)[:, None], take]
+        self._seen += counts
+
+    def _orient(self, rows, ts: np.ndarray, gyro_z: np.ndarray, mag_heading: np.ndarray):
+        """OrientationEstimator._update for the walkers in *rows*."""
+        heading = self.heading[rows]
+        dt = (ts - self._last_timestamp[rows]) * 1e-9
+        reset = ~self._initialized[rows] | (dt <= 0) | (dt > 1.0)
+        gyro_heading = heading + gyro_z * dt
+        diff = mag_heading - gyro_heading
+        diff = (diff + math.pi) % _TWO_PI - math.pi
+        fused = gyro_heading + (1 - self.alpha[rows]) * diff
+        fused = fused % _TWO_PI
+        fused = np.where(fused < 0, fused + _TWO_PI, fused)
+        self.heading[rows] = np.where(reset, mag_heading, fused)
+        self._last_timestamp[rows] = ts
+        self._initialized[rows] = True
+
+    def _take_steps(self, walkers: np.ndarray, ts: np.ndarray, a_max: np.ndarray,
+                    a_min: np.ndarray):
+        """Record steps; uses each walker's heading from before this tick's update."""
+        self.last_step_time[walkers] = ts
+        self.step_count[walkers] += 1
+        xs, zs = [], []
+        trajectories = self.trajectories
+        for i, k, hi, lo, heading, x, z in zip(
+                walkers.tolist(), self.weinberg_k[walkers].tolist(), a_max.tolist(),
+                a_min.tolist(), self.heading[walkers].tolist(),
+                self.pos_x[walkers].tolist(), self.pos_z[walkers].tolist()):
+            length = k * ((hi - lo) ** 0.25)
+            x += length * math.sin(heading)
+            z += length * math.cos(heading)
+            trajectories[i].append((x, z))
+            xs.append(x)
+            zs.append(z)
+        self.pos_x[walkers] = xs
+        self.pos_z[walkers] = zs
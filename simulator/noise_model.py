@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Noise models — sensor imperfections layered onto generated streams.
+Usage:  python noise_model.py [--spec layouts/garage_ramp.json] [--model garage] [--seed 0] [--runs 20]
+
+The path_simulator generators give each channel fixed white Gaussian noise.
+A NoiseModel adds what a phone in a parking garage also sees:
+
+    WhiteNoise       extra isotropic Gaussian noise per channel
+    GyroBias         gyro bias: random initial offset + random walk (rad/s/√s)
+    MagneticField    a static disturbance field over the floor plan (steel,
+                     rebar, parked cars), spatially correlated over *length*
+                     metres and the same every time a place is revisited
+    Dropout          lost samples, in bursts
+    TimestampJitter  sensor timestamps off by N(0, sigma) ns (kept increasing)
+
+Components run in the order given, each drawing its noise in bulk for a
+whole piece of stream.  All randomness comes from the Generator passed to
+session() — one per scenario or worker, e.g.
+np.random.default_rng(run_seed(master, scenario, run)) — so a stream depends
+only on its seed, never on what else ran in the process.  A session carries
+component state (bias, open dropout burst, last timestamp) from piece to
+piece, so a stream cut into chunks gets the same noise as one in one piece
+provided the chunk boundaries are the same.
+
+The path_simulator route generators and scenarios.Scenario take a model as
+*noise*; in a scenario DSL spec the model is the "noise" mapping:
+
+    "noise": {"gyro_bias": {"walk": 2e-4}, "mag_field": {"sigma": 6, "length": 3},
+              "dropout": {"rate": 0.01}, "jitter": {"sigma_ns": 2e6}}
+"""
+
+import sys, os, argparse, math, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from pdr_engine import SensorBatch
+from path_simulator import ACC_NOISE, GYRO_NOISE, MAG_NOISE
+
+_ROWS = 16384    # MagneticField evaluation block (rows × features stays small)
+
+
+# ---------------------------------------------------------------------------
+# Components
+# ---------------------------------------------------------------------------
+#
+# start(rng) returns the component's initial state; apply(batch, positions,
+# rng, state) modifies *batch* in place (or returns a new one with rows
+# removed) and returns (batch, positions, state).
+
+@dataclass(frozen=True)
+class WhiteNoise:
+    acc: float = ACC_NOISE      # m/s²
+    gyro: float = GYRO_NOISE    # rad/s
+    mag: float = MAG_NOISE      # µT
+
+    def start(self, rng):
+        return None
+
+    def apply(self, batch, positions, rng, state):
+        n = len(batch)
+        for column, sd in ((batch.acc, self.acc), (batch.gyro, self.gyro), (batch.mag, self.mag)):
+            if sd:
+                column += rng.normal(0, sd, (n, 3))
+        return batch, positions, state
+
+
+@dataclass(frozen=True)
+class GyroBias:
+    initial: float = 0.002      # rad/s, std of the turn-on bias
+    walk: float = 1e-4          # rad/s/√s, bias random walk
+
+    def start(self, rng):
+        return rng.normal(0, self.initial, 3), None   # bias, last timestamp
+
+    def apply(self, batch, positions, rng, state):
+        bias, last = state
+        n = len(batch)
+        if not n:
+            return batch, positions, state
+        dt = np.diff(batch.timestamp, prepend=batch.timestamp[0] if last is None else last) * 1e-9
+        steps = rng.normal(0, 1, (n, 3)) * (self.walk * np.sqrt(np.maximum(dt, 0)))[:, None]
+        drift = bias + np.cumsum(steps, axis=0)
+        batch.gyro += drift
+        return batch, positions, (drift[-1].copy(), int(batch.timestamp[-1]))
+
+
+@dataclass(frozen=True)
+class MagneticField:
+    """Stationary Gaussian field with squared-exponential correlation of
+    *length* m and *sigma* µT per axis, as a sum of random Fourier features."""
+    sigma: float = 5.0          # µT
+    length: float = 2.0         # m
+    features: int = 64
+
+    def start(self, rng):
+        omega = rng.normal(0, 1 / self.length, (self.features, 2))
+        phase = rng.uniform(0, 2 * math.pi, self.features)
+        weights = rng.normal(0, self.sigma, (self.features, 3)) * math.sqrt(2 / self.features)
+        return omega, phase, weights
+
+    def field_at(self, positions: np.ndarray, state) -> np.ndarray:
+        """(n, 3) µT at (n, 2) true positions."""
+        omega, phase, weights = state
+        out = np.empty((len(positions), 3))
+        for lo in range(0, len(positions), _ROWS):
+            p = positions[lo:lo + _ROWS]
+            out[lo:lo + _ROWS] = np.cos(p @ omega.T + phase) @ weights
+        return out
+
+    def apply(self, batch, positions, rng, state):
+        if positions is None:
+            raise ValueError("MagneticField needs the true positions of the samples")
+        if not len(batch):
+            return batch, positions, state
+        # The field is evaluated every length / 20 m along the path and
+        # interpolated in between (error ~ sigma / 3000, far below sensor noise).
+        s = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(positions, axis=0).T))))
+        if s[-1] == 0:
+            batch.mag += self.field_at(positions[:1], state)
+            return batch, positions, state
+        knots = np.union1d(np.searchsorted(s, np.arange(0, s[-1], self.length / 20)),
+                           [len(s) - 1])
+        values = self.field_at(positions[knots], state)
+        for axis in range(3):
+            batch.mag[:, axis] += np.interp(s, s[knots], values[:, axis])
+        return batch, positions, state
+
+
+@dataclass(frozen=True)
+class Dropout:
+    rate: float = 0.01          # fraction of samples lost
+    burst: float = 5.0          # mean samples per gap (geometric)
+
+    def start(self, rng):
+        return 0                # samples of the current gap still to drop
+
+    def apply(self, batch, positions, rng, state):
+        n = len(batch)
+        if not n or not self.rate:
+            return batch, positions, state
+        starts = np.flatnonzero(rng.random(n) < self.rate / self.burst)
+        lengths = rng.geometric(1 / self.burst, len(starts))
+        edges = np.zeros(n + 1, dtype=np.int64)
+        edges[0] += 1
+        edges[min(state, n)] -= 1
+        np.add.at(edges, starts, 1)
+        np.add.at(edges, np.minimum(starts + lengths, n), -1)
+        keep = np.cumsum(edges[:n]) == 0
+        ends = starts + lengths
+        carry = max(state - n, int(ends.max()) - n if len(ends) else 0, 0)
+        if positions is not None:
+            positions = positions[keep]
+        return batch[keep], positions, carry
+
+
+@dataclass(frozen=True)
+class TimestampJitter:
+    sigma_ns: float = 2e6
+
+    def start(self, rng):
+        return None             # last emitted timestamp
+
+    def apply(self, batch, positions, rng, state):
+        n = len(batch)
+        if not n:
+            return batch, positions, state
+        ts = batch.timestamp + np.rint(rng.normal(0, self.sigma_ns, n)).astype(np.int64)
+        # Strictly increasing, also across pieces: ts[i] >= ts[i - 1] + 1.
+        ramp = np.arange(n, dtype=np.int64)
+        floor = np.iinfo(np.int64).min if state is None else state + 1
+        ts = np.maximum.accumulate(np.maximum(ts - ramp, floor)) + ramp
+        batch.timestamp = ts
+        return batch, positions, int(ts[-1])
+
+
+COMPONENTS = {
+    "white": WhiteNoise,
+    "gyro_bias": GyroBias,
+    "mag_field": MagneticField,
+    "dropout": Dropout,
+    "jitter": TimestampJitter,
+}
+_NAMES = {cls: name for name, cls in COMPONENTS.items()}
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class NoiseModel:
+    components: Tuple[Any, ...] = ()
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Dict[str, float]]) -> "NoiseModel":
+        """{"gyro_bias": {...}, "dropout": {...}} → model, components in spec order."""
+        if not isinstance(spec, dict):
+            raise ValueError(f"noise: expected a mapping, got {spec!r}")
+        components = []
+        for name, params in spec.items():
+            if name not in COMPONENTS:
+                raise ValueError(f"noise: unknown component {name!r} (one of {sorted(COMPONENTS)})")
+            try:
+                components.append(COMPONENTS[name](**(params or {})))
+            except TypeError as e:
+                raise ValueError(f"noise.{name}: {e}") from None
+        return cls(tuple(components))
+
+    def to_spec(self) -> Dict[str, Dict[str, float]]:
+        return {_NAMES[type(c)]: asdict(c) for c in self.components}
+
+    @property
+    def needs_positions(self) -> bool:
+        return any(isinstance(c, MagneticField) for c in self.components)
+
+    def session(self, rng=None) -> "NoiseSession":
+        return NoiseSession(self, np.random.default_rng() if rng is None else rng)
+
+    def apply(self, batch: SensorBatch, rng=None, positions: Optional[np.ndarray] = None
+              ) -> SensorBatch:
+        """One-shot: noise for a whole stream."""
+        return self.session(rng).apply(batch, positions)[0]
+
+
+class NoiseSession:
+    """A NoiseModel bound to one Generator, applied to consecutive pieces of a stream."""
+
+    def __init__(self, model: NoiseModel, rng):
+        self.model = model
+        self.rng = rng
+        self.states = [c.start(rng) for c in model.components]
+
+    def apply(self, batch: SensorBatch, positions: Optional[np.ndarray] = None
+              ) -> Tuple[SensorBatch, Optional[np.ndarray]]:
+        """Noisy copy of *batch* and the true positions of its surviving rows."""
+        batch = SensorBatch(batch.timestamp.copy(), batch.acc.copy(), batch.gyro.copy(),
+                            batch.mag.copy())
+        for i, c in enumerate(self.model.components):
+            batch, positions, self.states[i] = c.apply(batch, positions, self.rng, self.states[i])
+        return batch, positions
+
+
+PRESETS = {
+    "none": NoiseModel(),
+    "garage": NoiseModel((GyroBias(), MagneticField(), Dropout(), TimestampJitter())),
+    "harsh": NoiseModel((GyroBias(0.005, 5e-4), MagneticField(12.0, 1.5), Dropout(0.05, 10.0),
+                         TimestampJitter(5e6))),
+}
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    from pdr_engine import PDREngine
+    from scenario_dsl import compile_scenario, load_specs
+    from scenarios import run_seed
+    from validator import validate
+
+    ap = argparse.ArgumentParser(description="PDR accuracy under a noise model")
+    ap.add_argument("--spec", default=os.path.join(os.path.dirname(__file__), "layouts", "parking.json"))
+    ap.add_argument("--model", choices=sorted(PRESETS), default="garage",
+                    help="preset, used when the spec has no 'noise' of its own")
+    ap.add_argument("--seed", type=int, default=0, help="master seed")
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    spec = load_specs(args.spec)[0]
+    clean = {k: v for k, v in spec.items() if k != "noise"}
+    models = {"none": PRESETS["none"],
+              args.model: NoiseModel.from_spec(spec["noise"]) if "noise" in spec else PRESETS[args.model]}
+    print(f"{clean['name']}: {args.runs} runs per model")
+    for label, model in models.items():
+        compiled = compile_scenario(dict(clean, noise=model.to_spec()) if model.components else clean)
+        errors, passed, gen_s = [], 0, 0.0
+        for run in range(args.runs):
+            rng = np.random.default_rng(run_seed(args.seed, 0, run))
+            t0 = time.perf_counter()
+            batch, gt = compiled.generate(rng)
+            gen_s += time.perf_counter() - t0
+            engine = PDREngine(compiled.engine_config())
+            engine.process_batch(batch)
+            r = validate(compiled.name, engine.trajectory_array, gt, engine.step_detector.step_count,
+                         compiled.total_distance, compiled.threshold, compiled.metric)
+            errors.append(r.metric_value())
+            passed += r.passed
+        e = np.array(errors)
+        print(f"\n=== {label} ===")
+        print(f"  Error mean/p95 : {e.mean():.2f} / {np.percentile(e, 95):.2f} m")
+        print(f"  Passed         : {passed}/{args.runs}")
+        print(f"  Generation     : {compiled.n_samples * args.runs / gen_s:,.0f} samples/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
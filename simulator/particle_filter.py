@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Particle filter — PDR steps constrained by the walls of a garage map.
+Usage:  python particle_filter.py [--map maps/parking_b1.json] [--spec layouts/parking.json]
+                                  [--particles 100,1000,10000] [--sessions 8] [--workers N] [--seed 0]
+        python particle_filter.py --synthetic 1x10x10 [--legs 60] ...
+
+Every particle is a position plus its own step-length scale and heading
+bias.  For each PDR step (length L from StepDetector, heading h from
+OrientationEstimator):
+
+    scale_i += N(0, scale_walk)         bias_i += N(0, bias_walk)
+    L_i = L · scale_i + N(0, length_sd)  h_i = h + bias_i + N(0, heading_sd)
+    x_i += L_i · sin h_i                 z_i += L_i · cos h_i
+
+Particles whose move crosses a wall (map_matching.GarageMap walls, tested
+with a spatial_index.SegmentGrid) get weight 0; the rest are renormalised
+and, once the effective sample size drops below resample_ratio · n,
+resampled systematically.  Propagation, the wall test and resampling are
+NumPy operations across all particles — the only Python loop is over
+steps.  If every particle hits a wall the step is kept without the wall
+test and counted as a collapse.  Walls are those of one level; level
+changes along ramps are not modelled.
+
+Sessions (scenario, seed) are independent: run_sessions() spreads them
+over a ProcessPoolExecutor.  Session *i* draws its sensor stream and its
+particles from run_seed(seed, 0, i), so results do not depend on the
+worker count.  The CLI reports steps/s per particle count, to pick a
+particle budget.
+"""
+
+import sys, os, argparse, math, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from spatial_index import SegmentGrid
+
+DEFAULT_PARTICLES = (100, 1000, 10000)
+FIELDS = ("raw_rms", "pf_rms", "raw_endpoint", "pf_endpoint", "steps", "seconds", "collapses")
+
+
+# ---------------------------------------------------------------------------
+# Filter
+# ---------------------------------------------------------------------------
+
+class ParticleFilter:
+    def __init__(self, n: int = 1000, walls: Optional[SegmentGrid] = None,
+                 length_sd: float = 0.05, heading_sd: float = math.radians(3),
+                 scale_sd: float = 0.05, bias_sd: float = math.radians(3),
+                 scale_walk: float = 0.002, bias_walk: float = math.radians(0.2),
+                 resample_ratio: float = 0.5, rng=None):
+        self.n = n
+        self.walls = walls
+        self.length_sd = length_sd
+        self.heading_sd = heading_sd
+        self.scale_sd = scale_sd
+        self.bias_sd = bias_sd
+        self.scale_walk = scale_walk
+        self.bias_walk = bias_walk
+        self.resample_ratio = resample_ratio
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.reset()
+
+    def reset(self, origin: Tuple[float, float] = (0.0, 0.0), spread: float = 0.3):
+        """Particles around *origin* (N(0, spread) per axis), equal weights."""
+        n, rng = self.n, self.rng
+        self.xy = np.asarray(origin, dtype=np.float64) + rng.normal(0, spread, (n, 2))
+        self.scale = 1 + rng.normal(0, self.scale_sd, n)
+        self.bias = rng.normal(0, self.bias_sd, n)
+        self.weights = np.full(n, 1 / n)
+        self.steps = 0
+        self.resamples = 0
+        self.collapses = 0
+        self._consumed = 0
+
+    # -- estimates ------------------------------------------------------------
+
+    @property
+    def estimate(self) -> np.ndarray:
+        """Weighted mean position."""
+        return self.weights @ self.xy
+
+    @property
+    def spread(self) -> float:
+        """Weighted RMS distance of the particles from the estimate (m)."""
+        d = self.xy - self.estimate
+        return float(math.sqrt(self.weights @ (d * d).sum(axis=1)))
+
+    @property
+    def effective_size(self) -> float:
+        return float(1 / (self.weights @ self.weights))
+
+    # -- propagation ----------------------------------------------------------
+
+    def step(self, length: float, heading: float) -> np.ndarray:
+        """Advance every particle by one PDR step; return the new estimate."""
+        if not (length > 0 and math.isfinite(heading)):
+            return self.estimate
+        n, rng = self.n, self.rng
+        noise = rng.normal(0, 1, (4, n))
+        self.scale += self.scale_walk * noise[0]
+        self.bias += self.bias_walk * noise[1]
+        lengths = length * self.scale + self.length_sd * noise[2]
+        headings = heading + self.bias + self.heading_sd * noise[3]
+        moved = self.xy + lengths[:, None] * np.column_stack((np.sin(headings), np.cos(headings)))
+        if self.walls is not None and len(self.walls):
+            alive = ~self.walls.crossings(self.xy, moved)
+            weights = self.weights * alive
+            total = weights.sum()
+            if total > 0:
+                self.weights = weights / total
+            else:
+                self.collapses += 1
+        self.xy = moved
+        self.steps += 1
+        if self.effective_size < self.resample_ratio * n:
+            self._resample()
+        return self.estimate
+
+    def _resample(self):
+        """Systematic resampling: one uniform draw, n evenly spaced pointers."""
+        n = self.n
+        pointers = (self.rng.random() + np.arange(n)) / n
+        idx = np.minimum(np.searchsorted(np.cumsum(self.weights), pointers), n - 1)
+        self.xy = self.xy[idx]
+        self.scale = self.scale[idx]
+        self.bias = self.bias[idx]
+        self.weights = np.full(n, 1 / n)
+        self.resamples += 1
+
+    def run(self, step_lengths, headings) -> np.ndarray:
+        """(k, 2) estimates after each of *k* steps."""
+        out = np.empty((len(step_lengths), 2))
+        for i, (length, heading) in enumerate(zip(np.asarray(step_lengths).tolist(),
+                                                  np.asarray(headings).tolist())):
+            out[i] = self.step(length, heading)
+        return out
+
+    def update(self, track) -> np.ndarray:
+        """Filter the rows of a pdr_engine.TrajectoryBuffer added since the last call."""
+        total = track.dropped + len(track)
+        new = total - self._consumed
+        if new < 0:                      # the buffer was reset
+            new = total
+        self._consumed = total
+        lo = max(len(track) - new, 0)
+        return self.run(track.step_length[lo:], track.heading[lo:])
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+
+_GARAGES: Dict[str, object] = {}
+
+
+def _garage(source: str):
+    """GarageMap for a map path or an "LxRxC" synthetic grid (cached per process)."""
+    from map_matching import GarageMap, synthetic_garage
+
+    if source not in _GARAGES:
+        if os.path.exists(source):
+            _GARAGES[source] = GarageMap.load(source)
+        else:
+            levels, rows, cols = (int(v) for v in source.lower().split("x"))
+            _GARAGES[source] = GarageMap.from_dict(synthetic_garage(levels, rows, cols))
+    return _GARAGES[source]
+
+
+def filter_scenario(pf: ParticleFilter, compiled, rng, chunk_size: int = 4096):
+    """Stream a compiled DSL scenario through PDREngine, filtering the new
+    steps after every chunk.  Returns (engine, raw, estimates, seconds spent
+    filtering)."""
+    from pdr_engine import PDREngine
+
+    engine = PDREngine(compiled.engine_config())
+    engine.pos_x, engine.pos_z = compiled.ground_truth[0]
+    engine.track.reset(engine.position)
+    pf.reset(engine.position)
+    estimates, spent = [], 0.0
+    for batch, _ in compiled.stream(chunk_size, rng):
+        engine.process_batch(batch)
+        t0 = time.perf_counter()
+        estimates.append(pf.update(engine.track))
+        spent += time.perf_counter() - t0
+    return engine, engine.trajectory_array, np.concatenate(estimates), spent
+
+
+def _run_session(source: str, spec: dict, level: str, particles: int, master_seed: int,
+                 session: int) -> np.ndarray:
+    """Worker entry point: FIELDS for one session."""
+    from scenario_dsl import compile_scenario
+    from scenarios import run_seed
+    from validator import path_errors
+
+    garage = _garage(source)
+    compiled = compile_scenario(spec)
+    stream_seed, pf_seed = run_seed(master_seed, 0, session).spawn(2)
+    pf = ParticleFilter(particles, garage.wall_grid(level), rng=np.random.default_rng(pf_seed))
+    _, raw, est, spent = filter_scenario(pf, compiled, np.random.default_rng(stream_seed))
+    gt = list(compiled.ground_truth)
+    end = np.asarray(gt[-1])
+    raw_err = np.asarray(path_errors(raw, gt))
+    pf_err = np.asarray(path_errors(est, gt)) if len(est) else np.zeros(1)
+    last = est[-1] if len(est) else raw[-1]
+    return np.array([math.sqrt((raw_err ** 2).mean()), math.sqrt((pf_err ** 2).mean()),
+                     float(np.hypot(*(raw[-1] - end))), float(np.hypot(*(last - end))),
+                     pf.steps, spent, pf.collapses])
+
+
+def run_sessions(source: str, spec: dict, level: str, particles: int, sessions: int,
+                 seed: int = 0, workers: Optional[int] = None) -> np.ndarray:
+    """(sessions, len(FIELDS)) metrics, in session order."""
+    if workers == 1:
+        rows = [_run_session(source, spec, level, particles, seed, i) for i in range(sessions)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_session, source, spec, level, particles, seed, i)
+                       for i in range(sessions)]
+            rows = [f.result() for f in futures]
+    return np.array(rows).reshape(sessions, len(FIELDS))
+
+
+@dataclass
+class BudgetRow:
+    particles: int
+    metrics: np.ndarray      # (sessions, len(FIELDS))
+    wall_s: float
+
+    def column(self, name: str) -> np.ndarray:
+        return self.metrics[:, FIELDS.index(name)]
+
+    @property
+    def steps_per_s(self) -> float:
+        """Filter throughput of one process."""
+        return float(self.column("steps").sum() / max(self.column("seconds").sum(), 1e-9))
+
+
+def report(name: str, rows: Sequence[BudgetRow], workers: Optional[int]) -> str:
+    sessions = len(rows[0].metrics) if rows else 0
+    lines = [f"=== Particle filter — {name}, {sessions} sessions, "
+             f"{workers or os.cpu_count()} worker(s) ===",
+             f"  {'particles':>9} {'steps/s':>10} {'raw RMS':>9} {'PF RMS':>8} "
+             f"{'raw end':>9} {'PF end':>8} {'collapses':>10} {'wall':>7}"]
+    for r in rows:
+        lines.append(f"  {r.particles:>9,} {r.steps_per_s:>10,.0f} "
+                     f"{r.column('raw_rms').mean():>7.2f} m {r.column('pf_rms').mean():>6.2f} m "
+                     f"{r.column('raw_endpoint').mean():>7.2f} m {r.column('pf_endpoint').mean():>6.2f} m "
+                     f"{int(r.column('collapses').sum()):>10} {r.wall_s:>6.1f}s")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    from map_matching import MAPS_DIR, grid_walk_spec
+    from scenario_dsl import load_specs
+
+    ap = argparse.ArgumentParser(description="Wall-constrained particle filter over PDR steps")
+    ap.add_argument("--map", default=os.path.join(MAPS_DIR, "parking_b1.json"))
+    ap.add_argument("--spec", default=os.path.join(os.path.dirname(__file__), "layouts", "parking.json"))
+    ap.add_argument("--synthetic", metavar="LxRxC",
+                    help="use a synthetic grid garage (levels x rows x cols) and a random walk")
+    ap.add_argument("--legs", type=int, default=60, help="legs of the synthetic walk")
+    ap.add_argument("--particles", default=",".join(map(str, DEFAULT_PARTICLES)),
+                    help="comma-separated particle counts")
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--level", help="level whose walls apply (default: the first one)")
+    ap.add_argument("--seed", type=int, default=0, help="master seed")
+    args = ap.parse_args(argv)
+
+    if args.synthetic:
+        source = args.synthetic
+        _, rows, cols = (int(v) for v in source.lower().split("x"))
+        spec = grid_walk_spec(rows, cols, 16.0, args.legs, np.random.default_rng(args.seed))
+    else:
+        source = args.map
+        spec = load_specs(args.spec)[0]
+    garage = _garage(source)
+    level = args.level or garage.edge_level[0]
+    print(f"{garage.name}: {len(garage.wall_grid(level)):,} wall segments on {level}")
+
+    rows: List[BudgetRow] = []
+    for particles in (int(p) for p in args.particles.split(",")):
+        t0 = time.perf_counter()
+        metrics = run_sessions(source, spec, level, particles, args.sessions, args.seed, args.workers)
+        rows.append(BudgetRow(particles, metrics, time.perf_counter() - t0))
+    print(report(spec.get("name", "scenario"), rows, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
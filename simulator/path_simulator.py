@@ -1,12 +1,14 @@
 """
 Path simulator — generates realistic IMU sensor streams for known paths.
-Sampling rate: 50 Hz (20 ms).  Walking frequency: 2 Hz.
+Sampling rate: 50 Hz (20 ms) by default; every generator takes any *rate*
+(Hz) for 100–400 Hz devices.  Walking frequency: 2 Hz.
 """
 
+import itertools
 import math
 import numpy as np
-from typing import List, Tuple
-from pdr_engine import SensorData
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from pdr_engine import SensorData, SensorBatch
 
 SAMPLE_RATE = 50        # Hz
 DT_NS = int(1e9 / SAMPLE_RATE)
@@ -15,55 +17,108 @@ WALK_AMP = 1.92          # m/s² amplitude; Weinberg K=0.5 → step ≈ 0.7m
 GRAVITY = 9.81
 MAG_STRENGTH = 20.0
 
+CHUNK_SAMPLES = 65536   # default chunk size of the *_stream generators
+
 # Noise std devs (defaults)
 ACC_NOISE = 0.3
 GYRO_NOISE = 0.01
 MAG_NOISE = 1.0
 
 
-def _walk_samples(duration_s: float, heading: float, t0_ns: int = 0,
-                  noise_scale: float = 1.0) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
-    """Generate sensor data for walking at constant heading for *duration_s* seconds."""
-    n = int(duration_s * SAMPLE_RATE)
-    samples: List[SensorData] = []
-    # Ground-truth waypoints: one per step
-    gt_points: List[Tuple[float, float]] = []
+# Every generator takes an optional *rng*: a np.random.Generator (e.g.
+# np.random.default_rng(run_seed(...)), one per scenario or worker).  None
+# means a fresh, unseeded default_rng() — the process-wide np.random state is
+# never touched.  The draws come in bulk, one call per channel per segment.
+#
+# The route generators also take an optional *noise*: a noise_model.NoiseModel
+# layered onto each segment as it is generated, with the true position of
+# every sample (linear along a leg, fixed during a turn) for the components
+# that need one.  The model's draws come from the same *rng*.
 
-    for i in range(n):
-        t_s = i / SAMPLE_RATE
-        ts = t0_ns + i * DT_NS
+def _rng(rng) -> np.random.Generator:
+    """*rng*, or a fresh unseeded np.random.default_rng() when None."""
+    return np.random.default_rng() if rng is None else rng
 
-        # Accelerometer: gravity + walking oscillation along vertical
-        osc = WALK_AMP * math.sin(2 * math.pi * WALK_FREQ * t_s)
-        acc_mag = GRAVITY + osc
-        # Distribute on axes assuming phone roughly upright
-        acc_x = acc_mag * math.sin(heading) * 0.1 + np.random.normal(0, ACC_NOISE * noise_scale)
-        acc_y = acc_mag * 0.99 + np.random.normal(0, ACC_NOISE * noise_scale)
-        acc_z = acc_mag * math.cos(heading) * 0.1 + np.random.normal(0, ACC_NOISE * noise_scale)
 
-        # Magnetometer
-        mag_x = MAG_STRENGTH * math.sin(heading) + np.random.normal(0, MAG_NOISE * noise_scale)
-        mag_y = MAG_STRENGTH * math.cos(heading) + np.random.normal(0, MAG_NOISE * noise_scale)
-        mag_z = np.random.normal(0, MAG_NOISE * noise_scale)
+def _normal(rng: np.random.Generator, sd: float, n: int) -> np.ndarray:
+    """n draws of N(0, sd); nothing is drawn for sd == 0 (noise-free streams)."""
+    if not sd:
+        return np.zeros(n)
+    return rng.normal(0, sd, n)
 
-        # Gyroscope — straight walk, nearly zero yaw rate
-        gyro_z = np.random.normal(0, GYRO_NOISE * noise_scale)
 
-        samples.append(SensorData(
-            timestamp=ts,
-            accX=acc_x, accY=acc_y, accZ=acc_z,
-            gyroX=0.0, gyroY=0.0, gyroZ=gyro_z,
-            magX=mag_x, magY=mag_y, magZ=mag_z,
-        ))
+def _noise_session(noise, rng):
+    """A session of *noise* bound to *rng*, or None when there is nothing to add."""
+    return noise.session(rng) if noise is not None and noise.components else None
 
-    return samples
 
+def _noisy(session, batch: SensorBatch, start: Tuple[float, float], end: Tuple[float, float],
+           first: int = 0, n: Optional[int] = None) -> SensorBatch:
+    """*batch* — samples first .. of a leg of *n* samples from *start* to *end* —
+    through the noise *session* (unchanged without one)."""
+    if session is None:
+        return batch
+    positions = None
+    if session.model.needs_positions:
+        frac = (first + np.arange(len(batch))) / max(len(batch) if n is None else n, 1)
+        positions = np.column_stack((start[0] + frac * (end[0] - start[0]),
+                                     start[1] + frac * (end[1] - start[1])))
+    return session.apply(batch, positions)[0]
 
-def _turn_samples(from_heading: float, to_heading: float, duration_s: float,
-                  t0_ns: int = 0, noise_scale: float = 1.0) -> List[SensorData]:
+
+def dt_ns(rate: float) -> int:
+    """Sample interval at *rate* Hz (DT_NS at SAMPLE_RATE)."""
+    return int(1e9 / rate)
+
+
+def _timestamps(n: int, t0_ns: int, rate: float = SAMPLE_RATE) -> np.ndarray:
+    return t0_ns + np.arange(n, dtype=np.int64) * dt_ns(rate)
+
+
+def _walk_batch(duration_s: float, heading: float, t0_ns: int = 0,
+                noise_scale: float = 1.0, rng=None, rate: float = SAMPLE_RATE) -> SensorBatch:
+    """Generate sensor data for walking at constant heading for *duration_s* seconds."""
+    return _walk_piece(0, int(duration_s * rate), heading, t0_ns, noise_scale, rng=rng, rate=rate)
+
+
+def _walk_piece(first: int, n: int, heading: float, t0_ns: int = 0,
+                noise_scale: float = 1.0, amp: float = WALK_AMP,
+                freq: float = WALK_FREQ, rng=None, rate: float = SAMPLE_RATE) -> SensorBatch:
+    """Samples first .. first + n - 1 of a walk (gait phase continues across pieces);
+    *t0_ns* is the timestamp of sample *first*.  *amp* / *freq* set the gait
+    (see walk_amplitude())."""
+    rng = _rng(rng)
+    t_s = np.arange(first, first + n) / rate
+    acc_sd = ACC_NOISE * noise_scale
+    mag_sd = MAG_NOISE * noise_scale
+
+    # Accelerometer: gravity + walking oscillation along vertical
+    acc_mag = GRAVITY + amp * np.sin(2 * math.pi * freq * t_s)
+    acc = np.empty((n, 3))
+    # Distribute on axes assuming phone roughly upright
+    acc[:, 0] = acc_mag * math.sin(heading) * 0.1 + _normal(rng, acc_sd, n)
+    acc[:, 1] = acc_mag * 0.99 + _normal(rng, acc_sd, n)
+    acc[:, 2] = acc_mag * math.cos(heading) * 0.1 + _normal(rng, acc_sd, n)
+
+    # Magnetometer
+    mag = np.empty((n, 3))
+    mag[:, 0] = MAG_STRENGTH * math.sin(heading) + _normal(rng, mag_sd, n)
+    mag[:, 1] = MAG_STRENGTH * math.cos(heading) + _normal(rng, mag_sd, n)
+    mag[:, 2] = _normal(rng, mag_sd, n)
+
+    # Gyroscope — straight walk, nearly zero yaw rate
+    gyro = np.zeros((n, 3))
+    gyro[:, 2] = _normal(rng, GYRO_NOISE * noise_scale, n)
+
+    return SensorBatch(_timestamps(n, t0_ns, rate), acc, gyro, mag)
+
+
+def _turn_batch(from_heading: float, to_heading: float, duration_s: float,
+                t0_ns: int = 0, noise_scale: float = 1.0, rng=None,
+                rate: float = SAMPLE_RATE) -> SensorBatch:
     """Generate sensor data while turning in place (no steps)."""
-    n = int(duration_s * SAMPLE_RATE)
-    samples: List[SensorData] = []
+    rng = _rng(rng)
+    n = int(duration_s * rate)
     delta = to_heading - from_heading
     # Normalize delta
     while delta > math.pi:
@@ -72,31 +127,92 @@ def _turn_samples(from_heading: float, to_heading: float, duration_s: float,
         delta += 2 * math.pi
 
     yaw_rate = delta / duration_s if duration_s > 0 else 0.0
+    t_s = np.arange(n) / rate
+    frac = t_s / duration_s if duration_s > 0 else np.ones(n)
+    cur_heading = from_heading + delta * frac
+    acc_sd = ACC_NOISE * noise_scale
+    mag_sd = MAG_NOISE * noise_scale
+
+    # Stationary accel (gravity only, small walking to allow algorithm to NOT detect steps)
+    acc = np.empty((n, 3))
+    acc[:, 0] = _normal(rng, acc_sd, n)
+    acc[:, 1] = GRAVITY + _normal(rng, acc_sd * 0.3, n)
+    acc[:, 2] = _normal(rng, acc_sd, n)
+
+    mag = np.empty((n, 3))
+    mag[:, 0] = MAG_STRENGTH * np.sin(cur_heading) + _normal(rng, mag_sd, n)
+    mag[:, 1] = MAG_STRENGTH * np.cos(cur_heading) + _normal(rng, mag_sd, n)
+    mag[:, 2] = _normal(rng, mag_sd, n)
+
+    gyro = np.zeros((n, 3))
+    gyro[:, 2] = yaw_rate + _normal(rng, GYRO_NOISE * noise_scale, n)
+
+    return SensorBatch(_timestamps(n, t0_ns, rate), acc, gyro, mag)
+
+
+def _stationary_batch(duration_s: float, t0_ns: int = 0,
+                      noise_scale: float = 1.0, rng=None, rate: float = SAMPLE_RATE) -> SensorBatch:
+    return _stationary_piece(int(duration_s * rate), t0_ns, noise_scale, rng=rng, rate=rate)
+
+
+def _stationary_piece(n: int, t0_ns: int = 0, noise_scale: float = 1.0,
+                      heading: float = 0.0, rng=None, rate: float = SAMPLE_RATE) -> SensorBatch:
+    rng = _rng(rng)
+    acc = np.empty((n, 3))
+    acc[:, 0] = _normal(rng, ACC_NOISE * noise_scale * 0.5, n)
+    acc[:, 1] = GRAVITY + _normal(rng, ACC_NOISE * noise_scale * 0.2, n)
+    acc[:, 2] = _normal(rng, ACC_NOISE * noise_scale * 0.5, n)
+    gyro = np.zeros((n, 3))
+    gyro[:, 2] = _normal(rng, GYRO_NOISE * noise_scale, n)
+    mag = np.zeros((n, 3))
+    mag[:, 0] = MAG_STRENGTH * math.sin(heading) + _normal(rng, MAG_NOISE * noise_scale, n)
+    mag[:, 1] = MAG_STRENGTH * math.cos(heading) + _normal(rng, MAG_NOISE * noise_scale, n)
+    return SensorBatch(_timestamps(n, t0_ns, rate), acc, gyro, mag)
+
+
+def _legs_batch(legs: Sequence[Tuple[float, float]], step_length: float = 0.7,
+                turn_dur: float = 1.5, noise_scale: float = 1.0, rng=None,
+                noise=None, rate: float = SAMPLE_RATE) -> SensorBatch:
+    """Walk (heading, distance) legs in order from the origin, turning in place
+    between them."""
+    rng = _rng(rng)
+    session = _noise_session(noise, rng)
+    dt = dt_ns(rate)
+    segments: List[SensorBatch] = []
+    t0 = 0
+    x = z = 0.0
+    prev_h = None
+    for h, dist in legs:
+        if prev_h is not None:
+            st = _turn_batch(prev_h, h, turn_dur, t0_ns=t0, noise_scale=noise_scale, rng=rng,
+                             rate=rate)
+            t0 += len(st) * dt
+            segments.append(_noisy(session, st, (x, z), (x, z)))
+        dur = (dist / step_length) / WALK_FREQ
+        sw = _walk_batch(dur, h, t0_ns=t0, noise_scale=noise_scale, rng=rng, rate=rate)
+        t0 += len(sw) * dt
+        end = (_snap(x + dist * math.sin(h)), _snap(z + dist * math.cos(h)))
+        segments.append(_noisy(session, sw, (x, z), end))
+        x, z = end
+        prev_h = h
+    return SensorBatch.concatenate(segments)
 
-    for i in range(n):
-        t_s = i / SAMPLE_RATE
-        ts = t0_ns + i * DT_NS
-        frac = t_s / duration_s if duration_s > 0 else 1.0
-        cur_heading = from_heading + delta * frac
 
-        # Stationary accel (gravity only, small walking to allow algorithm to NOT detect steps)
-        acc_x = np.random.normal(0, ACC_NOISE * noise_scale)
-        acc_y = GRAVITY + np.random.normal(0, ACC_NOISE * noise_scale * 0.3)
-        acc_z = np.random.normal(0, ACC_NOISE * noise_scale)
+def _walk_samples(duration_s: float, heading: float, t0_ns: int = 0,
+                  noise_scale: float = 1.0, rng=None) -> List[SensorData]:
+    return list(_walk_batch(duration_s, heading, t0_ns, noise_scale, rng).as_samples())
+
 
-        mag_x = MAG_STRENGTH * math.sin(cur_heading) + np.random.normal(0, MAG_NOISE * noise_scale)
-        mag_y = MAG_STRENGTH * math.cos(cur_heading) + np.random.normal(0, MAG_NOISE * noise_scale)
-        mag_z = np.random.normal(0, MAG_NOISE * noise_scale)
+def _turn_samples(from_heading: float, to_heading: float, duration_s: float,
+                  t0_ns: int = 0, noise_scale: float = 1.0, rng=None) -> List[SensorData]:
+    return list(_turn_batch(from_heading, to_heading, duration_s, t0_ns, noise_scale,
+                            rng).as_samples())
 
-        gyro_z = yaw_rate + np.random.normal(0, GYRO_NOISE * noise_scale)
 
-        samples.append(SensorData(
-            timestamp=ts,
-            accX=acc_x, accY=acc_y, accZ=acc_z,
-            gyroX=0.0, gyroY=0.0, gyroZ=gyro_z,
-            magX=mag_x, magY=mag_y, magZ=mag_z,
-        ))
-    return samples
+def walk_amplitude(step_length: float) -> float:
+    """Gait amplitude whose Weinberg estimate (K = 0.5) is *step_length*;
+    WALK_AMP is the one for 0.7 m (length ∝ amplitude ** 0.25)."""
+    return WALK_AMP * (step_length / 0.7) ** 4
 
 
 def _heading_rad(deg: float) -> float:
@@ -104,120 +220,300 @@ def _heading_rad(deg: float) -> float:
 
 
 # ---------------------------------------------------------------------------
-# Public API
+# Public API — vectorized generators returning (SensorBatch, ground_truth)
 # ---------------------------------------------------------------------------
 
-def simulate_straight(distance: float, heading: float, step_length: float = 0.7,
-                      noise_scale: float = 1.0) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
-    """Returns (sensor_stream, ground_truth_points)."""
-    n_steps = distance / step_length
-    duration_s = n_steps / WALK_FREQ  # each step = 0.5s at 2Hz
-    samples = _walk_samples(duration_s, heading, noise_scale=noise_scale)
+def simulate_legs_batch(legs: Sequence[Tuple[float, float]], step_length: float = 0.7,
+                        turn_dur: float = 1.5, noise_scale: float = 1.0, rng=None, noise=None,
+                        rate: float = SAMPLE_RATE
+                        ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+    """Walk (heading, distance) legs in order from the origin, turning in place
+    between them; the ground truth is the leg ends."""
+    batch = _legs_batch(legs, step_length, turn_dur, noise_scale, rng, noise, rate)
+    gt = [(0.0, 0.0)]
+    for h, dist in legs:
+        x, z = gt[-1]
+        gt.append((_snap(x + dist * math.sin(h)), _snap(z + dist * math.cos(h))))
+    return batch, gt
+
+
+def simulate_straight_batch(distance: float, heading: float, step_length: float = 0.7,
+                            noise_scale: float = 1.0, rng=None, noise=None,
+                            rate: float = SAMPLE_RATE
+                            ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+    # each step = 0.5s at 2Hz
+    batch = _legs_batch([(heading, distance)], step_length, noise_scale=noise_scale, rng=rng,
+                        noise=noise, rate=rate)
 
     # Ground truth: start(0,0) -> end
     gt = [(0.0, 0.0),
           (distance * math.sin(heading), distance * math.cos(heading))]
-    return samples, gt
+    return batch, gt
 
 
-def simulate_turn(from_heading: float, to_heading: float, duration_s: float = 1.5,
-                  t0_ns: int = 0, noise_scale: float = 1.0) -> List[SensorData]:
-    return _turn_samples(from_heading, to_heading, duration_s, t0_ns, noise_scale)
+def simulate_turn_batch(from_heading: float, to_heading: float, duration_s: float = 1.5,
+                        t0_ns: int = 0, noise_scale: float = 1.0, rng=None, noise=None,
+                        rate: float = SAMPLE_RATE) -> SensorBatch:
+    rng = _rng(rng)
+    session = _noise_session(noise, rng)
+    batch = _turn_batch(from_heading, to_heading, duration_s, t0_ns, noise_scale, rng, rate)
+    return _noisy(session, batch, (0.0, 0.0), (0.0, 0.0))
 
 
-def simulate_l_shape(leg1: float, leg2: float, noise_scale: float = 1.0
-                     ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+def simulate_l_shape_batch(leg1: float, leg2: float, noise_scale: float = 1.0, rng=None,
+                           noise=None, rate: float = SAMPLE_RATE
+                           ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
     heading1 = 0.0  # north
     heading2 = math.pi / 2  # east (left turn = +90° CW)
-
-    step_length = 0.7
-    dur1 = (leg1 / step_length) / WALK_FREQ
-    dur2 = (leg2 / step_length) / WALK_FREQ
-    turn_dur = 1.5
-
-    s1 = _walk_samples(dur1, heading1, t0_ns=0, noise_scale=noise_scale)
-    t0 = len(s1) * DT_NS
-    s_turn = _turn_samples(heading1, heading2, turn_dur, t0_ns=t0, noise_scale=noise_scale)
-    t0 += len(s_turn) * DT_NS
-    s2 = _walk_samples(dur2, heading2, t0_ns=t0, noise_scale=noise_scale)
-
-    samples = s1 + s_turn + s2
+    batch = _legs_batch([(heading1, leg1), (heading2, leg2)], noise_scale=noise_scale, rng=rng,
+                        noise=noise, rate=rate)
     gt = [(0.0, 0.0),
           (0.0, leg1),
           (leg2, leg1)]
-    return samples, gt
+    return batch, gt
 
 
-def simulate_rectangle(width: float, height: float, noise_scale: float = 1.0
-                       ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+def simulate_rectangle_batch(width: float, height: float, noise_scale: float = 1.0, rng=None,
+                             noise=None, rate: float = SAMPLE_RATE
+                             ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
     """Walk a rectangle: north -> east -> south -> west -> back to origin."""
-    step_length = 0.7
     headings = [0.0, math.pi / 2, math.pi, 3 * math.pi / 2]
     legs = [height, width, height, width]
-    turn_dur = 1.5
-
-    samples: List[SensorData] = []
-    t0 = 0
-
-    for i, (h, leg) in enumerate(zip(headings, legs)):
-        if i > 0:
-            prev_h = headings[i - 1]
-            st = _turn_samples(prev_h, h, turn_dur, t0_ns=t0, noise_scale=noise_scale)
-            samples.extend(st)
-            t0 += len(st) * DT_NS
+    batch = _legs_batch(list(zip(headings, legs)), noise_scale=noise_scale, rng=rng, noise=noise,
+                        rate=rate)
+    gt = [(0, 0), (0, height), (width, height), (width, 0), (0, 0)]
+    return batch, gt
 
-        dur = (leg / step_length) / WALK_FREQ
-        sw = _walk_samples(dur, h, t0_ns=t0, noise_scale=noise_scale)
-        samples.extend(sw)
-        t0 += len(sw) * DT_NS
 
-    gt = [(0, 0), (0, height), (width, height), (width, 0), (0, 0)]
-    return samples, gt
+def simulate_stationary_batch(duration_s: float, noise_scale: float = 1.0, rng=None,
+                              noise=None, rate: float = SAMPLE_RATE
+                              ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+    rng = _rng(rng)
+    session = _noise_session(noise, rng)
+    batch = _stationary_batch(duration_s, noise_scale=noise_scale, rng=rng, rate=rate)
+    return _noisy(session, batch, (0.0, 0.0), (0.0, 0.0)), [(0, 0)]
 
 
-def simulate_stationary(duration_s: float, noise_scale: float = 1.0
-                        ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
-    n = int(duration_s * SAMPLE_RATE)
-    samples: List[SensorData] = []
-    for i in range(n):
-        ts = i * DT_NS
-        samples.append(SensorData(
-            timestamp=ts,
-            accX=np.random.normal(0, ACC_NOISE * noise_scale * 0.5),
-            accY=GRAVITY + np.random.normal(0, ACC_NOISE * noise_scale * 0.2),
-            accZ=np.random.normal(0, ACC_NOISE * noise_scale * 0.5),
-            gyroZ=np.random.normal(0, GYRO_NOISE * noise_scale),
-            magX=MAG_STRENGTH * 0.0 + np.random.normal(0, MAG_NOISE * noise_scale),
-            magY=MAG_STRENGTH * 1.0 + np.random.normal(0, MAG_NOISE * noise_scale),
-        ))
-    gt = [(0, 0)]
-    return samples, gt
-
-
-def simulate_parking_scenario(noise_scale: float = 1.0
-                              ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+def simulate_parking_scenario_batch(noise_scale: float = 1.0, rng=None, noise=None,
+                                    rate: float = SAMPLE_RATE
+                                    ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
     """30m north -> left turn -> 15m west -> left turn -> 10m south."""
-    step_length = 0.7
     segments = [
         (0.0, 30.0),            # north 30m
         (3 * math.pi / 2, 15.0),  # west (heading=270°) 15m
         (math.pi, 10.0),        # south 10m
     ]
-    turn_dur = 1.5
-    samples: List[SensorData] = []
-    t0 = 0
+    batch = _legs_batch(segments, noise_scale=noise_scale, rng=rng, noise=noise, rate=rate)
+    gt = [(0, 0), (0, 30), (-15, 30), (-15, 20)]
+    return batch, gt
 
-    prev_h = None
-    for h, dist in segments:
-        if prev_h is not None:
-            st = _turn_samples(prev_h, h, turn_dur, t0_ns=t0, noise_scale=noise_scale)
-            samples.extend(st)
-            t0 += len(st) * DT_NS
-        dur = (dist / step_length) / WALK_FREQ
-        sw = _walk_samples(dur, h, t0_ns=t0, noise_scale=noise_scale)
-        samples.extend(sw)
-        t0 += len(sw) * DT_NS
-        prev_h = h
 
-    gt = [(0, 0), (0, 30), (-15, 30), (-15, 20)]
-    return samples, gt
+# ---------------------------------------------------------------------------
+# Public API — lazy streams of (SensorBatch chunk, new ground-truth vertices)
+# ---------------------------------------------------------------------------
+#
+# Memory stays flat whatever the duration: segments are generated one at a
+# time (long ones in pieces of at most *chunk_size* samples) and re-cut into
+# chunks of exactly *chunk_size* samples (the last may be shorter).
+# Timestamps and the gait phase run on continuously across pieces, turns
+# and chunks.  When no segment is longer than *chunk_size*, the concatenated
+# chunks equal the *_batch generator's stream sample for sample (same RNG
+# draws).
+#
+# Ground truth comes with the chunks: each chunk carries the vertices of the
+# legs that *begin* in it (the start point with the first chunk), so every
+# PDR point computed from a chunk has its leg available.  Vertices are snapped
+# to a 1e-9 m grid, so a closed loop returns exactly to its start.
+
+StreamChunk = Tuple[SensorBatch, List[Tuple[float, float]]]
+
+
+def _snap(v: float) -> float:
+    return round(v, 9) + 0.0
+
+
+def _pieces(n: int, size: int) -> Iterator[Tuple[int, int]]:
+    for first in range(0, n, size):
+        yield first, min(size, n - first)
+
+
+def _rechunk(batches: Iterable[Tuple[SensorBatch, List[Tuple[float, float]]]],
+             chunk_size: int) -> Iterator[StreamChunk]:
+    """Re-cut (batch, vertices) pieces into chunks of *chunk_size* samples."""
+    pending: List[SensorBatch] = []
+    pending_n = 0
+    gt: List[Tuple[float, float]] = []
+    for batch, vertices in batches:
+        gt.extend(vertices)
+        pending.append(batch)
+        pending_n += len(batch)
+        if pending_n < chunk_size:
+            continue
+        buf = SensorBatch.concatenate(pending)
+        lo = 0
+        while len(buf) - lo >= chunk_size:
+            yield buf[lo:lo + chunk_size], gt
+            gt = []
+            lo += chunk_size
+        pending = [buf[lo:]] if lo < len(buf) else []
+        pending_n = len(buf) - lo
+    if pending_n or gt:
+        yield SensorBatch.concatenate(pending), gt
+
+
+def iter_legs(legs: Iterable[Tuple[float, float]], step_length: float = 0.7,
+              turn_dur: float = 1.5, noise_scale: float = 1.0,
+              chunk_size: int = CHUNK_SAMPLES, duration_s: Optional[float] = None,
+              start: Tuple[float, float] = (0.0, 0.0), rng=None, noise=None,
+              rate: float = SAMPLE_RATE) -> Iterator[StreamChunk]:
+    """Lazy counterpart of simulate_legs_batch: (heading, distance) legs, turning
+    in place between them.
+
+    *legs* may be an endless iterator if *duration_s* is given; the stream
+    then stops after that many seconds, cutting the current turn or leg
+    short (a cut leg ends where the walker actually got to).
+    """
+    rng = _rng(rng)
+    session = _noise_session(noise, rng)
+    dt = dt_ns(rate)
+
+    def pieces():
+        x, z = _snap(start[0]), _snap(start[1])
+        yield SensorBatch.empty(), [(x, z)]
+        left = None if duration_s is None else int(duration_s * rate)
+        t0 = 0
+        prev_h = None
+        for h, dist in legs:
+            if left is not None and left <= 0:
+                return
+            if prev_h is not None:
+                st = _turn_batch(prev_h, h, turn_dur, t0_ns=t0, noise_scale=noise_scale, rng=rng,
+                                 rate=rate)
+                if left is not None:
+                    st = st[:left]
+                    left -= len(st)
+                t0 += len(st) * dt
+                yield _noisy(session, st, (x, z), (x, z)), []
+                if left is not None and left <= 0:
+                    return
+            n = int((dist / step_length) / WALK_FREQ * rate)
+            if left is not None and n > left:
+                dist *= left / n
+                n = left
+            if left is not None:
+                left -= n
+            x0, z0 = x, z
+            x, z = _snap(x + dist * math.sin(h)), _snap(z + dist * math.cos(h))
+            vertices = [(x, z)]
+            for first, k in _pieces(n, chunk_size):
+                piece = _walk_piece(first, k, h, t0, noise_scale, rng=rng, rate=rate)
+                yield _noisy(session, piece, (x0, z0), (x, z), first, n), vertices
+                vertices = []
+                t0 += k * dt
+            prev_h = h
+
+    return _rechunk(pieces(), chunk_size)
+
+
+def simulate_straight_stream(distance: float, heading: float, step_length: float = 0.7,
+                             noise_scale: float = 1.0, chunk_size: int = CHUNK_SAMPLES,
+                             rng=None, noise=None, rate: float = SAMPLE_RATE
+                             ) -> Iterator[StreamChunk]:
+    return iter_legs([(heading, distance)], step_length, noise_scale=noise_scale,
+                     chunk_size=chunk_size, rng=rng, noise=noise, rate=rate)
+
+
+def simulate_l_shape_stream(leg1: float, leg2: float, noise_scale: float = 1.0,
+                            chunk_size: int = CHUNK_SAMPLES, rng=None, noise=None,
+                            rate: float = SAMPLE_RATE) -> Iterator[StreamChunk]:
+    return iter_legs([(0.0, leg1), (math.pi / 2, leg2)], noise_scale=noise_scale,
+                     chunk_size=chunk_size, rng=rng, noise=noise, rate=rate)
+
+
+def simulate_rectangle_stream(width: float, height: float, noise_scale: float = 1.0,
+                              laps: int = 1, chunk_size: int = CHUNK_SAMPLES, rng=None,
+                              noise=None, rate: float = SAMPLE_RATE) -> Iterator[StreamChunk]:
+    """*laps* times round the rectangle of simulate_rectangle_batch."""
+    headings = [0.0, math.pi / 2, math.pi, 3 * math.pi / 2]
+    lap = list(zip(headings, [height, width, height, width]))
+    return iter_legs(itertools.chain.from_iterable(itertools.repeat(lap, laps)),
+                     noise_scale=noise_scale, chunk_size=chunk_size, rng=rng, noise=noise,
+                     rate=rate)
+
+
+def simulate_stationary_stream(duration_s: float, noise_scale: float = 1.0,
+                               chunk_size: int = CHUNK_SAMPLES, rng=None, noise=None,
+                               rate: float = SAMPLE_RATE) -> Iterator[StreamChunk]:
+    rng = _rng(rng)
+    session = _noise_session(noise, rng)
+    dt = dt_ns(rate)
+
+    def pieces():
+        yield SensorBatch.empty(), [(0.0, 0.0)]
+        for first, k in _pieces(int(duration_s * rate), chunk_size):
+            piece = _stationary_piece(k, first * dt, noise_scale, rng=rng, rate=rate)
+            yield _noisy(session, piece, (0.0, 0.0), (0.0, 0.0)), []
+
+    return _rechunk(pieces(), chunk_size)
+
+
+def simulate_parking_scenario_stream(noise_scale: float = 1.0, chunk_size: int = CHUNK_SAMPLES,
+                                     rng=None, noise=None, rate: float = SAMPLE_RATE
+                                     ) -> Iterator[StreamChunk]:
+    return iter_legs([(0.0, 30.0), (3 * math.pi / 2, 15.0), (math.pi, 10.0)],
+                     noise_scale=noise_scale, chunk_size=chunk_size, rng=rng, noise=noise,
+                     rate=rate)
+
+
+def simulate_soak_stream(duration_s: float, legs: Optional[Sequence[Tuple[float, float]]] = None,
+                         noise_scale: float = 1.0, chunk_size: int = CHUNK_SAMPLES, rng=None,
+                         noise=None, rate: float = SAMPLE_RATE) -> Iterator[StreamChunk]:
+    """Walk the closed loop *legs* (default: the 20 × 10 m rectangle) over and
+    over for *duration_s* seconds — e.g. 8 * 3600 for a shift-long soak test."""
+    if legs is None:
+        legs = [(0.0, 10.0), (math.pi / 2, 20.0), (math.pi, 10.0), (3 * math.pi / 2, 20.0)]
+    return iter_legs(itertools.cycle(legs), noise_scale=noise_scale, chunk_size=chunk_size,
+                     duration_s=duration_s, rng=rng, noise=noise, rate=rate)
+
+
+# ---------------------------------------------------------------------------
+# Public API — legacy list-of-SensorData wrappers
+# ---------------------------------------------------------------------------
+
+def simulate_straight(distance: float, heading: float, step_length: float = 0.7,
+                      noise_scale: float = 1.0, rng=None
+                      ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+    """Returns (sensor_stream, ground_truth_points)."""
+    batch, gt = simulate_straight_batch(distance, heading, step_length, noise_scale, rng)
+    return list(batch.as_samples()), gt
+
+
+def simulate_turn(from_heading: float, to_heading: float, duration_s: float = 1.5,
+                  t0_ns: int = 0, noise_scale: float = 1.0, rng=None) -> List[SensorData]:
+    return _turn_samples(from_heading, to_heading, duration_s, t0_ns, noise_scale, rng)
+
+
+def simulate_l_shape(leg1: float, leg2: float, noise_scale: float = 1.0, rng=None
+                     ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+    batch, gt = simulate_l_shape_batch(leg1, leg2, noise_scale, rng)
+    return list(batch.as_samples()), gt
+
+
+def simulate_rectangle(width: float, height: float, noise_scale: float = 1.0, rng=None
+                       ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+    """Walk a rectangle: north -> east -> south -> west -> back to origin."""
+    batch, gt = simulate_rectangle_batch(width, height, noise_scale, rng)
+    return list(batch.as_samples()), gt
+
+
+def simulate_stationary(duration_s: float, noise_scale: float = 1.0, rng=None
+                        ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+    batch, gt = simulate_stationary_batch(duration_s, noise_scale, rng)
+    return list(batch.as_samples()), gt
+
+
+def simulate_parking_scenario(noise_scale: float = 1.0, rng=None
+                              ) -> Tuple[List[SensorData], List[Tuple[float, float]]]:
+    """30m north -> left turn -> 15m west -> left turn -> 10m south."""
+    batch, gt = simulate_parking_scenario_batch(noise_scale, rng)
+    return list(batch.as_samples()), gt
@@ -1,12 +1,16 @@
 """
 Python PDR engine — faithful port of the Kotlin implementation.
-Classes: StepDetector, OrientationEstimator, KalmanFilter, PDREngine
+Classes: SensorBatch, StepDetector, OrientationEstimator, KalmanFilter, PDRConfig, PDREngine
 """
 
+import json
 import math
 import numpy as np
-from dataclasses import dataclass, field
-from typing import List, Callable, Optional
+from dataclasses import dataclass, field, asdict
+from typing import List, Callable, Iterator, Optional, Sequence, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+
+_TWO_PI = 2 * math.pi
 
 
 # ---------------------------------------------------------------------------
@@ -33,21 +37,131 @@ class StepEvent:
     timestamp: int
 
 
+@dataclass
+class SensorBatch:
+    """Struct-of-arrays sensor stream: one contiguous column per channel.
+
+    timestamp: (n,) int64 ns;  acc / gyro / mag: (n, 3) float64 as x, y, z.
+    """
+    timestamp: np.ndarray
+    acc: np.ndarray
+    gyro: np.ndarray
+    mag: np.ndarray
+    # File the columns are memory-mapped from (see stream_cache), if any.
+    source: Optional[str] = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        self.timestamp = np.ascontiguousarray(self.timestamp, dtype=np.int64)
+        self.acc = np.ascontiguousarray(self.acc, dtype=np.float64).reshape(-1, 3)
+        self.gyro = np.ascontiguousarray(self.gyro, dtype=np.float64).reshape(-1, 3)
+        self.mag = np.ascontiguousarray(self.mag, dtype=np.float64).reshape(-1, 3)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, idx) -> "SensorBatch":
+        """Slice rows; basic slices are views into the same columns."""
+        if isinstance(idx, (int, np.integer)):
+            idx = slice(idx, idx + 1 or None)
+        return SensorBatch(self.timestamp[idx], self.acc[idx], self.gyro[idx], self.mag[idx])
+
+    @classmethod
+    def empty(cls) -> "SensorBatch":
+        return cls(np.empty(0, np.int64), np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3)))
+
+    @classmethod
+    def concatenate(cls, batches: Sequence["SensorBatch"]) -> "SensorBatch":
+        if not batches:
+            return cls.empty()
+        return cls(np.concatenate([b.timestamp for b in batches]),
+                   np.concatenate([b.acc for b in batches]),
+                   np.concatenate([b.gyro for b in batches]),
+                   np.concatenate([b.mag for b in batches]))
+
+    @classmethod
+    def from_samples(cls, samples: Sequence[SensorData]) -> "SensorBatch":
+        """Build from legacy SensorData objects.
+
+        A SensorDataView returns its backing batch without copying.
+        """
+        if isinstance(samples, SensorDataView):
+            return samples.batch
+        n = len(samples)
+        ts = np.fromiter((s.timestamp for s in samples), dtype=np.int64, count=n)
+        rows = np.fromiter(
+            ((s.accX, s.accY, s.accZ, s.gyroX, s.gyroY, s.gyroZ, s.magX, s.magY, s.magZ)
+             for s in samples),
+            dtype=np.dtype((np.float64, 9)), count=n)
+        return cls(ts, rows[:, 0:3], rows[:, 3:6], rows[:, 6:9])
+
+    def as_samples(self) -> "SensorDataView":
+        """Zero-copy, read-only list-like view yielding SensorData on access."""
+        return SensorDataView(self)
+
+
+class SensorDataView(Sequence):
+    """Lazy Sequence[SensorData] over a SensorBatch — objects are built per access."""
+
+    __slots__ = ("batch",)
+    _ITER_CHUNK = 4096
+
+    def __init__(self, batch: SensorBatch):
+        self.batch = batch
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return SensorDataView(self.batch[idx])
+        b = self.batch
+        a, g, m = b.acc[idx], b.gyro[idx], b.mag[idx]
+        return SensorData(int(b.timestamp[idx]),
+                          float(a[0]), float(a[1]), float(a[2]),
+                          float(g[0]), float(g[1]), float(g[2]),
+                          float(m[0]), float(m[1]), float(m[2]))
+
+    def __iter__(self) -> Iterator[SensorData]:
+        b = self.batch
+        for lo in range(0, len(b), self._ITER_CHUNK):
+            hi = lo + self._ITER_CHUNK
+            cols = zip(b.timestamp[lo:hi].tolist(), b.acc[lo:hi].tolist(),
+                       b.gyro[lo:hi].tolist(), b.mag[lo:hi].tolist())
+            for t, a, g, m in cols:
+                yield SensorData(t, a[0], a[1], a[2], g[0], g[1], g[2], m[0], m[1], m[2])
+
+
 # ---------------------------------------------------------------------------
 # StepDetector  (peak-detection + Weinberg)
 # ---------------------------------------------------------------------------
 
+def window_samples(window_ns: int, sample_rate: float) -> int:
+    """Samples spanning *window_ns* at *sample_rate* Hz (at least 3)."""
+    return max(3, int(round(window_ns * sample_rate / 1e9)))
+
+
 class StepDetector:
+    """The peak window is defined in time (*window_ns*, 0.6 s = 30 samples
+    at the Kotlin app's 50 Hz) and sized in samples for *sample_rate*."""
+
     def __init__(self, weinberg_k: float = 0.5, peak_threshold: float = 1.2,
-                 min_step_interval_ns: int = 300_000_000):
+                 min_step_interval_ns: int = 300_000_000, window_ns: int = 600_000_000,
+                 sample_rate: float = 50.0):
         self.weinberg_k = weinberg_k
         self.peak_threshold = peak_threshold
         self.min_step_interval = min_step_interval_ns
+        self.window_ns = window_ns
         self.step_count = 0
         self._last_step_time = 0
         self._window: List[float] = []
-        self._window_size = 30
         self._listener: Optional[Callable[[StepEvent], None]] = None
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, sample_rate: float):
+        """Resize the window for input at *sample_rate* Hz (keeps the newest samples)."""
+        self.sample_rate = sample_rate
+        self._window_size = window_samples(self.window_ns, sample_rate)
+        del self._window[:-self._window_size]
 
     def set_on_step_listener(self, fn: Callable[[StepEvent], None]):
         self._listener = fn
@@ -74,6 +188,67 @@ class StepDetector:
             if self._listener:
                 self._listener(StepEvent(step_length, timestamp))
 
+    def detect_batch(self, acc_xyz: np.ndarray, timestamps: np.ndarray
+                     ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized equivalent of calling on_accelerometer_update per row.
+
+        Sliding max/min are computed over the whole array; only the
+        refractory check runs as a scalar loop over peak candidates.
+        Continues from (and updates) the streaming state, so batch and
+        per-sample calls can be freely interleaved.  The step listener is
+        not invoked.  Returns (step_timestamps, step_lengths).
+        """
+        ts = np.asarray(timestamps, dtype=np.int64)
+        idx, lengths = self._detect_indices(acc_xyz, ts)
+        return ts[idx], lengths
+
+    def _detect_indices(self, acc_xyz: np.ndarray, ts: np.ndarray,
+                        counters: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """detect_batch core: returns (row indices of steps, step lengths).
+
+        *counters* (e.g. a collections.Counter) is given the number of window
+        peaks rejected by the threshold and by the refractory interval.
+        """
+        acc = np.asarray(acc_xyz, dtype=np.float64)
+        if len(ts) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        ax, ay, az = acc[:, 0], acc[:, 1], acc[:, 2]
+        mags = np.sqrt(ax * ax + ay * ay + az * az)
+        prefix = len(self._window)
+        full = np.concatenate((np.asarray(self._window, dtype=np.float64), mags))
+        w = self._window_size
+
+        steps_i: List[int] = []
+        steps_len: List[float] = []
+        # First window whose last sample is a new reading.
+        first = max(prefix - w + 1, 0)
+        if len(full) >= w and len(full) - w >= first:
+            windows = sliding_window_view(full, w)[first:]
+            a_max = windows.max(axis=1)
+            a_min = windows.min(axis=1)
+            mid_val = full[first + w // 2: first + w // 2 + len(windows)]
+            is_peak = (mid_val == a_max) & ((a_max - 9.81) > self.peak_threshold)
+
+            # Row in `ts` for the window ending at full[first + k + w - 1].
+            ts_offset = first + w - 1 - prefix
+            last = self._last_step_time
+            for k in np.flatnonzero(is_peak):
+                t = int(ts[k + ts_offset])
+                if (t - last) > self.min_step_interval:
+                    last = t
+                    steps_i.append(k + ts_offset)
+                    steps_len.append(self.weinberg_k * ((float(a_max[k]) - float(a_min[k])) ** 0.25))
+            self._last_step_time = last
+            self.step_count += len(steps_i)
+            if counters is not None:
+                peaks = int(np.count_nonzero(is_peak))
+                counters["peaks_rejected_threshold"] += int(np.count_nonzero(mid_val == a_max)) - peaks
+                counters["peaks_rejected_refractory"] += peaks - len(steps_i)
+
+        self._window = full[-w:].tolist()
+        return np.array(steps_i, dtype=np.intp), np.array(steps_len, dtype=np.float64)
+
     def reset(self):
         self.step_count = 0
         self._window.clear()
@@ -92,22 +267,25 @@ class OrientationEstimator:
         self._initialized = False
 
     def update(self, data: SensorData):
-        mag_heading = self._compute_mag_heading(data)
+        self._update(data.timestamp, data.gyroZ, data.magX, data.magY)
+
+    def _update(self, timestamp: int, gyro_z: float, mag_x: float, mag_y: float):
+        mag_heading = self._mag_heading(mag_x, mag_y)
 
         if not self._initialized:
             self.heading = mag_heading
-            self._last_timestamp = data.timestamp
+            self._last_timestamp = timestamp
             self._initialized = True
             return
 
-        dt = (data.timestamp - self._last_timestamp) * 1e-9
-        self._last_timestamp = data.timestamp
+        dt = (timestamp - self._last_timestamp) * 1e-9
+        self._last_timestamp = timestamp
 
         if dt <= 0 or dt > 1.0:
             self.heading = mag_heading
             return
 
-        gyro_heading = self.heading + data.gyroZ * dt
+        gyro_heading = self.heading + gyro_z * dt
 
         # Complementary filter with proper angular wrapping
         diff = mag_heading - gyro_heading
@@ -119,10 +297,92 @@ class OrientationEstimator:
         if self.heading < 0:
             self.heading += 2 * math.pi
 
+    def filter_series(self, timestamps, gyro_z, mag_x, mag_y, block: int = 128) -> np.ndarray:
+        """Vectorized update() over whole arrays; returns the heading after
+        every sample and leaves the estimator in the same state (so series
+        and per-sample calls can be mixed and resumed).
+
+        Magnetometer headings, dt, the reset mask (dt <= 0 or dt > 1.0) and
+        the final wrapping are array operations.  Between resets the filter
+        is solved on the unwrapped angle, where it is linear:
+
+            H[k] = alpha * H[k-1] + alpha * gyro_z[k] * dt[k] + (1 - alpha) * M[k]
+
+        with M the magnetometer heading on the branch nearest the gyro
+        prediction.  Each *block* of samples is one triangular matrix
+        product; the only scalar work is the carry between blocks and the
+        rare sample where mag and gyro disagree by about ±π (there the
+        branch is ambiguous, so that sample runs the per-sample code).
+        Matches update() to ~1e-12 rad.
+        """
+        ts = np.asarray(timestamps, dtype=np.int64)
+        n = len(ts)
+        if n == 0:
+            return np.empty(0)
+        m = np.arctan2(np.asarray(mag_x, dtype=np.float64), np.asarray(mag_y, dtype=np.float64))
+        m = np.where(m < 0, m + _TWO_PI, m)
+        dt = (ts - np.concatenate(([self._last_timestamp], ts[:-1]))) * 1e-9
+        reset = (dt <= 0) | (dt > 1.0)
+        if not self._initialized:
+            reset[0] = True
+        inc = np.asarray(gyro_z, dtype=np.float64) * dt
+        resets = np.flatnonzero(reset)
+
+        a = self.alpha
+        k = np.arange(block)
+        tri = np.tril(a ** np.maximum(k[:, None] - k[None, :], 0).astype(np.float64))
+        powers = a ** np.arange(1, block + 1, dtype=np.float64)
+        # Samples whose mag/gyro difference lies this close to ±π take the scalar path.
+        tol = 1e-9
+
+        out = np.empty(n)
+        h = self.heading
+        i = 0
+        while i < n:
+            if reset[i]:
+                h = out[i] = m[i]
+                i += 1
+                continue
+            nxt = np.searchsorted(resets, i)
+            j = min(i + block, int(resets[nxt]) if nxt < len(resets) else n)
+            g0 = h + inc[i]
+            # Unwrapped per block so the angles stay small (no precision drift).
+            mag_seg = np.unwrap(m[i:j])
+            mag_seg += _TWO_PI * round((g0 - mag_seg[0]) / _TWO_PI)
+            b = a * inc[i:j] + (1 - a) * mag_seg
+            L = j - i
+            hs = tri[:L, :L] @ b + powers[:L] * h
+            g = np.concatenate(([h], hs[:-1])) + inc[i:j]
+            d = mag_seg - g
+            bad = np.flatnonzero((d < -math.pi + tol) | (d >= math.pi - tol))
+            p = int(bad[0]) if len(bad) else L
+            out[i:i + p] = hs[:p]
+            if p:
+                h = float(hs[p - 1])
+            if p < L:
+                # Ambiguous branch: exactly the per-sample arithmetic.
+                kk = i + p
+                gh = h + float(inc[kk])
+                diff = (float(m[kk]) - gh + math.pi) % _TWO_PI - math.pi
+                h = out[kk] = gh + (1 - a) * diff
+                p += 1
+            h %= _TWO_PI
+            i += p
+
+        out %= _TWO_PI
+        self.heading = float(out[-1])
+        self._last_timestamp = int(ts[-1])
+        self._initialized = True
+        return out
+
     @staticmethod
     def _compute_mag_heading(data: SensorData) -> float:
         """Simplified: use atan2(magY, magX) — same fallback as Kotlin."""
-        h = math.atan2(data.magX, data.magY)  # heading: 0=north
+        return OrientationEstimator._mag_heading(data.magX, data.magY)
+
+    @staticmethod
+    def _mag_heading(mag_x: float, mag_y: float) -> float:
+        h = math.atan2(mag_x, mag_y)  # heading: 0=north
         if h < 0:
             h += 2 * math.pi
         return h
@@ -157,29 +417,300 @@ class KalmanFilter:
         self._error_cov = (1 - K) * predicted_error
         return self._estimate
 
+    def steady_state(self) -> Tuple[float, float]:
+        """(gain, error covariance) the filter converges to: the fixed point of
+        P⁻ = P + Q, K = P⁻ / (P⁻ + R), P = (1 - K) P⁻."""
+        Q, R = self.Q, self.R
+        predicted = (Q + math.sqrt(Q * Q + 4 * Q * R)) / 2
+        gain = predicted / (predicted + R) if predicted + R > 0 else 1.0
+        return gain, (1 - gain) * predicted
+
+    def filter_series(self, measurements, tol: float = 1e-13) -> np.ndarray:
+        """update() over a whole array; returns every estimate and leaves the
+        filter in the same state.
+
+        The covariance recursion does not depend on the data, so it runs
+        per sample only until the gain is within *tol* (relative) of the
+        steady-state gain.  From there on the filter is the fixed linear
+        recurrence x[k] = (1 - K) x[k-1] + K z[k], solved in blocks.
+        """
+        z = np.asarray(measurements, dtype=np.float64)
+        n = len(z)
+        out = np.empty(n)
+        if n == 0:
+            return out
+        i = 0
+        if not self._initialized:
+            self._estimate = float(z[0])
+            self._error_cov = 1.0
+            self._initialized = True
+            out[0] = self._estimate
+            i = 1
+        gain, cov = self.steady_state()
+        x, p = self._estimate, self._error_cov
+        while i < n:
+            predicted_error = p + self.Q
+            K = predicted_error / (predicted_error + self.R)
+            if abs(K - gain) <= tol * gain:
+                break
+            x += K * (float(z[i]) - x)
+            p = (1 - K) * predicted_error
+            out[i] = x
+            i += 1
+        if i < n:
+            out[i:] = linear_recurrence(1 - gain, gain * z[i:], x)
+            x, p = float(out[-1]), cov
+        self._estimate, self._error_cov = x, p
+        return out
+
     def reset(self):
         self._estimate = 0.0
         self._error_cov = 1.0
         self._initialized = False
 
 
+def linear_recurrence(a, b: np.ndarray, x0, block: int = 128) -> np.ndarray:
+    """x[k] = a * x[k-1] + b[k] with x[-1] = x0, for (n,) or (n, d) *b*.
+
+    *a* is a scalar or one coefficient per column.  Two-level scan: every
+    block of *block* samples is solved from zero with one triangular
+    (Toeplitz) matrix product for all blocks at once, then the block ends
+    are chained by the same recurrence with coefficient a ** block, and
+    each block adds its carried-in state times a ** (1 .. block).
+    """
+    b = np.asarray(b, dtype=np.float64)
+    flat = b.ndim == 1
+    b2 = b.reshape(len(b), -1)
+    n, d = b2.shape
+    a = np.broadcast_to(np.asarray(a, dtype=np.float64), (d,))
+    x0 = np.broadcast_to(np.asarray(x0, dtype=np.float64), (d,))
+    if n <= block:
+        out = np.empty((n, d))
+        x = x0.copy()
+        for k in range(n):
+            x = a * x + b2[k]
+            out[k] = x
+        return out[:, 0] if flat else out
+    m = -(-n // block)
+    padded = np.zeros((m * block, d))
+    padded[:n] = b2
+    blocks = padded.reshape(m, block, d)
+    k = np.arange(block)
+    lag = k[:, None] - k[None, :]
+    local = np.empty_like(blocks)
+    for c in range(d):
+        tri = np.where(lag >= 0, a[c] ** np.maximum(lag, 0), 0.0)
+        local[:, :, c] = blocks[:, :, c] @ tri.T
+    ends = linear_recurrence(a ** block, local[:, -1, :], x0, block)
+    carried = np.concatenate((x0[None, :], ends[:-1]))                   # state entering each block
+    powers = a[None, :] ** np.arange(1, block + 1)[:, None]              # (block, d)
+    out = (local + powers[None, :, :] * carried[:, None, :]).reshape(m * block, d)[:n]
+    return out[:, 0] if flat else out
+
+
+# ---------------------------------------------------------------------------
+# Trajectory buffer
+# ---------------------------------------------------------------------------
+
+class TrajectoryBuffer:
+    """Per-step track: timestamp plus x, z, heading and step length columns.
+
+    Rows live in preallocated arrays that double when full (amortised O(1)
+    appends).  With *maxlen*, only the newest *maxlen* rows are kept: the
+    storage is 2 × maxlen rows and the live window is slid back to the front
+    when it reaches the end, so the window is always contiguous and every
+    accessor is a zero-copy view.  Views stay valid until the next append.
+
+    The first row is the origin (timestamp 0, heading NaN, step length 0).
+    """
+
+    _MIN_CAPACITY = 256
+
+    def __init__(self, maxlen: Optional[int] = None, origin: Tuple[float, float] = (0.0, 0.0)):
+        if maxlen is not None and maxlen < 1:
+            raise ValueError("maxlen must be at least 1")
+        self.maxlen = maxlen
+        cap = 2 * maxlen if maxlen is not None else self._MIN_CAPACITY
+        self._ts = np.zeros(cap, dtype=np.int64)
+        self._data = np.zeros((cap, 4))      # x, z, heading, step length
+        self.reset(origin)
+
+    def reset(self, origin: Optional[Tuple[float, float]] = (0.0, 0.0)):
+        """Drop every row; start again from *origin* (or empty with None)."""
+        self._lo = 0
+        self._hi = 0
+        self.dropped = 0
+        if origin is not None:
+            self.append(0, float(origin[0]), float(origin[1]), math.nan, 0.0)
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    def _reserve(self, k: int):
+        """Make room for *k* more rows at the end of the live window."""
+        cap = len(self._ts)
+        if self._hi + k <= cap:
+            return
+        n = self._hi - self._lo
+        if self.maxlen is None:
+            new_cap = max(cap * 2, n + k)
+            ts = np.zeros(new_cap, dtype=np.int64)
+            data = np.zeros((new_cap, 4))
+            ts[:n] = self._ts[self._lo:self._hi]
+            data[:n] = self._data[self._lo:self._hi]
+            self._ts, self._data = ts, data
+        else:
+            keep = min(n, self.maxlen - min(k, self.maxlen))
+            self.dropped += n - keep
+            self._ts[:keep] = self._ts[self._hi - keep:self._hi]
+            self._data[:keep] = self._data[self._hi - keep:self._hi]
+            n = keep
+        self._lo, self._hi = 0, n
+
+    def append(self, timestamp: int, x: float, z: float, heading: float, step_length: float):
+        self._reserve(1)
+        i = self._hi
+        self._ts[i] = timestamp
+        self._data[i] = (x, z, heading, step_length)
+        self._hi = i + 1
+        self._trim()
+
+    def extend(self, timestamps, x, z, heading, step_length):
+        """Append rows from equal-length sequences / arrays."""
+        k = len(timestamps)
+        if self.maxlen is not None and k > self.maxlen:
+            self.dropped += k - self.maxlen
+            cut = slice(k - self.maxlen, k)
+            timestamps, x, z, heading, step_length = (
+                timestamps[cut], x[cut], z[cut], heading[cut], step_length[cut])
+            k = self.maxlen
+        if not k:
+            return
+        self._reserve(k)
+        i, j = self._hi, self._hi + k
+        self._ts[i:j] = timestamps
+        d = self._data
+        d[i:j, 0] = x
+        d[i:j, 1] = z
+        d[i:j, 2] = heading
+        d[i:j, 3] = step_length
+        self._hi = j
+        self._trim()
+
+    def _trim(self):
+        if self.maxlen is not None and self._hi - self._lo > self.maxlen:
+            self.dropped += self._hi - self._lo - self.maxlen
+            self._lo = self._hi - self.maxlen
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self._ts[self._lo:self._hi]
+
+    @property
+    def xy(self) -> np.ndarray:
+        """(n, 2) view of (x, z)."""
+        return self._data[self._lo:self._hi, :2]
+
+    @property
+    def heading(self) -> np.ndarray:
+        return self._data[self._lo:self._hi, 2]
+
+    @property
+    def step_length(self) -> np.ndarray:
+        return self._data[self._lo:self._hi, 3]
+
+    @property
+    def last(self) -> Tuple[float, float]:
+        i = self._hi - 1
+        return (float(self._data[i, 0]), float(self._data[i, 1]))
+
+
+class TrajectoryList(Sequence):
+    """List-of-(x, z)-tuples face of a TrajectoryBuffer (the old trajectory API)."""
+
+    def __init__(self, buffer: TrajectoryBuffer):
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __getitem__(self, idx):
+        xy = self._buffer.xy
+        if isinstance(idx, slice):
+            return list(map(tuple, xy[idx].tolist()))
+        x, z = xy[idx].tolist()
+        return (x, z)
+
+    def __iter__(self):
+        return iter(list(map(tuple, self._buffer.xy.tolist())))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, point: Tuple[float, float]):
+        self._buffer.append(0, float(point[0]), float(point[1]), math.nan, math.nan)
+
+    def extend(self, points):
+        for p in points:
+            self.append(p)
+
+    def clear(self):
+        self._buffer.reset(None)
+
+
 # ---------------------------------------------------------------------------
 # PDREngine
 # ---------------------------------------------------------------------------
 
+@dataclass
+class PDRConfig:
+    """Tunable engine parameters; defaults match the Kotlin implementation."""
+    weinberg_k: float = 0.5
+    peak_threshold: float = 1.2
+    min_step_interval_ns: int = 300_000_000
+    alpha: float = 0.98
+    step_window_ns: int = 600_000_000
+    sample_rate: float = 50.0       # Hz of the samples the engine is fed
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+    @classmethod
+    def from_json(cls, text: str) -> "PDRConfig":
+        return cls(**json.loads(text))
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.to_json() + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "PDRConfig":
+        with open(path) as f:
+            return cls.from_json(f.read())
+
+
 class PDREngine:
-    def __init__(self):
-        self.step_detector = StepDetector()
-        self.orientation_estimator = OrientationEstimator()
+    def __init__(self, config: Optional[PDRConfig] = None, max_trajectory: Optional[int] = None):
+        """*max_trajectory* caps the trajectory at the newest that many points
+        (ring-buffer mode for long-running live sessions)."""
+        self.config = config or PDRConfig()
+        self.step_detector = StepDetector(self.config.weinberg_k, self.config.peak_threshold,
+                                          self.config.min_step_interval_ns,
+                                          self.config.step_window_ns, self.config.sample_rate)
+        self.orientation_estimator = OrientationEstimator(self.config.alpha)
         self.pos_x = 0.0  # east
         self.pos_z = 0.0  # north  (note: Kotlin uses Z=south for screen coords; we keep north-positive for plotting)
-        self.trajectory: List[tuple] = [(0.0, 0.0)]
+        self.track = TrajectoryBuffer(max_trajectory)
+        self.instrumentation = None  # see instrument()
 
         def _on_step(event: StepEvent):
             heading = self.orientation_estimator.heading
             self.pos_x += event.step_length * math.sin(heading)
             self.pos_z += event.step_length * math.cos(heading)
-            self.trajectory.append((self.pos_x, self.pos_z))
+            self.track.append(event.timestamp, self.pos_x, self.pos_z, heading, event.step_length)
 
         self.step_detector.set_on_step_listener(_on_step)
 
@@ -187,10 +718,74 @@ class PDREngine:
         self.step_detector.on_accelerometer_update(data.accX, data.accY, data.accZ, data.timestamp)
         self.orientation_estimator.update(data)
 
+    def instrument(self, instrumentation=None):
+        """Attach an instrumentation.Instrumentation, or detach with None.
+
+        Attaching swaps in timed/counting versions of on_sensor_update and
+        process_batch on this instance only; once detached the engine runs
+        the plain methods again, so disabled instrumentation costs nothing.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.detach()
+        if instrumentation is not None:
+            instrumentation.attach(self)
+        return instrumentation
+
+    def process_batch(self, batch: SensorBatch):
+        """Feed a whole SensorBatch; same result as on_sensor_update per row.
+
+        Steps come from StepDetector.detect_batch.  As in the streaming path,
+        each step uses the heading from *before* its own sample is fused.
+        Position, trajectory and step count are updated in bulk.
+        """
+        if len(batch) == 0:
+            return
+        step_idx, step_len = self.step_detector._detect_indices(batch.acc, batch.timestamp)
+        headings = self._fuse_headings(batch, step_idx)
+        self._advance(batch.timestamp[step_idx], step_len, headings)
+
+    def _fuse_headings(self, batch: SensorBatch, step_idx: np.ndarray) -> List[float]:
+        """Run the orientation filter over *batch* (OrientationEstimator.filter_series);
+        return the heading in effect just before each row in *step_idx*."""
+        est = self.orientation_estimator
+        before = est.heading
+        after = est.filter_series(batch.timestamp, batch.gyro[:, 2], batch.mag[:, 0], batch.mag[:, 1])
+        prev = np.concatenate(([before], after[:-1]))
+        return prev[step_idx].tolist()
+
+    def _advance(self, timestamps: np.ndarray, step_lengths: np.ndarray, headings: List[float]):
+        """Dead-reckon a run of steps and append them to the trajectory."""
+        x, z = self.pos_x, self.pos_z
+        xs = []
+        zs = []
+        for length, heading in zip(step_lengths.tolist(), headings):
+            x += length * math.sin(heading)
+            z += length * math.cos(heading)
+            xs.append(x)
+            zs.append(z)
+        self.pos_x, self.pos_z = x, z
+        self.track.extend(timestamps, xs, zs, headings, step_lengths)
+
+    @property
+    def trajectory(self) -> TrajectoryList:
+        """The trajectory as a sequence of (x, z) tuples (compatibility view)."""
+        return TrajectoryList(self.track)
+
+    @trajectory.setter
+    def trajectory(self, points: Sequence[Tuple[float, float]]):
+        self.track.reset(None)
+        for x, z in points:
+            self.track.append(0, float(x), float(z), math.nan, math.nan)
+
+    @property
+    def trajectory_array(self) -> np.ndarray:
+        """Zero-copy (n, 2) view of the trajectory's (x, z) columns."""
+        return self.track.xy
+
     def reset(self):
         self.pos_x = 0.0
         self.pos_z = 0.0
-        self.trajectory = [(0.0, 0.0)]
+        self.track.reset()
         self.step_detector.reset()
         self.orientation_estimator.reset()
 
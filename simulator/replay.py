@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Replay of Android DataExporter sensor CSVs through the Python PDR engine.
+Usage:  python replay.py sensors_YYYYMMDD_HHMMSS.csv [--chunk-rows 65536] [--config best.json]
+
+The file is read in fixed-size chunks straight into columnar arrays, so
+memory stays flat regardless of file size.  The phone's own posX/posZ/
+heading/stepCount columns are carried alongside each chunk and compared
+with the engine at every chunk boundary.
+"""
+
+import sys, os, argparse, itertools, math, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, TextIO
+
+from pdr_engine import PDRConfig, PDREngine, SensorBatch
+
+HEADER = ("timestamp,accX,accY,accZ,gyroX,gyroY,gyroZ,magX,magY,magZ,"
+          "posX,posY,posZ,heading,stepCount,source")
+
+# One record per CSV row; parsed by np.loadtxt without per-row Python objects.
+ROW_DTYPE = np.dtype([
+    ("timestamp", np.int64),
+    ("imu", np.float64, (9,)),       # acc xyz, gyro xyz, mag xyz
+    ("pos", np.float64, (3,)),
+    ("heading", np.float64),
+    ("step_count", np.int64),
+    ("source", "U8"),
+])
+
+# DataExporter writes System.currentTimeMillis(); SensorEvent (and simulator)
+# timestamps are ns.  In "auto" mode a median row spacing below this many
+# units means milliseconds (10 s in ms, 10 µs in ns).
+_MS_SPACING_LIMIT = 10_000
+_UNIT_SCALE = {"ns": 1, "ms": 1_000_000}
+
+
+@dataclass
+class DeviceTrack:
+    """The phone's own engine output for the rows of one chunk."""
+    timestamp: np.ndarray
+    pos_x: np.ndarray
+    pos_y: np.ndarray
+    pos_z: np.ndarray
+    heading: np.ndarray
+    step_count: np.ndarray
+    fused: np.ndarray  # bool: ARCore was tracking ("fused"), else pure PDR
+
+
+@dataclass
+class ReplayChunk:
+    batch: SensorBatch
+    device: DeviceTrack
+
+
+@dataclass
+class ChunkDiff:
+    """Engine vs device at the last row of a chunk."""
+    timestamp: int
+    rows: int
+    pos_error: float
+    heading_error: float
+    step_diff: int
+    fused: bool
+
+
+@dataclass
+class ReplayResult:
+    path: str
+    rows: int
+    elapsed_s: float
+    step_count_engine: int
+    step_count_device: int
+    final_pos_error: float
+    chunks: List[ChunkDiff] = field(default_factory=list)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed_s if self.elapsed_s > 0 else float("inf")
+
+    def report(self) -> str:
+        pdr = [c for c in self.chunks if not c.fused]
+        lines = [
+            f"=== Replay {os.path.basename(self.path)} ===",
+            f"  Rows           : {self.rows}",
+            f"  Throughput     : {self.rows_per_sec:,.0f} rows/s ({self.elapsed_s:.2f} s)",
+            f"  Steps (engine) : {self.step_count_engine}",
+            f"  Steps (device) : {self.step_count_device}",
+            f"  Final pos diff : {self.final_pos_error:.2f} m",
+        ]
+        if pdr:
+            lines.append(f"  Max pos diff   : {max(c.pos_error for c in pdr):.2f} m "
+                         f"over {len(pdr)} PDR-only chunk boundaries")
+            lines.append(f"  Max hdg diff   : {math.degrees(max(c.heading_error for c in pdr)):.1f}°")
+        return "\n".join(lines)
+
+
+def _wrap_angle(a: float) -> float:
+    return abs((a + math.pi) % (2 * math.pi) - math.pi)
+
+
+def _detect_unit(ts: np.ndarray) -> str:
+    if len(ts) < 2:
+        return "ns"
+    return "ms" if np.median(np.diff(ts)) < _MS_SPACING_LIMIT else "ns"
+
+
+def _parse_rows(lines: List[str], unit: str) -> ReplayChunk:
+    rows = np.loadtxt(lines, delimiter=",", dtype=ROW_DTYPE, ndmin=1)
+    ts = rows["timestamp"]
+    if unit != "ns":
+        ts = ts * _UNIT_SCALE[unit]
+    imu = rows["imu"]
+    batch = SensorBatch(ts, imu[:, 0:3], imu[:, 3:6], imu[:, 6:9])
+    pos = rows["pos"]
+    device = DeviceTrack(ts, pos[:, 0].copy(), pos[:, 1].copy(), pos[:, 2].copy(),
+                         rows["heading"].copy(), rows["step_count"].copy(),
+                         rows["source"] == "fused")
+    return ReplayChunk(batch, device)
+
+
+def iter_sensor_csv(f: TextIO, chunk_rows: int = 65536,
+                    timestamp_unit: str = "auto") -> Iterator[ReplayChunk]:
+    """Yield columnar chunks of at most *chunk_rows* rows from an open CSV.
+
+    Timestamps are converted to ns; *timestamp_unit* is "ns", "ms" or
+    "auto" (decided once, from the first chunk).
+    """
+    first = f.readline()
+    if first and not first.startswith("timestamp"):
+        f = itertools.chain([first], f)
+    unit = timestamp_unit
+    while True:
+        lines = list(itertools.islice(f, chunk_rows))
+        if not lines:
+            return
+        if unit == "auto":
+            unit = _detect_unit(np.loadtxt(lines[:64], delimiter=",", usecols=0,
+                                           dtype=np.int64, ndmin=1))
+        yield _parse_rows(lines, unit)
+
+
+def read_sensor_csv(path: str, chunk_rows: int = 65536,
+                    timestamp_unit: str = "auto") -> Iterator[ReplayChunk]:
+    with open(path) as f:
+        yield from iter_sensor_csv(f, chunk_rows, timestamp_unit)
+
+
+def replay(path: str, engine: Optional[PDREngine] = None, chunk_rows: int = 65536,
+           anchor: bool = True, timestamp_unit: str = "auto") -> ReplayResult:
+    """Feed a sensor CSV through *engine* chunk by chunk and diff it against the device.
+
+    With *anchor*, the engine starts at the device's first logged position
+    and step counts are compared from the first row onward.
+    """
+    engine = engine or PDREngine()
+    diffs: List[ChunkDiff] = []
+    rows = 0
+    step0 = None
+    device_steps = 0
+    final_err = 0.0
+    t_start = time.perf_counter()
+    for chunk in read_sensor_csv(path, chunk_rows, timestamp_unit):
+        d = chunk.device
+        if step0 is None:
+            step0 = int(d.step_count[0])
+            if anchor:
+                engine.pos_x, engine.pos_z = float(d.pos_x[0]), float(d.pos_z[0])
+                engine.track.reset(engine.position)
+        engine.process_batch(chunk.batch)
+        n = len(d.timestamp)
+        rows += n
+        device_steps = int(d.step_count[-1]) - step0
+        final_err = math.hypot(engine.pos_x - d.pos_x[-1], engine.pos_z - d.pos_z[-1])
+        diffs.append(ChunkDiff(
+            timestamp=int(d.timestamp[-1]), rows=n, pos_error=final_err,
+            heading_error=_wrap_angle(engine.orientation_estimator.heading - d.heading[-1]),
+            step_diff=engine.step_detector.step_count - device_steps,
+            fused=bool(d.fused[-1]),
+        ))
+    elapsed = time.perf_counter() - t_start
+    return ReplayResult(path, rows, elapsed, engine.step_detector.step_count,
+                        device_steps, final_err, diffs)
+
+
+def write_sensor_csv(path: str, batch: SensorBatch, device: Optional[DeviceTrack] = None,
+                     chunk_rows: int = 65536):
+    """Write *batch* in DataExporter's sensor format (device columns zero if absent)."""
+    with open(path, "w") as f:
+        f.write(HEADER + "\n")
+        for lo in range(0, len(batch), chunk_rows):
+            hi = min(lo + chunk_rows, len(batch))
+            n = hi - lo
+            rows = np.zeros(n, dtype=ROW_DTYPE)
+            rows["timestamp"] = batch.timestamp[lo:hi]
+            rows["imu"] = np.hstack((batch.acc[lo:hi], batch.gyro[lo:hi], batch.mag[lo:hi]))
+            rows["source"] = "pdr"
+            if device is not None:
+                rows["pos"] = np.column_stack((device.pos_x[lo:hi], device.pos_y[lo:hi],
+                                               device.pos_z[lo:hi]))
+                rows["heading"] = device.heading[lo:hi]
+                rows["step_count"] = device.step_count[lo:hi]
+                rows["source"] = np.where(device.fused[lo:hi], "fused", "pdr")
+            imu, pos = rows["imu"], rows["pos"]
+            table = np.column_stack((imu, pos, rows["heading"]))
+            for t, vals, steps, src in zip(rows["timestamp"].tolist(), table.tolist(),
+                                           rows["step_count"].tolist(), rows["source"].tolist()):
+                f.write(f"{t},{','.join(map(repr, vals))},{steps},{src}\n")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay a DataExporter sensor CSV")
+    ap.add_argument("csv", help="sensors_*.csv exported from the app")
+    ap.add_argument("--chunk-rows", type=int, default=65536)
+    ap.add_argument("--config", help="PDRConfig JSON (e.g. from calibration.py)")
+    ap.add_argument("--timestamp-unit", choices=("auto", "ns", "ms"), default="auto")
+    args = ap.parse_args(argv)
+
+    config = PDRConfig.load(args.config) if args.config else None
+    result = replay(args.csv, PDREngine(config), args.chunk_rows,
+                    timestamp_unit=args.timestamp_unit)
+    print(result.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Result cache — skip scenarios whose inputs have not changed since the last run.
+
+An entry is keyed on a fingerprint of everything that determines the
+outcome: the scenario definition (generator, its source, arguments, pass
+criteria), the seed, the engine parameters, and the sources of the modules
+that produce and score the trajectory.  It holds the ValidationResult as
+JSON and a copy of the plot, so a hit restores both without generating,
+running or drawing anything.
+
+    cache = ResultCache()
+    key = cache.key(scenario, seed, config)
+    result = cache.load(key)            # None on a miss
+    ...
+    cache.store(key, result, plot_path)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import asdict
+from typing import Dict, Iterable, Optional
+
+from pdr_engine import PDRConfig
+from scenarios import Scenario
+from stream_cache import source_digest, seed_key
+from validator import ValidationResult
+
+DEFAULT_RESULT_DIR = os.path.join(os.path.dirname(__file__), "results", ".result_cache")
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# Modules whose code decides a scenario's result and plot: the stream
+# (scenario, its generator and noise), the run (run_all.run_scenario), the
+# engine, the validation and the plot.
+SOURCES = ("scenarios.py", "path_simulator.py", "scenario_dsl.py", "noise_model.py",
+           "run_all.py", "pdr_engine.py", "validator.py", "spatial_index.py", "visualizer.py")
+
+
+def files_digest(names: Iterable[str] = SOURCES) -> str:
+    h = hashlib.sha256()
+    for name in names:
+        with open(os.path.join(_HERE, name), "rb") as f:
+            h.update(name.encode() + b"\0" + f.read())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """ValidationResults (+ plots) on disk, keyed by input fingerprint."""
+
+    def __init__(self, root: str = DEFAULT_RESULT_DIR):
+        self.root = root
+        self._sources = files_digest()
+
+    def key(self, scenario: Scenario, seed=None, config: Optional[PDRConfig] = None) -> str:
+        spec = {
+            "scenario": {
+                "name": scenario.name,
+                "generator": f"{scenario.generator.__module__}.{scenario.generator.__qualname__}",
+                "generator_sha256": source_digest(scenario.generator),
+                "args": list(scenario.args),
+                "kwargs": dict(scenario.kwargs),
+                "noise": scenario.noise.to_spec(),
+                "sample_rate": scenario.sample_rate,
+                "total_distance": scenario.total_distance,
+                "threshold": scenario.threshold,
+                "metric": scenario.metric,
+            },
+            "seed": seed_key(seed),
+            "config": asdict(config or PDRConfig()),
+            "sources_sha256": self._sources,
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, key + suffix)
+
+    def load(self, key: str, plot_path: Optional[str] = None) -> Optional[ValidationResult]:
+        """The cached result, or None; with *plot_path*, also restore the plot
+        there (a missing cached plot counts as a miss)."""
+        try:
+            with open(self._path(key, ".json")) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if plot_path is not None:
+            cached_plot = self._path(key, ".png")
+            if not os.path.exists(cached_plot):
+                return None
+            os.makedirs(os.path.dirname(plot_path), exist_ok=True)
+            shutil.copyfile(cached_plot, plot_path)
+        return ValidationResult(**entry["result"])
+
+    def store(self, key: str, result: ValidationResult, plot_path: Optional[str] = None):
+        os.makedirs(self.root, exist_ok=True)
+        if plot_path is not None:
+            shutil.copyfile(plot_path, self._path(key, ".png"))
+        tmp = self._path(key, ".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"scenario": result.scenario, "result": asdict(result)}, f)
+        os.replace(tmp, self._path(key, ".json"))
+
+    def entries(self) -> Dict[str, str]:
+        """key → scenario name of every stored entry."""
+        out = {}
+        if not os.path.isdir(self.root):
+            return out
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.root, name)) as f:
+                        out[name[:-5]] = json.load(f)["scenario"]
+                except (OSError, ValueError, KeyError):
+                    continue
+        return out
+
+    def invalidate(self, scenario: Optional[str] = None) -> int:
+        """Drop the entries of *scenario* (all entries with None); returns how many."""
+        dropped = 0
+        for key, name in self.entries().items():
+            if scenario is None or name == scenario:
+                for suffix in (".json", ".png"):
+                    try:
+                        os.remove(self._path(key, suffix))
+                    except FileNotFoundError:
+                        pass
+                dropped += 1
+        return dropped
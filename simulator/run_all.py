@@ -1,63 +1,91 @@
 #!/usr/bin/env python3
 """
-Run all PDR simulation scenarios and produce reports + plots.
-Usage:  python run_all.py
+Run the PDR simulation scenarios and produce reports + plots.
+Usage:  python run_all.py [--scenario NAME ...] [--jobs N] [--seed N] [--no-plot]
+                          [--format text|json|csv] [--force] [--no-cache] [--clear-cache]
+                          [--invalidate SCENARIO] [--profile] [--trace DIR] [--memory]
+
+Results and plots are cached (results/.result_cache) by a fingerprint of the
+scenario, seed, engine parameters and engine/validator sources, so only
+scenarios whose inputs changed are recomputed.  Exits with 1 when a selected
+scenario fails and 2 when a --scenario filter matches nothing.
+
+--memory records peak RSS, the tracemalloc peak and the top allocation sites
+of each scenario's generation, engine, validation and plotting phases (see
+memory_profile.py for the same breakdown at 10k-1M samples).
 """
 
-import sys, os, math
+import sys, os, argparse, csv, fnmatch, json
+from contextlib import nullcontext
 sys.path.insert(0, os.path.dirname(__file__))
 
-from pdr_engine import PDREngine, SensorData
-from path_simulator import (
-    simulate_straight, simulate_l_shape, simulate_rectangle,
-    simulate_stationary, simulate_parking_scenario,
-)
-from validator import validate, ValidationResult
-from visualizer import plot_trajectory
-
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields
+from typing import List, Optional, Sequence
 
-def run_scenario(name, samples, gt, total_dist, threshold, metric="endpoint_error"):
-    engine = PDREngine()
-    for s in samples:
-        engine.on_sensor_update(s)
-    result = validate(name, engine.trajectory, gt, engine.step_detector.step_count,
-                      total_dist, threshold, metric)
-    plot_trajectory(name, engine.trajectory, gt, result.endpoint_error)
+from instrumentation import Instrumentation, JsonlTrace
+from memory_profile import MemoryProfiler
+from pdr_engine import PDRConfig, PDREngine, SensorBatch
+from result_cache import ResultCache
+from scenarios import SCENARIOS, run_seed
+from validator import validate, ValidationResult
+from visualizer import RESULTS_DIR, plot_path, plot_trajectory
+
+FORMATS = ("text", "json", "csv")
+
+
+def _unprofiled(name: str, samples: int = 0):
+    return nullcontext()
+
+
+def run_scenario(name, samples, gt, total_dist, threshold, metric="endpoint_error",
+                 instrumentation=None, config=None, plot=True, memory=None):
+    phase = memory.phase if memory is not None else _unprofiled
+    n = len(samples)
+    with phase("engine", n):
+        engine = PDREngine(config)
+        engine.instrument(instrumentation)
+        if not isinstance(samples, SensorBatch):
+            samples = SensorBatch.from_samples(samples)
+        engine.process_batch(samples)
+    with phase("validation", n):
+        result = validate(name, engine.trajectory_array, gt, engine.step_detector.step_count,
+                          total_dist, threshold, metric)
+    if plot:
+        with phase("plotting", n):
+            plot_trajectory(name, engine.trajectory_array, gt, result.endpoint_error)
+    engine.instrument(None)
     return result
 
 
-def main():
-    results = []
-
-    # 1. Straight 50m north
-    s, gt = simulate_straight(50, 0.0)
-    results.append(run_scenario("Straight 50m North", s, gt, 50, 5.0))
-
-    # 2. Straight 30m east
-    s, gt = simulate_straight(30, math.pi / 2)
-    results.append(run_scenario("Straight 30m East", s, gt, 30, 3.0))
+def _run_indexed(idx: int, master_seed: int, config: PDRConfig, plot: bool,
+                 instrumentation=None, memory=None) -> ValidationResult:
+    """Generate and run SCENARIOS[idx] (also the process-pool entry point)."""
+    sc = SCENARIOS[idx]
+    phase = memory.phase if memory is not None else _unprofiled
+    with phase("generation"):
+        s, gt = sc.generate(run_seed(master_seed, idx, 0))
+    if memory is not None:
+        memory.set_samples(len(s))
+    return run_scenario(sc.name, s, gt, sc.total_distance, sc.threshold, sc.metric,
+                        instrumentation, sc.engine_config(config), plot, memory)
 
-    # 3. L-shape 30+20
-    s, gt = simulate_l_shape(30, 20)
-    results.append(run_scenario("L-shape 30+20", s, gt, 50, 5.0))
 
-    # 4. Rectangle 20x10
-    s, gt = simulate_rectangle(20, 10)
-    results.append(run_scenario("Rectangle 20x10", s, gt, 60, 6.0, "closure_error"))
+def select_scenarios(patterns: Optional[Sequence[str]]) -> List[int]:
+    """Indices of the scenarios matching any of *patterns* (exact name or
+    case-insensitive glob); all scenarios with no patterns."""
+    if not patterns:
+        return list(range(len(SCENARIOS)))
+    return [i for i, sc in enumerate(SCENARIOS)
+            if any(p == sc.name or fnmatch.fnmatch(sc.name.lower(), p.lower()) for p in patterns)]
 
-    # 5. Stationary 60s
-    s, gt = simulate_stationary(60)
-    results.append(run_scenario("Stationary 60s", s, gt, 0, 0.5, "drift"))
 
-    # 6. Parking scenario
-    s, gt = simulate_parking_scenario()
-    results.append(run_scenario("Parking Scenario", s, gt, 55, 5.5))
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
 
-    # 7. High noise rectangle
-    s, gt = simulate_rectangle(20, 10, noise_scale=2.0)
-    results.append(run_scenario("Rectangle High Noise", s, gt, 60, 9.0, "closure_error"))
-
-    # Print reports
+def print_text(results: Sequence[ValidationResult], profiles, trace_dir: Optional[str],
+               plotted: bool, memories=()):
     print("\n" + "=" * 60)
     print("PDR SIMULATOR — RESULTS SUMMARY")
     print("=" * 60)
@@ -77,8 +105,146 @@ def main():
     else:
         print("\n🎉 All scenarios passed!")
 
-    print(f"\nPlots saved to: {os.path.join(os.path.dirname(__file__), 'results')}/")
+    if profiles:
+        print("\n" + "=" * 60)
+        print("ENGINE PROFILE")
+        print("=" * 60)
+        for name, instr in profiles:
+            print()
+            print(instr.report(name))
+    if memories:
+        print("\n" + "=" * 60)
+        print("MEMORY PROFILE")
+        print("=" * 60)
+        for name, memory in memories:
+            print()
+            print(memory.report(name))
+    if trace_dir:
+        print(f"\nTraces saved to: {trace_dir}/")
+    if plotted:
+        print(f"\nPlots saved to: {RESULTS_DIR}/")
+
+
+def print_json(results: Sequence[ValidationResult], profiles, seed: int, memories=()):
+    doc = {
+        "seed": seed,
+        "passed": sum(r.passed for r in results),
+        "total": len(results),
+        "results": [dict(asdict(r), metric_value=r.metric_value()) for r in results],
+    }
+    if profiles:
+        doc["profiles"] = {name: instr.to_dict() for name, instr in profiles}
+    if memories:
+        doc["memory"] = {name: memory.to_dict() for name, memory in memories}
+    json.dump(doc, sys.stdout, indent=2)
+    print()
+
+
+def print_csv(results: Sequence[ValidationResult]):
+    names = [f.name for f in fields(ValidationResult)]
+    w = csv.writer(sys.stdout)
+    w.writerow(names + ["metric_value"])
+    for r in results:
+        w.writerow([getattr(r, n) for n in names] + [r.metric_value()])
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Run the PDR simulation scenarios")
+    ap.add_argument("--scenario", action="append", metavar="NAME",
+                    help="only run scenarios matching NAME (exact or glob, repeatable)")
+    ap.add_argument("--jobs", type=int, default=1, help="worker processes (default 1)")
+    ap.add_argument("--seed", type=int, default=0, help="master seed (per-scenario seeds via run_seed)")
+    ap.add_argument("--no-plot", action="store_true", help="skip plotting (matplotlib is never imported)")
+    ap.add_argument("--format", choices=FORMATS, default="text", help="report format on stdout")
+    ap.add_argument("--force", action="store_true", help="recompute every scenario and refresh the cache")
+    ap.add_argument("--no-cache", action="store_true", help="neither read nor write the result cache")
+    ap.add_argument("--clear-cache", action="store_true", help="drop all cached results first")
+    ap.add_argument("--invalidate", metavar="SCENARIO", action="append", default=[],
+                    help="drop the cached results of one scenario first (repeatable)")
+    ap.add_argument("--profile", action="store_true", help="per-scenario engine profiles (runs serially)")
+    ap.add_argument("--trace", metavar="DIR", help="write a JSONL event trace per scenario (runs serially)")
+    ap.add_argument("--memory", action="store_true",
+                    help="per-phase memory and allocation profile per scenario (runs serially)")
+    args = ap.parse_args(argv)
+
+    text = args.format == "text"
+    log = sys.stdout if text else sys.stderr
+    indices = select_scenarios(args.scenario)
+    if not indices:
+        print(f"No scenario matches {args.scenario}; known: {[sc.name for sc in SCENARIOS]}",
+              file=sys.stderr)
+        return 2
+
+    config = PDRConfig()
+    plot = not args.no_plot
+    cache = None if args.no_cache else ResultCache()
+    if args.clear_cache:
+        print(f"Cleared {ResultCache().invalidate()} cached result(s)", file=log)
+    for name in args.invalidate:
+        print(f"Cleared {ResultCache().invalidate(name)} cached result(s) of {name!r}", file=log)
+    # Profiles, traces and memory profiles come from running the engine, so
+    # those runs bypass the cache.
+    instrumented = args.profile or args.trace or args.memory
+
+    results = {}
+    keys = {}
+    for i in indices:
+        if cache is None or instrumented:
+            continue
+        sc = SCENARIOS[i]
+        keys[i] = cache.key(sc, run_seed(args.seed, i, 0), sc.engine_config(config))
+        if not args.force:
+            cached = cache.load(keys[i], plot_path(sc.name) if plot else None)
+            if cached is not None:
+                results[i] = cached
+    hits = len(results)
+    todo = [i for i in indices if i not in results]
+
+    profiles = []
+    memories = []
+    if instrumented:
+        for i in todo:
+            name = SCENARIOS[i].name
+            instr = memory = None
+            if args.profile or args.trace:
+                trace = None
+                if args.trace:
+                    os.makedirs(args.trace, exist_ok=True)
+                    trace = JsonlTrace(os.path.join(args.trace, name.replace(" ", "_") + ".jsonl"))
+                instr = Instrumentation(trace)
+                profiles.append((name, instr))
+            if args.memory:
+                memory = MemoryProfiler()
+                memories.append((name, memory))
+            results[i] = _run_indexed(i, args.seed, config, plot, instr, memory)
+    elif args.jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = {i: pool.submit(_run_indexed, i, args.seed, config, plot) for i in todo}
+            for i, f in futures.items():
+                results[i] = f.result()
+    else:
+        for i in todo:
+            results[i] = _run_indexed(i, args.seed, config, plot)
+
+    if cache is not None and not instrumented:
+        for i in todo:
+            cache.store(keys[i], results[i], plot_path(SCENARIOS[i].name) if plot else None)
+
+    ordered = [results[i] for i in indices]
+    if text:
+        print_text(ordered, profiles if args.profile else [], args.trace, plot, memories)
+    elif args.format == "json":
+        print_json(ordered, profiles if args.profile else [], args.seed, memories)
+    else:
+        print_csv(ordered)
+    if cache is not None and not instrumented:
+        print(f"\nResult cache: {hits} reused, {len(todo)} computed", file=log)
+    return 0 if all(r.passed for r in ordered) else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Scenario DSL — routes described in JSON/YAML, compiled to the vectorized generators.
+Usage:  python scenario_dsl.py run layouts/ [--seed 0] [--cache]
+        python scenario_dsl.py show layouts/parking.json
+
+    {
+      "name": "Parking Scenario",
+      "threshold": 5.5,                    # pass threshold (m), default 5.0
+      "metric": "endpoint_error",          # or closure_error / drift
+      "noise_scale": 1.0,
+      "turn_duration": 1.5,                # s, for turns inserted between walks
+      "sample_rate": 50,                   # Hz of the generated stream, default 50
+      "start": {"x": 0, "z": 0, "heading": 0},
+      "segments": [
+        {"walk": {"heading": 0, "distance": 30}},
+        {"walk": {"heading": 270, "distance": 15, "step_length": 0.6, "pace": 1.8}},
+        {"turn": {"to": 180, "duration": 2.0}},
+        {"stand": {"duration": 5, "noise_scale": 0.5}},
+        {"walk": {"distance": 10}}
+      ],
+      "disturbances": [
+        {"center": [-15, 30], "radius": 3, "strength": 15, "direction": 90}
+      ],
+      "noise": {"gyro_bias": {"walk": 2e-4}, "dropout": {"rate": 0.01}}
+    }
+
+Headings and directions are degrees clockwise from north.  A walk without
+"heading" keeps the current one; a walk whose heading differs from the
+current one is preceded by a turn of *turn_duration*.  Turns take the short
+way round.  "pace" is steps per second (default 2), "step_length" in metres
+(default 0.7) also sets the gait amplitude so PDR estimates that length
+(below ~0.63 m the gait peak stays under the default 1.2 m/s² detector
+threshold and steps go undetected, as on a real shuffling walker).
+Any segment may override "noise_scale".  A disturbance adds a constant
+field of *strength* µT pointing *direction* to the magnetometer while the
+walker's true position is within *radius* of *center*.  "noise" is a
+noise_model.NoiseModel spec (gyro bias, magnetic field, dropouts, jitter)
+applied on top of the generators' white noise, segment by segment.
+
+Ground truth (one vertex per walk end) and the total distance follow from
+the segments.  Compiled scenarios are cached in memory by the SHA-256 of
+the canonical spec; with --cache, generated streams are also stored in the
+content-addressed stream cache.
+"""
+
+import sys, os, argparse, hashlib, json, math
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import yaml
+except ImportError:  # YAML specs are optional
+    yaml = None
+
+from pdr_engine import PDRConfig, PDREngine, SensorBatch
+from noise_model import NoiseModel
+from path_simulator import (
+    CHUNK_SAMPLES, SAMPLE_RATE, WALK_FREQ, StreamChunk, _pieces, _rechunk,
+    _rng, _stationary_piece, _turn_batch, _walk_piece, _snap, dt_ns, walk_amplitude,
+)
+from scenarios import Scenario, run_seed
+from validator import validate
+
+SPEC_SUFFIXES = (".json", ".yaml", ".yml")
+_SEGMENT_FIELDS = {
+    "walk": {"heading", "distance", "step_length", "pace", "noise_scale"},
+    "turn": {"to", "by", "duration", "noise_scale"},
+    "stand": {"duration", "noise_scale"},
+}
+_DISTURBANCE_FIELDS = {"center", "radius", "strength", "direction"}
+
+
+# ---------------------------------------------------------------------------
+# Compiled form
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Segment:
+    kind: str                       # "walk", "turn" or "stand"
+    n: int                          # samples
+    heading_from: float             # rad
+    heading_to: float
+    start: Tuple[float, float]      # true position (x, z)
+    end: Tuple[float, float]
+    noise_scale: float
+    duration: float = 0.0           # s (turns)
+    amp: float = 0.0                # walk gait amplitude / frequency
+    freq: float = WALK_FREQ
+
+
+@dataclass(frozen=True)
+class Disturbance:
+    center: Tuple[float, float]
+    radius: float
+    field: Tuple[float, float]      # (x, y) µT added to the magnetometer
+
+
+@dataclass(frozen=True)
+class CompiledScenario:
+    name: str
+    digest: str
+    segments: Tuple[Segment, ...]
+    disturbances: Tuple[Disturbance, ...]
+    ground_truth: Tuple[Tuple[float, float], ...]
+    total_distance: float
+    threshold: float
+    metric: str
+    spec_json: str                  # canonical spec, the content the digest is taken of
+    noise: NoiseModel = NoiseModel()
+    sample_rate: float = SAMPLE_RATE  # Hz
+
+    @property
+    def n_samples(self) -> int:
+        return sum(s.n for s in self.segments)
+
+    def generate(self, rng=None) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+        """Whole stream; same RNG draws as the hand-written *_batch generators.
+        *rng* is a np.random.Generator, or None for a fresh unseeded one."""
+        pieces = [b for b, _ in self._pieces(None, rng)]
+        return SensorBatch.concatenate(pieces), list(self.ground_truth)
+
+    def stream(self, chunk_size: int = CHUNK_SAMPLES, rng=None) -> Iterator[StreamChunk]:
+        """Lazy (chunk, new ground-truth vertices), as path_simulator's *_stream."""
+        return _rechunk(self._pieces(chunk_size, rng), chunk_size)
+
+    def _pieces(self, piece_size: Optional[int], rng=None) -> Iterator[StreamChunk]:
+        rng = _rng(rng)
+        yield SensorBatch.empty(), [self.ground_truth[0]]
+        noise = self.noise.session(rng) if self.noise.components else None
+        rate, dt = self.sample_rate, dt_ns(self.sample_rate)
+        t0 = 0
+        for seg in self.segments:
+            vertices = [seg.end] if seg.kind == "walk" else []
+            if seg.kind == "turn":
+                parts = [(0, _turn_batch(seg.heading_from, seg.heading_to, seg.duration,
+                                         t0, seg.noise_scale, rng, rate))]
+            else:
+                parts = ((first, self._piece(seg, first, k, t0 + first * dt, rng, rate))
+                         for first, k in _pieces(seg.n, piece_size or max(seg.n, 1)))
+            for first, batch in parts:
+                if self.disturbances:
+                    self._disturb(seg, first, batch)
+                if noise is not None:
+                    positions = np.column_stack(self._positions(seg, first, len(batch))) \
+                        if self.noise.needs_positions else None
+                    batch, _ = noise.apply(batch, positions)
+                yield batch, vertices
+                vertices = []
+            t0 += seg.n * dt
+
+    @staticmethod
+    def _piece(seg: Segment, first: int, n: int, t0_ns: int, rng=None,
+               rate: float = SAMPLE_RATE) -> SensorBatch:
+        if seg.kind == "walk":
+            return _walk_piece(first, n, seg.heading_to, t0_ns, seg.noise_scale, seg.amp, seg.freq,
+                               rng, rate)
+        return _stationary_piece(n, t0_ns, seg.noise_scale, seg.heading_to, rng, rate)
+
+    @staticmethod
+    def _positions(seg: Segment, first: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """True (x, z) at samples first .. first + n - 1 of *seg* (linear along walks)."""
+        frac = (first + np.arange(n)) / max(seg.n, 1)
+        return (seg.start[0] + frac * (seg.end[0] - seg.start[0]),
+                seg.start[1] + frac * (seg.end[1] - seg.start[1]))
+
+    def true_positions(self) -> np.ndarray:
+        """(n_samples, 2) true (x, z) at every sample of generate()'s stream
+        (before any noise-model dropouts)."""
+        out = np.empty((self.n_samples, 2))
+        lo = 0
+        for seg in self.segments:
+            out[lo:lo + seg.n, 0], out[lo:lo + seg.n, 1] = self._positions(seg, 0, seg.n)
+            lo += seg.n
+        return out
+
+    def _disturb(self, seg: Segment, first: int, batch: SensorBatch):
+        """Add every disturbance field where the true position lies in its zone."""
+        x, z = self._positions(seg, first, len(batch))
+        for d in self.disturbances:
+            inside = np.hypot(x - d.center[0], z - d.center[1]) <= d.radius
+            batch.mag[inside, 0] += d.field[0]
+            batch.mag[inside, 1] += d.field[1]
+
+    def engine_config(self, base: Optional[PDRConfig] = None) -> PDRConfig:
+        """*base* (default PDRConfig()) at this scenario's sample rate."""
+        return replace(base or PDRConfig(), sample_rate=self.sample_rate)
+
+    def scenario(self) -> Scenario:
+        """A scenarios.Scenario, so the DSL plugs into run_all / Monte Carlo / the stream cache."""
+        return Scenario(self.name, generate_spec, (self.spec_json,),
+                        self.total_distance, self.threshold, self.metric,
+                        sample_rate=self.sample_rate)
+
+
+# ---------------------------------------------------------------------------
+# Compiler
+# ---------------------------------------------------------------------------
+
+_COMPILED: Dict[str, CompiledScenario] = {}
+
+
+def canonical_json(spec: Dict[str, Any]) -> str:
+    return json.dumps(spec, sort_keys=True, separators=(",", ":"))
+
+
+def spec_digest(spec: Dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_json(spec).encode()).hexdigest()
+
+
+def _fields(kind: str, body: Any, allowed: set) -> Dict[str, Any]:
+    if not isinstance(body, dict):
+        raise ValueError(f"{kind}: expected a mapping, got {body!r}")
+    unknown = set(body) - allowed
+    if unknown:
+        raise ValueError(f"{kind}: unknown field(s) {sorted(unknown)}")
+    return body
+
+
+def compile_scenario(spec: Dict[str, Any]) -> CompiledScenario:
+    """Check *spec* and lay out its segments; cached by content hash."""
+    spec_json = canonical_json(spec)
+    digest = hashlib.sha256(spec_json.encode()).hexdigest()
+    cached = _COMPILED.get(digest)
+    if cached is not None:
+        return cached
+
+    noise = float(spec.get("noise_scale", 1.0))
+    turn_dur = float(spec.get("turn_duration", 1.5))
+    rate = float(spec.get("sample_rate", SAMPLE_RATE))
+    if not rate > 0:
+        raise ValueError(f"sample_rate: expected a positive rate in Hz, got {rate!r}")
+    start = spec.get("start", {})
+    x, z = _snap(float(start.get("x", 0.0))), _snap(float(start.get("z", 0.0)))
+    heading = math.radians(start["heading"]) if "heading" in start else None
+    gt = [(x, z)]
+    segments: List[Segment] = []
+    distance = 0.0
+
+    def turn(to: float, duration: float, scale: float):
+        h0 = heading if heading is not None else to
+        segments.append(Segment("turn", int(duration * rate), h0, to, (x, z), (x, z),
+                                scale, duration))
+
+    for i, entry in enumerate(spec.get("segments", [])):
+        if not isinstance(entry, dict) or len(entry) != 1 or next(iter(entry)) not in _SEGMENT_FIELDS:
+            raise ValueError(f"segment {i}: expected one of {sorted(_SEGMENT_FIELDS)}, got {entry!r}")
+        kind, body = next(iter(entry.items()))
+        body = _fields(f"segment {i} ({kind})", body, _SEGMENT_FIELDS[kind])
+        scale = float(body.get("noise_scale", noise))
+        if kind == "walk":
+            if "distance" not in body:
+                raise ValueError(f"segment {i} (walk): missing 'distance'")
+            h = math.radians(body["heading"]) if "heading" in body else (heading or 0.0)
+            if heading is not None and h != heading:
+                turn(h, turn_dur, scale)
+            heading = h
+            dist = float(body["distance"])
+            step_length = float(body.get("step_length", 0.7))
+            pace = float(body.get("pace", WALK_FREQ))
+            n = int(((dist / step_length) / pace) * rate)
+            end = (_snap(x + dist * math.sin(h)), _snap(z + dist * math.cos(h)))
+            segments.append(Segment("walk", n, h, h, (x, z), end, scale,
+                                    amp=walk_amplitude(step_length), freq=pace))
+            x, z = end
+            gt.append(end)
+            distance += dist
+        elif kind == "turn":
+            if ("to" in body) == ("by" in body):
+                raise ValueError(f"segment {i} (turn): give exactly one of 'to' / 'by'")
+            to = math.radians(body["to"]) if "to" in body else \
+                (heading or 0.0) + math.radians(body["by"])
+            turn(to % (2 * math.pi), float(body.get("duration", turn_dur)), scale)
+            heading = to % (2 * math.pi)
+        else:
+            if "duration" not in body:
+                raise ValueError(f"segment {i} (stand): missing 'duration'")
+            h = heading or 0.0
+            segments.append(Segment("stand", int(float(body["duration"]) * rate),
+                                    h, h, (x, z), (x, z), scale))
+
+    disturbances = []
+    for i, body in enumerate(spec.get("disturbances", [])):
+        body = _fields(f"disturbance {i}", body, _DISTURBANCE_FIELDS)
+        if "center" not in body or "radius" not in body:
+            raise ValueError(f"disturbance {i}: needs 'center' and 'radius'")
+        strength = float(body.get("strength", 10.0))
+        direction = math.radians(body.get("direction", 0.0))
+        disturbances.append(Disturbance((float(body["center"][0]), float(body["center"][1])),
+                                        float(body["radius"]),
+                                        (strength * math.sin(direction), strength * math.cos(direction))))
+
+    compiled = CompiledScenario(
+        name=str(spec.get("name", digest[:12])),
+        digest=digest,
+        segments=tuple(segments),
+        disturbances=tuple(disturbances),
+        ground_truth=tuple(gt),
+        total_distance=float(spec.get("total_distance", distance)),
+        threshold=float(spec.get("threshold", 5.0)),
+        metric=str(spec.get("metric", "endpoint_error")),
+        spec_json=spec_json,
+        noise=NoiseModel.from_spec(spec["noise"]) if "noise" in spec else NoiseModel(),
+        sample_rate=rate,
+    )
+    _COMPILED[digest] = compiled
+    return compiled
+
+
+def generate_spec(spec_json: str, rng=None, rate: Optional[float] = None
+                  ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+    """Scenario generator taking the canonical JSON spec (hashable, cache-keyable).
+    The rate is the spec's own; *rate*, if given, must match it."""
+    compiled = compile_scenario(json.loads(spec_json))
+    if rate is not None and rate != compiled.sample_rate:
+        raise ValueError(f"{compiled.name}: spec is sampled at {compiled.sample_rate:g} Hz, "
+                         f"not {rate:g} Hz")
+    return compiled.generate(rng)
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+def load_specs(path: str) -> List[Dict[str, Any]]:
+    """Specs from a JSON/YAML file (one spec, or {"scenarios": [...]}) or a directory of them."""
+    if os.path.isdir(path):
+        specs = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(SPEC_SUFFIXES):
+                specs.extend(load_specs(os.path.join(path, name)))
+        return specs
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError(f"{path}: reading YAML specs needs PyYAML")
+            doc = yaml.safe_load(f)
+        else:
+            doc = json.load(f)
+    specs = doc["scenarios"] if isinstance(doc, dict) and "scenarios" in doc else doc
+    if isinstance(specs, dict):
+        specs = [specs]
+    for spec in specs:
+        spec.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return specs
+
+
+def load_scenarios(*paths: str) -> List[CompiledScenario]:
+    return [compile_scenario(spec) for path in paths for spec in load_specs(path)]
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compile and run DSL scenarios")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run", help="run scenarios through PDREngine and validate")
+    p.add_argument("paths", nargs="+", help="spec files or directories")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--cache", action="store_true", help="use the on-disk stream cache")
+    p = sub.add_parser("show", help="print the compiled segments")
+    p.add_argument("paths", nargs="+")
+    args = ap.parse_args(argv)
+
+    compiled = load_scenarios(*args.paths)
+    if args.cmd == "show":
+        for c in compiled:
+            print(f"=== {c.name} [{c.digest[:12]}] — {c.n_samples} samples at "
+                  f"{c.sample_rate:g} Hz, {c.total_distance:.1f} m ===")
+            for s in c.segments:
+                print(f"  {s.kind:<5} {s.n:>7} samples  heading {math.degrees(s.heading_to):6.1f}°  "
+                      f"→ ({s.end[0]:.2f}, {s.end[1]:.2f})")
+            for d in c.disturbances:
+                print(f"  disturbance at {d.center} r={d.radius} field=({d.field[0]:.1f}, {d.field[1]:.1f}) µT")
+            for name, params in c.noise.to_spec().items():
+                print(f"  noise {name}: " + ", ".join(f"{k}={v:g}" for k, v in params.items()))
+        return 0
+
+    cache = None
+    if args.cache:
+        from stream_cache import StreamCache
+        cache = StreamCache()
+    passed = 0
+    for i, c in enumerate(compiled):
+        sc = c.scenario()
+        batch, gt = sc.generate(run_seed(args.seed, i, 0), cache)
+        engine = PDREngine(sc.engine_config())
+        engine.process_batch(batch)
+        r = validate(sc.name, engine.trajectory_array, gt, engine.step_detector.step_count,
+                     sc.total_distance, sc.threshold, sc.metric)
+        passed += r.passed
+        print(r.report())
+    print(f"\nTOTAL: {passed}/{len(compiled)} scenarios passed")
+    return 0 if passed == len(compiled) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
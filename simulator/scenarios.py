@@ -0,0 +1,72 @@
+"""
+Scenario catalogue — the standard simulation routes and their pass criteria.
+"""
+
+import math
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from noise_model import NoiseModel
+from pdr_engine import PDRConfig, SensorBatch
+from path_simulator import (
+    SAMPLE_RATE, simulate_straight_batch, simulate_l_shape_batch, simulate_rectangle_batch,
+    simulate_stationary_batch, simulate_parking_scenario_batch,
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    generator: Callable[..., Tuple[SensorBatch, List[Tuple[float, float]]]]
+    args: tuple
+    total_distance: float
+    threshold: float
+    metric: str = "endpoint_error"
+    kwargs: Dict[str, float] = field(default_factory=dict)
+    noise: NoiseModel = NoiseModel()    # layered on by the generator's *noise* argument
+    sample_rate: float = SAMPLE_RATE    # Hz, the generator's *rate*
+
+    def generate(self, seed: Optional[np.random.SeedSequence] = None, cache=None
+                 ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+        """Build the sensor stream, drawing from np.random.default_rng(*seed*);
+        without a seed the draws are unseeded.
+
+        With a stream_cache.StreamCache and a seed, the stream is generated
+        once and memory-mapped from disk on later calls.
+        """
+        kwargs = dict(self.kwargs, rate=self.sample_rate)
+        if self.noise.components:
+            kwargs["noise"] = self.noise
+        if cache is not None and seed is not None:
+            return cache.get_or_generate(self.generator, self.args, kwargs, seed)
+        return self.generator(*self.args, rng=np.random.default_rng(seed), **kwargs)
+
+    def engine_config(self, base: Optional[PDRConfig] = None) -> PDRConfig:
+        """*base* (default PDRConfig()) at the sample rate of this scenario's stream."""
+        return replace(base or PDRConfig(), sample_rate=self.sample_rate)
+
+
+def run_seed(master_seed: int, scenario_idx: int, run: int) -> np.random.SeedSequence:
+    """Independent seed for one run of one scenario, stable for a given master seed."""
+    return np.random.SeedSequence(master_seed, spawn_key=(scenario_idx, run))
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("Straight 50m North", simulate_straight_batch, (50, 0.0), 50, 5.0),
+    Scenario("Straight 30m East", simulate_straight_batch, (30, math.pi / 2), 30, 3.0),
+    Scenario("L-shape 30+20", simulate_l_shape_batch, (30, 20), 50, 5.0),
+    Scenario("Rectangle 20x10", simulate_rectangle_batch, (20, 10), 60, 6.0, "closure_error"),
+    Scenario("Stationary 60s", simulate_stationary_batch, (60,), 0, 0.5, "drift"),
+    Scenario("Parking Scenario", simulate_parking_scenario_batch, (), 55, 5.5),
+    Scenario("Rectangle High Noise", simulate_rectangle_batch, (20, 10), 60, 9.0, "closure_error",
+             {"noise_scale": 2.0}),
+]
+
+
+def get_scenario(name: str) -> Scenario:
+    for sc in SCENARIOS:
+        if sc.name == name:
+            return sc
+    raise KeyError(f"Unknown scenario: {name!r}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Soak test — hours of looped walking streamed through PDREngine in flat memory.
+Usage:  python soak.py [--hours 8] [--chunk 65536] [--noise 1.0] [--seed 0]
+"""
+
+import sys, os, argparse, resource, time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from pdr_engine import PDREngine
+from path_simulator import CHUNK_SAMPLES, simulate_soak_stream
+from scenarios import run_seed
+from validator import StreamingValidator, ValidationResult
+
+
+def run_soak(hours: float, chunk_size: int = CHUNK_SAMPLES, noise_scale: float = 1.0,
+             threshold: float = 10.0, rng=None) -> ValidationResult:
+    """Walk the default loop for *hours*; trajectory points are handed to the
+    validator chunk by chunk and dropped from the engine.  *rng* is the
+    np.random.Generator of the sensor noise."""
+    engine = PDREngine()
+    validator = StreamingValidator(f"Soak {hours:g} h", threshold, "closure_error")
+    for batch, gt in simulate_soak_stream(hours * 3600, noise_scale=noise_scale,
+                                          chunk_size=chunk_size, rng=rng):
+        validator.add_ground_truth(gt)
+        engine.process_batch(batch)
+        validator.add_trajectory(engine.trajectory_array)
+        engine.track.reset(None)
+    return validator.result(engine.step_detector.step_count)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Long-duration PDR soak test")
+    ap.add_argument("--hours", type=float, default=8.0)
+    ap.add_argument("--chunk", type=int, default=CHUNK_SAMPLES, help="samples per chunk")
+    ap.add_argument("--noise", type=float, default=1.0, help="noise scale")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(run_seed(args.seed, 0, 0))
+    t0 = time.perf_counter()
+    result = run_soak(args.hours, args.chunk, args.noise, rng=rng)
+    elapsed = time.perf_counter() - t0
+    print(result.report())
+    print(f"  Wall time      : {elapsed:.1f} s")
+    print(f"  Peak RSS       : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    return 0 if result.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Spatial index — vectorized point-to-segment distance, a packed
+(Hilbert R-tree) segment index for nearest-segment queries and a uniform
+grid over segments for batched crossing tests.
+"""
+
+import numpy as np
+from typing import Tuple
+
+# Below this many segments a chunked brute-force scan beats building a tree.
+INDEX_MIN_SEGMENTS = 64
+_BRUTE_FORCE_BLOCK = 1 << 20  # points × segments evaluated per block
+
+
+def as_xy(points) -> np.ndarray:
+    """(n, 2) float64 array from a list of (x, y) tuples or an array."""
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def polyline_segments(vertices) -> Tuple[np.ndarray, np.ndarray]:
+    """(starts, ends) of consecutive segments; a single vertex is one zero-length segment."""
+    v = as_xy(vertices)
+    if len(v) == 1:
+        return v, v
+    return v[:-1], v[1:]
+
+
+def _segment_distance(px, py, ax, ay, bx, by) -> Tuple[np.ndarray, np.ndarray]:
+    """Component-wise point→segment distance and clamped projection parameter."""
+    abx = bx - ax
+    aby = by - ay
+    apx = px - ax
+    apy = py - ay
+    len2 = abx * abx + aby * aby
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = (apx * abx + apy * aby) / len2
+    t = np.where(len2 > 0, np.clip(t, 0.0, 1.0), 0.0)
+    dx = apx - t * abx
+    dy = apy - t * aby
+    return np.sqrt(dx * dx + dy * dy), t
+
+
+def project_to_segments(p: np.ndarray, a: np.ndarray, b: np.ndarray
+                        ) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance from each p to segment a→b (row-wise, broadcastable) and the clamped
+    projection parameter t ∈ [0, 1]."""
+    return _segment_distance(p[..., 0], p[..., 1], a[..., 0], a[..., 1], b[..., 0], b[..., 1])
+
+
+def _nearest_brute(p: np.ndarray, a: np.ndarray, b: np.ndarray
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = len(p)
+    dist = np.empty(n)
+    seg = np.empty(n, dtype=np.intp)
+    tpar = np.empty(n)
+    block = max(1, _BRUTE_FORCE_BLOCK // max(len(a), 1))
+    rows = np.arange(block)
+    for lo in range(0, n, block):
+        pp = p[lo:lo + block, None, :]
+        d, t = project_to_segments(pp, a[None], b[None])
+        k = d.argmin(axis=1)
+        r = rows[:len(k)]
+        dist[lo:lo + block] = d[r, k]
+        seg[lo:lo + block] = k
+        tpar[lo:lo + block] = t[r, k]
+    return dist, seg, tpar
+
+
+def _hilbert_keys(xy: np.ndarray, lo: np.ndarray, span: np.ndarray, bits: int = 16) -> np.ndarray:
+    """Position of each point along a Hilbert curve over the box lo + [0, span]."""
+    side = 1 << bits
+    q = np.clip(((xy - lo) / span * side).astype(np.int64), 0, side - 1)
+    x, y = q[:, 0].copy(), q[:, 1].copy()
+    d = np.zeros(len(xy), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotate the quadrant so the curve stays continuous.
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+    return d
+
+
+def _box_distance(px, py, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Distance from points to axis-aligned boxes (0 inside)."""
+    gx = np.maximum(np.maximum(lo[..., 0] - px, px - hi[..., 0]), 0.0)
+    gy = np.maximum(np.maximum(lo[..., 1] - py, py - hi[..., 1]), 0.0)
+    return np.sqrt(gx * gx + gy * gy)
+
+
+def _group_starts(sorted_keys: np.ndarray) -> np.ndarray:
+    """Indices where a new run of equal keys begins."""
+    if not len(sorted_keys):
+        return np.zeros(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+
+
+def _loosen(bound: np.ndarray) -> np.ndarray:
+    """Pad an upper bound so floating-point noise never prunes the true nearest box."""
+    return bound * (1 + 1e-12) + 1e-12
+
+
+def _segmented_argmin(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Offset of the first minimum within each run values[starts[i]:starts[i+1]]."""
+    counts = np.diff(np.append(starts, len(values)))
+    owner = np.repeat(np.arange(len(starts)), counts)
+    hit = np.flatnonzero(values == np.minimum.reduceat(values, starts)[owner])
+    hit = hit[_group_starts(owner[hit])]
+    return hit - starts
+
+
+def _ragged_arange(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(s, s + c) for every (s, c)."""
+    total = int(counts.sum())
+    return np.arange(total) - np.repeat(np.cumsum(counts) - counts - starts, counts)
+
+
+class SegmentTree:
+    """Packed bounding-box tree (Hilbert R-tree) over line segments.
+
+    Segments are sorted along a Hilbert curve and grouped *fanout* at a time;
+    each level groups the one below the same way, so every node is compact.
+
+    nearest() first bounds every query point by its exact distance to the
+    few segments next to it in Hilbert order (a tight bound for points near
+    the polyline), then walks all points down the tree together, one level
+    at a time, keeping only (point, node) pairs whose box distance is within
+    that bound.  Representative segments of the boxes visited tighten the
+    bound on the way down.
+    """
+
+    def __init__(self, starts, ends, fanout: int = 4, probe: int = 2):
+        a = as_xy(starts)
+        b = as_xy(ends)
+        seg_lo = np.minimum(a, b)
+        seg_hi = np.maximum(a, b)
+        centers = (seg_lo + seg_hi) / 2
+        self._frame = (centers.min(axis=0), np.maximum(np.ptp(centers, axis=0), 1e-12))
+        keys = _hilbert_keys(centers, *self._frame)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.seg_ids = order
+        self._ax, self._ay = a[order, 0].copy(), a[order, 1].copy()
+        self._bx, self._by = b[order, 0].copy(), b[order, 1].copy()
+        self.fanout = fanout
+        self.probe = probe
+
+        # levels[k] = (lo, hi, child_start, child_count, rep); level 0 is the root
+        # list, the last level's children are segments.
+        levels = []
+        lo, hi = seg_lo[order], seg_hi[order]
+        child_rep = np.arange(len(lo))
+        while True:
+            m = len(lo)
+            starts_ = np.arange(0, m, fanout)
+            counts_ = np.minimum(fanout, m - starts_)
+            node_lo = np.minimum.reduceat(lo, starts_, axis=0)
+            node_hi = np.maximum.reduceat(hi, starts_, axis=0)
+            # Middle segment of each node, for cheap exact upper bounds.
+            rep = child_rep[starts_ + counts_ // 2]
+            levels.append((node_lo, node_hi, starts_, counts_, rep))
+            if len(starts_) <= fanout:
+                break
+            lo, hi, child_rep = node_lo, node_hi, rep
+        self.levels = levels[::-1]
+
+    @classmethod
+    def from_polyline(cls, vertices, fanout: int = 4) -> "SegmentTree":
+        a, b = polyline_segments(vertices)
+        return cls(a, b, fanout)
+
+    def __len__(self) -> int:
+        return len(self.seg_ids)
+
+    def nearest(self, points, block: int = 16384) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """For each point: (distance, segment index, projection t on that segment)."""
+        p = as_xy(points)
+        n = len(p)
+        dist = np.empty(n)
+        seg = np.empty(n, dtype=np.intp)
+        tpar = np.empty(n)
+        for lo in range(0, n, block):
+            d, s, t = self._nearest_block(p[lo:lo + block])
+            dist[lo:lo + block], seg[lo:lo + block], tpar[lo:lo + block] = d, s, t
+        return dist, seg, tpar
+
+    def within(self, points, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Every (point, segment) pair closer than *radius*.
+
+        Returns (point index, segment index, distance, t), sorted by point
+        and then distance.  Walks the tree like nearest() with the fixed
+        bound *radius*, so a query costs O(log n + matches).
+        """
+        p = as_xy(points)
+        px, py = p[:, 0], p[:, 1]
+        roots = len(self.levels[0][0])
+        qi = np.repeat(np.arange(len(p)), roots)
+        node = np.tile(np.arange(roots), len(p))
+        for node_lo, node_hi, child_start, child_count, _ in self.levels:
+            keep = _box_distance(px[qi], py[qi], node_lo[node], node_hi[node]) <= radius
+            qi, node = qi[keep], node[keep]
+            counts = child_count[node]
+            node = _ragged_arange(child_start[node], counts)
+            qi = np.repeat(qi, counts)
+        d, t = _segment_distance(px[qi], py[qi], self._ax[node], self._ay[node],
+                                 self._bx[node], self._by[node])
+        keep = d <= radius
+        qi, seg, d, t = qi[keep], self.seg_ids[node[keep]], d[keep], t[keep]
+        order = np.lexsort((seg, d, qi))
+        return qi[order], seg[order], d[order], t[order]
+
+    def _upper_bound(self, px, py) -> np.ndarray:
+        """Exact distance to the segments adjacent to each point in Hilbert order."""
+        pos = np.searchsorted(self.keys, _hilbert_keys(np.column_stack((px, py)), *self._frame))
+        ub = np.full(len(px), np.inf)
+        last = len(self.keys) - 1
+        for off in range(-self.probe, self.probe):
+            r = np.clip(pos + off, 0, last)
+            d, _ = _segment_distance(px, py, self._ax[r], self._ay[r], self._bx[r], self._by[r])
+            np.minimum(ub, d, out=ub)
+        return ub
+
+    def _nearest_block(self, p: np.ndarray):
+        n = len(p)
+        px, py = p[:, 0], p[:, 1]
+        ax, ay, bx, by = self._ax, self._ay, self._bx, self._by
+        ub = _loosen(self._upper_bound(px, py))
+        roots = len(self.levels[0][0])
+        qi = np.repeat(np.arange(n), roots)
+        node = np.tile(np.arange(roots), n)
+        leaf_start = self.levels[-1][2]
+        for node_lo, node_hi, child_start, child_count, rep in self.levels:
+            qx, qy = px[qi], py[qi]
+            bd = _box_distance(qx, qy, node_lo[node], node_hi[node])
+            # Tighten each bound with representative segments: of the closest
+            # box on the way down, of every surviving box at the leaf level.
+            first = _group_starts(qi)
+            if child_start is leaf_start:
+                near = np.flatnonzero(bd <= ub[qi])
+                qi, node, bd, qx, qy = qi[near], node[near], bd[near], qx[near], qy[near]
+                first = _group_starts(qi)
+                r = rep[node]
+                d, _ = _segment_distance(qx, qy, ax[r], ay[r], bx[r], by[r])
+                owner = qi[first]
+                ub[owner] = np.minimum(ub[owner], _loosen(np.minimum.reduceat(d, first)))
+            else:
+                closest = first + _segmented_argmin(bd, first)
+                r = rep[node[closest]]
+                d, _ = _segment_distance(qx[closest], qy[closest], ax[r], ay[r], bx[r], by[r])
+                owner = qi[closest]
+                ub[owner] = np.minimum(ub[owner], _loosen(d))
+            keep = bd <= ub[qi]
+            qi, node = qi[keep], node[keep]
+            counts = child_count[node]
+            node = _ragged_arange(child_start[node], counts)
+            qi = np.repeat(qi, counts)
+
+        d, t = _segment_distance(px[qi], py[qi], ax[node], ay[node], bx[node], by[node])
+        # qi is sorted, so per-point minima are a segmented reduction.
+        first = _group_starts(qi)
+        best = np.minimum.reduceat(d, first)
+        owner = np.repeat(np.arange(len(first)), np.diff(np.append(first, len(qi))))
+        hit = np.flatnonzero(d == best[owner])
+        # First hit per point in original segment order (ties at shared vertices
+        # go to the lower index).
+        hit = hit[np.lexsort((self.seg_ids[node[hit]], qi[hit]))]
+        hit = hit[_group_starts(qi[hit])]
+        seg = np.zeros(n, dtype=np.intp)
+        tpar = np.zeros(n)
+        seg[qi[hit]] = self.seg_ids[node[hit]]
+        tpar[qi[hit]] = t[hit]
+        dist = np.zeros(n)
+        dist[qi[first]] = best
+        return dist, seg, tpar
+
+
+def segments_cross(p, q, a, b) -> np.ndarray:
+    """Row-wise: does segment p→q touch segment a→b?  Collinear pairs count as apart."""
+    def cross(ox, oy, ux, uy, vx, vy):
+        return (ux - ox) * (vy - oy) - (uy - oy) * (vx - ox)
+
+    px, py, qx, qy = p[:, 0], p[:, 1], q[:, 0], q[:, 1]
+    ax, ay, bx, by = a[:, 0], a[:, 1], b[:, 0], b[:, 1]
+    d1 = cross(ax, ay, bx, by, px, py)
+    d2 = cross(ax, ay, bx, by, qx, qy)
+    d3 = cross(px, py, qx, qy, ax, ay)
+    d4 = cross(px, py, qx, qy, bx, by)
+    return (d1 * d2 <= 0) & (d3 * d4 <= 0) & ((d1 != 0) | (d2 != 0))
+
+
+class SegmentGrid:
+    """Uniform grid of *cell*-sized buckets over line segments (walls).
+
+    Every segment is listed in each cell its bounding box overlaps (CSR
+    arrays, built once).  crossings() tests a batch of moves against the
+    segments in the cells of each move's bounding box: for moves shorter
+    than a cell that is at most four cells, so a batch costs O(moves)
+    whatever the number of segments.
+    """
+
+    def __init__(self, starts, ends, cell: float = 2.0):
+        self.a = as_xy(starts)
+        self.b = as_xy(ends)
+        self.cell = float(cell)
+        lo = np.minimum(self.a, self.b)
+        hi = np.maximum(self.a, self.b)
+        if len(lo):
+            self.origin = lo.min(axis=0)
+            self.shape = (np.floor((hi.max(axis=0) - self.origin) / self.cell) + 1).astype(np.intp)
+        else:
+            self.origin, self.shape = np.zeros(2), np.ones(2, dtype=np.intp)
+        owner, cells = self._cells(lo, hi)
+        order = np.argsort(cells, kind="stable")
+        self.seg_ids = owner[order]
+        self.cell_start = np.searchsorted(cells[order], np.arange(int(self.shape.prod()) + 1))
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    def _cells(self, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(box index, flat cell) for every grid cell each box [lo, hi] overlaps."""
+        c0 = np.clip(np.floor((lo - self.origin) / self.cell), 0, self.shape - 1).astype(np.intp)
+        c1 = np.clip(np.floor((hi - self.origin) / self.cell), 0, self.shape - 1).astype(np.intp)
+        nz = c1[:, 1] - c0[:, 1] + 1
+        counts = (c1[:, 0] - c0[:, 0] + 1) * nz
+        owner = np.repeat(np.arange(len(lo)), counts)
+        k = _ragged_arange(np.zeros(len(lo), dtype=np.intp), counts)
+        nz = nz[owner]
+        cells = (c0[owner, 0] + k // nz) * self.shape[1] + c0[owner, 1] + k % nz
+        return owner, cells
+
+    def crossings(self, p0, p1) -> np.ndarray:
+        """(n,) bool: does the move p0[i] → p1[i] cross any segment?"""
+        p0 = as_xy(p0)
+        p1 = as_xy(p1)
+        out = np.zeros(len(p0), dtype=bool)
+        if not len(self.a) or not len(p0):
+            return out
+        owner, cells = self._cells(np.minimum(p0, p1), np.maximum(p0, p1))
+        first = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - first
+        owner = np.repeat(owner, counts)
+        seg = self.seg_ids[_ragged_arange(first, counts)]
+        hit = segments_cross(p0[owner], p1[owner], self.a[seg], self.b[seg])
+        out[owner[hit]] = True
+        return out
+
+
+def nearest_on_polyline(points, vertices) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Exact nearest point on a polyline for every query point.
+
+    Returns (distance, segment index, t); uses a SegmentTree for long
+    polylines and a blocked brute-force scan otherwise.
+    """
+    a, b = polyline_segments(vertices)
+    return nearest_on_segments(points, a, b)
+
+
+def nearest_on_segments(points, starts, ends) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """nearest_on_polyline() for an arbitrary set of segments starts[i] → ends[i]."""
+    p = as_xy(points)
+    a = as_xy(starts)
+    b = as_xy(ends)
+    if len(a) >= INDEX_MIN_SEGMENTS:
+        return SegmentTree(a, b).nearest(p)
+    return _nearest_brute(p, a, b)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Binary sensor-stream files and a content-addressed stream cache.
+Usage:  python stream_cache.py convert sensors.csv out.pnav
+        python stream_cache.py info out.pnav
+
+File layout (little-endian):
+    magic "PNAVSTRM" | u32 schema | u32 meta_len | u64 n | meta JSON | pad to 64
+    timestamp  int64[n]
+    acc        float64[n, 3]
+    gyro       float64[n, 3]
+    mag        float64[n, 3]
+
+Each column is a contiguous block, so open_stream() maps them with np.memmap
+and hands them to SensorBatch without copying.  Mapped batches pickle as
+their file path, so process-pool workers share the same on-disk copy.
+"""
+
+import sys, os, argparse, copyreg, hashlib, inspect, json, struct
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pdr_engine import SensorBatch
+from path_simulator import SAMPLE_RATE
+
+MAGIC = b"PNAVSTRM"
+SCHEMA_VERSION = 1
+# Part of every cache key: streams drawn some other way must not be reused.
+RNG = "numpy.random.default_rng(seed)"
+SUFFIX = ".pnav"
+_PREFIX = struct.Struct("<8sIIQ")
+_ALIGN = 64
+# (name, dtype, columns per row)
+_COLUMNS = (("timestamp", np.dtype("<i8"), 1), ("acc", np.dtype("<f8"), 3),
+            ("gyro", np.dtype("<f8"), 3), ("mag", np.dtype("<f8"), 3))
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "results", ".stream_cache")
+
+
+def _layout(n: int, meta_len: int) -> Tuple[int, Dict[str, int]]:
+    """Return (file size, column offsets) for *n* samples."""
+    offset = -(-(_PREFIX.size + meta_len) // _ALIGN) * _ALIGN
+    offsets = {}
+    for name, dtype, width in _COLUMNS:
+        offsets[name] = offset
+        offset += n * width * dtype.itemsize
+    return offset, offsets
+
+
+def _read_header(path: str) -> Tuple[int, Dict[str, Any], Dict[str, int]]:
+    with open(path, "rb") as f:
+        magic, schema, meta_len, n = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a sensor stream file")
+        if schema != SCHEMA_VERSION:
+            raise ValueError(f"{path}: schema {schema}, expected {SCHEMA_VERSION}")
+        meta = json.loads(f.read(meta_len))
+    return n, meta, _layout(n, meta_len)[1]
+
+
+def create_stream(path: str, n: int, meta: Optional[Dict[str, Any]] = None) -> SensorBatch:
+    """Allocate a stream file for *n* samples; returns a writable mapped batch to fill."""
+    meta = dict(meta or {})
+    meta.setdefault("sample_rate", SAMPLE_RATE)
+    raw = json.dumps(meta, sort_keys=True).encode()
+    size, offsets = _layout(n, len(raw))
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, SCHEMA_VERSION, len(raw), n))
+        f.write(raw)
+        f.truncate(size)
+    return _map(path, n, offsets, "r+")
+
+
+def _map(path: str, n: int, offsets: Dict[str, int], mode: str) -> SensorBatch:
+    cols = {}
+    for name, dtype, width in _COLUMNS:
+        shape = (n,) if width == 1 else (n, width)
+        cols[name] = np.memmap(path, dtype=dtype, mode=mode, offset=offsets[name], shape=shape) \
+            if n else np.empty(shape, dtype)
+    return SensorBatch(cols["timestamp"], cols["acc"], cols["gyro"], cols["mag"], source=path)
+
+
+def save_stream(path: str, batch: SensorBatch, meta: Optional[Dict[str, Any]] = None):
+    """Write *batch* atomically (temp file + rename)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    out = create_stream(tmp, len(batch), meta)
+    if len(batch):
+        out.timestamp[:] = batch.timestamp
+        out.acc[:] = batch.acc
+        out.gyro[:] = batch.gyro
+        out.mag[:] = batch.mag
+    del out
+    os.replace(tmp, path)
+
+
+def open_stream(path: str) -> SensorBatch:
+    """Memory-map a stream file read-only."""
+    n, _, offsets = _read_header(path)
+    return _map(path, n, offsets, "r")
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    return _read_header(path)[1]
+
+
+def _reduce_batch(batch: SensorBatch):
+    if batch.source is not None:
+        return open_stream, (batch.source,)
+    return batch.__reduce_ex__(4)
+
+
+copyreg.pickle(SensorBatch, _reduce_batch)
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed cache
+# ---------------------------------------------------------------------------
+
+def seed_key(seed) -> Any:
+    if isinstance(seed, np.random.SeedSequence):
+        return {"entropy": str(seed.entropy), "spawn_key": list(seed.spawn_key)}
+    return seed
+
+
+def _arg_key(value) -> Any:
+    """JSON form of a generator argument; a NoiseModel goes by its spec."""
+    to_spec = getattr(value, "to_spec", None)
+    return to_spec() if callable(to_spec) else value
+
+
+def source_digest(fn: Callable) -> str:
+    try:
+        with open(inspect.getsourcefile(fn), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (TypeError, OSError):
+        return ""
+
+
+class StreamCache:
+    """Generated streams keyed on (generator, its source, args, kwargs, seed).
+
+    The first request runs the generator and writes a stream file; every
+    later request with the same key — in this or any other process — maps it.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, generator: Callable, args: Sequence = (), kwargs: Optional[Dict] = None,
+            seed=None) -> Tuple[str, Dict[str, Any]]:
+        spec = {
+            "generator": f"{generator.__module__}.{generator.__qualname__}",
+            "source_sha256": source_digest(generator),
+            "args": [_arg_key(a) for a in args],
+            "kwargs": {k: _arg_key(v) for k, v in (kwargs or {}).items()},
+            "seed": seed_key(seed),
+            "rng": RNG,
+            "schema": SCHEMA_VERSION,
+        }
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+        return digest, spec
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + SUFFIX)
+
+    def get_or_generate(self, generator: Callable, args: Sequence = (),
+                        kwargs: Optional[Dict] = None, seed=None
+                        ) -> Tuple[SensorBatch, List[Tuple[float, float]]]:
+        """Return (mapped batch, ground truth), generating on a cache miss.
+
+        *generator* takes an ``rng`` keyword; a miss draws from
+        np.random.default_rng(*seed*).  Without a seed the stream is not
+        reproducible, so it is generated fresh and never cached.
+        """
+        if seed is None:
+            return generator(*args, rng=np.random.default_rng(), **(kwargs or {}))
+        key, spec = self.key(generator, args, kwargs, seed)
+        path = self.path(key)
+        if not os.path.exists(path):
+            batch, gt = generator(*args, rng=np.random.default_rng(seed), **(kwargs or {}))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            save_stream(path, batch, dict(spec, ground_truth=[list(p) for p in gt],
+                                          sample_rate=(kwargs or {}).get("rate", SAMPLE_RATE)))
+        meta = read_meta(path)
+        return open_stream(path), [tuple(p) for p in meta["ground_truth"]]
+
+    def clear(self):
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(SUFFIX):
+                    os.remove(os.path.join(dirpath, name))
+
+
+def convert_csv(csv_path: str, out_path: str, chunk_rows: int = 65536):
+    """Parse a DataExporter sensor CSV into a stream file (flat memory).
+
+    The CSV is parsed twice: once to count the rows the parser actually
+    yields (blank lines and a missing final newline make line counts wrong),
+    once to fill the columns.
+    """
+    from replay import read_sensor_csv
+
+    n = sum(len(chunk.batch) for chunk in read_sensor_csv(csv_path, chunk_rows))
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        out = create_stream(tmp, n, {"source_csv": os.path.basename(csv_path)})
+        pos = 0
+        for chunk in read_sensor_csv(csv_path, chunk_rows):
+            b = chunk.batch
+            hi = pos + len(b)
+            out.timestamp[pos:hi] = b.timestamp
+            out.acc[pos:hi] = b.acc
+            out.gyro[pos:hi] = b.gyro
+            out.mag[pos:hi] = b.mag
+            pos = hi
+        if pos != n:
+            raise ValueError(f"{csv_path}: changed while converting ({pos} rows, expected {n})")
+        del out
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sensor stream files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="CSV -> stream file")
+    c.add_argument("csv")
+    c.add_argument("out")
+    i = sub.add_parser("info", help="print header")
+    i.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "convert":
+        convert_csv(args.csv, args.out)
+        print(f"{args.out}: {len(open_stream(args.out))} samples")
+    else:
+        n, meta, _ = _read_header(args.path)
+        print(json.dumps(dict(meta, samples=n), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@ Validator — compares PDR output trajectory against ground truth.
 """
 
 import math
-from typing import List, Tuple
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
 from dataclasses import dataclass
 
+from spatial_index import as_xy, nearest_on_polyline, nearest_on_segments
+
 
 @dataclass
 class ValidationResult:
@@ -19,6 +22,16 @@ class ValidationResult:
     passed: bool
     threshold: float
     metric_name: str
+    rms_error: float = 0.0
+    # Endpoint error split along / across the final ground-truth leg
+    # (along > 0: overshoot; cross > 0: left of the direction of travel).
+    endpoint_along_track: float = 0.0
+    endpoint_cross_track: float = 0.0
+    # Time-aligned errors, only when both trajectories carry timestamps.
+    time_max_error: Optional[float] = None
+    time_avg_error: Optional[float] = None
+    along_track_rms: Optional[float] = None
+    cross_track_rms: Optional[float] = None
 
     def report(self) -> str:
         status = "✅ PASS" if self.passed else "❌ FAIL"
@@ -28,13 +41,22 @@ class ValidationResult:
             f"  Closure error  : {self.closure_error:.2f} m",
             f"  Max error      : {self.max_error:.2f} m",
             f"  Avg error      : {self.avg_error:.2f} m",
+            f"  RMS error      : {self.rms_error:.2f} m",
+            f"  Endpoint a/x   : {self.endpoint_along_track:+.2f} / {self.endpoint_cross_track:+.2f} m",
+        ]
+        if self.time_max_error is not None:
+            lines += [
+                f"  Timed max/avg  : {self.time_max_error:.2f} / {self.time_avg_error:.2f} m",
+                f"  Timed a/x RMS  : {self.along_track_rms:.2f} / {self.cross_track_rms:.2f} m",
+            ]
+        lines += [
             f"  Steps (PDR)    : {self.step_count_pdr}",
             f"  Steps (expect) : {self.expected_steps}",
-            f"  Metric         : {self.metric_name} = {self._metric_value():.2f} (threshold {self.threshold:.2f})",
+            f"  Metric         : {self.metric_name} = {self.metric_value():.2f} (threshold {self.threshold:.2f})",
         ]
         return "\n".join(lines)
 
-    def _metric_value(self):
+    def metric_value(self) -> float:
         if "closure" in self.metric_name.lower():
             return self.closure_error
         if "drift" in self.metric_name.lower():
@@ -46,33 +68,104 @@ def _dist(a: Tuple[float, float], b: Tuple[float, float]) -> float:
     return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2)
 
 
+def _leg_directions(gt: np.ndarray) -> np.ndarray:
+    """Unit direction of each ground-truth segment.
+
+    Zero-length segments (standing still) take the direction of the last
+    moving segment before them, or the first one after; with no movement at
+    all the directions are zero.
+    """
+    d = np.diff(gt, axis=0)
+    length = np.hypot(d[:, 0], d[:, 1])
+    moving = np.flatnonzero(length > 0)
+    if not len(moving):
+        return np.zeros_like(d)
+    idx = np.where(length > 0, np.arange(len(d)), -1)
+    idx = np.maximum.accumulate(idx)
+    idx[idx < 0] = moving[0]
+    return d[idx] / length[idx, None]
+
+
+def along_cross(errors: np.ndarray, directions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split error vectors into along-track and (signed, left-positive) cross-track parts."""
+    along = errors[:, 0] * directions[:, 0] + errors[:, 1] * directions[:, 1]
+    cross = directions[:, 0] * errors[:, 1] - directions[:, 1] * errors[:, 0]
+    return along, cross
+
+
+def path_errors(pdr_trajectory, ground_truth) -> np.ndarray:
+    """Distance from every PDR point to the ground-truth polyline (exact, per segment)."""
+    return nearest_on_polyline(pdr_trajectory, ground_truth)[0]
+
+
+def time_aligned_errors(pdr_trajectory, pdr_timestamps: Sequence[int],
+                        ground_truth, gt_timestamps: Sequence[int]
+                        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(distance, along-track, cross-track) error of each PDR point against the
+    ground-truth position at the same time (linear interpolation, clamped at
+    both ends)."""
+    p = as_xy(pdr_trajectory)
+    gt = as_xy(ground_truth)
+    t = np.asarray(pdr_timestamps, dtype=np.float64)
+    gt_t = np.asarray(gt_timestamps, dtype=np.float64)
+    ref = np.column_stack((np.interp(t, gt_t, gt[:, 0]), np.interp(t, gt_t, gt[:, 1])))
+    err = p - ref
+    if len(gt) < 2:
+        return np.hypot(err[:, 0], err[:, 1]), np.zeros(len(p)), np.hypot(err[:, 0], err[:, 1])
+    leg = np.clip(np.searchsorted(gt_t, t, side="right") - 1, 0, len(gt) - 2)
+    along, cross = along_cross(err, _leg_directions(gt)[leg])
+    return np.hypot(err[:, 0], err[:, 1]), along, cross
+
+
+def _rms(x: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(x * x))) if len(x) else 0.0
+
+
 def validate(scenario: str,
              pdr_trajectory: List[Tuple[float, float]],
              ground_truth: List[Tuple[float, float]],
              step_count: int,
              total_distance: float,
              threshold: float,
-             metric_name: str = "endpoint_error") -> ValidationResult:
-    """Evaluate PDR trajectory vs ground truth."""
+             metric_name: str = "endpoint_error",
+             pdr_timestamps: Optional[Sequence[int]] = None,
+             gt_timestamps: Optional[Sequence[int]] = None) -> ValidationResult:
+    """Evaluate PDR trajectory vs ground truth.
+
+    max/avg/rms error are distances to the ground-truth polyline (nearest
+    point on any segment).  With *pdr_timestamps* (one per trajectory point)
+    and *gt_timestamps* (one per ground-truth vertex), errors against the
+    time-interpolated ground-truth position are reported as well.
+    """
 
-    if not pdr_trajectory:
+    if not len(pdr_trajectory):
         pdr_trajectory = [(0, 0)]
 
-    pdr_end = pdr_trajectory[-1]
-    gt_end = ground_truth[-1]
-    gt_start = ground_truth[0]
+    pdr_end = tuple(pdr_trajectory[-1])
+    gt_end = tuple(ground_truth[-1])
+    gt_start = tuple(ground_truth[0])
 
     endpoint_error = _dist(pdr_end, gt_end)
     closure_error = _dist(pdr_end, gt_start) if gt_start == gt_end else endpoint_error
 
-    # Approximate max/avg error by interpolating GT as segments
-    errors = []
-    for pt in pdr_trajectory:
-        min_d = min(_dist(pt, gp) for gp in ground_truth)
-        errors.append(min_d)
+    errors = path_errors(pdr_trajectory, ground_truth)
+    max_error = float(errors.max())
+    avg_error = float(errors.mean())
 
-    max_error = max(errors) if errors else 0
-    avg_error = sum(errors) / len(errors) if errors else 0
+    gt = as_xy(ground_truth)
+    end_err = np.array([[pdr_end[0] - gt_end[0], pdr_end[1] - gt_end[1]]])
+    if len(gt) >= 2:
+        along, cross = along_cross(end_err, _leg_directions(gt)[-1:])
+        end_along, end_cross = float(along[0]), float(cross[0])
+    else:
+        end_along, end_cross = 0.0, endpoint_error
+
+    timed = {}
+    if pdr_timestamps is not None and gt_timestamps is not None:
+        dist, along, cross = time_aligned_errors(pdr_trajectory, pdr_timestamps,
+                                                 ground_truth, gt_timestamps)
+        timed = dict(time_max_error=float(dist.max()), time_avg_error=float(dist.mean()),
+                     along_track_rms=_rms(along), cross_track_rms=_rms(cross))
 
     expected_steps = int(total_distance / 0.7)
 
@@ -96,4 +189,159 @@ def validate(scenario: str,
         passed=passed,
         threshold=threshold,
         metric_name=metric_name,
+        rms_error=_rms(errors),
+        endpoint_along_track=end_along,
+        endpoint_cross_track=end_cross,
+        **timed,
     )
+
+
+@dataclass
+class MatchComparison:
+    """A raw PDR trajectory and its map-matched version, scored alike."""
+    raw: ValidationResult
+    matched: ValidationResult
+
+    def report(self) -> str:
+        r, m = self.raw, self.matched
+        status = "✅ PASS" if m.passed else "❌ FAIL"
+        rows = [("Endpoint error", r.endpoint_error, m.endpoint_error),
+                ("Closure error", r.closure_error, m.closure_error),
+                ("Max error", r.max_error, m.max_error),
+                ("Avg error", r.avg_error, m.avg_error),
+                ("RMS error", r.rms_error, m.rms_error),
+                (m.metric_name, r.metric_value(), m.metric_value())]
+        lines = [f"=== {m.scenario} — raw vs map-matched {status} ===",
+                 f"  {'':<15}{'raw':>9}{'matched':>10}"]
+        lines += [f"  {name:<15}{a:>7.2f} m{b:>8.2f} m" for name, a, b in rows]
+        lines.append(f"  Threshold      : {m.threshold:.2f} m (raw {'passes' if r.passed else 'fails'})")
+        return "\n".join(lines)
+
+
+def validate_matched(scenario: str,
+                     pdr_trajectory: List[Tuple[float, float]],
+                     matched_trajectory: List[Tuple[float, float]],
+                     ground_truth: List[Tuple[float, float]],
+                     step_count: int,
+                     total_distance: float,
+                     threshold: float,
+                     metric_name: str = "endpoint_error") -> MatchComparison:
+    """validate() both the raw and the map-matched trajectory against the same ground truth."""
+    args = (ground_truth, step_count, total_distance, threshold, metric_name)
+    return MatchComparison(validate(scenario, pdr_trajectory, *args),
+                           validate(scenario, matched_trajectory, *args))
+
+
+class StreamingValidator:
+    """validate() for streams too long to keep in memory (soak tests).
+
+    Feed ground-truth vertices and new trajectory points chunk by chunk
+    (e.g. from path_simulator's *_stream generators), then call result().
+    Memory is bounded by the number of *distinct* ground-truth segments, so
+    a loop walked for hours costs the same as one lap.  Trajectory points
+    are scored one chunk late, against all ground truth seen up to then;
+    this equals validate() unless the path later passes closer to an
+    earlier point than anything walked so far.  No time-aligned errors.
+    """
+
+    def __init__(self, scenario: str, threshold: float, metric_name: str = "endpoint_error",
+                 total_distance: Optional[float] = None):
+        self.scenario = scenario
+        self.threshold = threshold
+        self.metric_name = metric_name
+        self.total_distance = total_distance
+        self.gt_start: Optional[Tuple[float, float]] = None
+        self.gt_end: Optional[Tuple[float, float]] = None
+        self.gt_distance = 0.0
+        self._direction = np.zeros(2)
+        self._segments: dict = {}
+        self._starts = np.empty((0, 2))
+        self._ends = np.empty((0, 2))
+        self._pending: List[np.ndarray] = []
+        self.pdr_end: Optional[Tuple[float, float]] = None
+        self.points = 0
+        self._max = 0.0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add_ground_truth(self, vertices: Sequence[Tuple[float, float]]):
+        added = False
+        for v in vertices:
+            v = (float(v[0]), float(v[1]))
+            if self.gt_start is None:
+                self.gt_start = v
+            prev = self.gt_end if self.gt_end is not None else v
+            key = prev + v
+            if key not in self._segments:
+                self._segments[key] = len(self._segments)
+                added = True
+            d = _dist(prev, v)
+            if d > 0:
+                self._direction = np.array([v[0] - prev[0], v[1] - prev[1]]) / d
+            self.gt_distance += d
+            self.gt_end = v
+        if added:
+            seg = np.array(list(self._segments), dtype=np.float64).reshape(-1, 4)
+            self._starts, self._ends = seg[:, :2], seg[:, 2:]
+
+    def add_trajectory(self, points: Sequence[Tuple[float, float]]):
+        p = np.array(points, dtype=np.float64).reshape(-1, 2)  # copy: callers may reuse the buffer
+        if not len(p):
+            return
+        self.pdr_end = (float(p[-1, 0]), float(p[-1, 1]))
+        self._score()
+        self._pending.append(p)
+
+    def _score(self):
+        if not self._pending or self.gt_end is None:
+            return
+        p = np.concatenate(self._pending)
+        self._pending = []
+        errors = nearest_on_segments(p, self._starts, self._ends)[0]
+        self.points += len(errors)
+        self._max = max(self._max, float(errors.max()))
+        self._sum += float(errors.sum())
+        self._sum_sq += float(np.dot(errors, errors))
+
+    def result(self, step_count: int) -> ValidationResult:
+        if self.gt_end is None:
+            raise ValueError("no ground truth was added")
+        if self.pdr_end is None:
+            self.add_trajectory([(0, 0)])
+        self._score()
+        pdr_end, gt_end, gt_start = self.pdr_end, self.gt_end, self.gt_start
+
+        endpoint_error = _dist(pdr_end, gt_end)
+        closure_error = _dist(pdr_end, gt_start) if gt_start == gt_end else endpoint_error
+        if self.gt_distance > 0:
+            d = self._direction
+            end_err = np.array([[pdr_end[0] - gt_end[0], pdr_end[1] - gt_end[1]]])
+            along, cross = along_cross(end_err, d[None, :])
+            end_along, end_cross = float(along[0]), float(cross[0])
+        else:
+            end_along, end_cross = 0.0, endpoint_error
+
+        total = self.gt_distance if self.total_distance is None else self.total_distance
+        if "closure" in self.metric_name.lower():
+            val = closure_error
+        elif "drift" in self.metric_name.lower():
+            val = _dist(pdr_end, (0, 0))
+        else:
+            val = endpoint_error
+
+        n = max(self.points, 1)
+        return ValidationResult(
+            scenario=self.scenario,
+            endpoint_error=endpoint_error,
+            closure_error=closure_error,
+            max_error=self._max,
+            avg_error=self._sum / n,
+            step_count_pdr=step_count,
+            expected_steps=int(total / 0.7),
+            passed=val < self.threshold,
+            threshold=self.threshold,
+            metric_name=self.metric_name,
+            rms_error=math.sqrt(self._sum_sq / n),
+            endpoint_along_track=end_along,
+            endpoint_cross_track=end_cross,
+        )
@@ -1,15 +1,28 @@
 """
 Visualizer — matplotlib plots for PDR vs ground truth.
+
+matplotlib is imported, and the results directory created, on the first
+plot, so importing this module stays cheap for headless runs.
 """
 
 import os
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import numpy as np
 from typing import List, Tuple
 
 RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
-os.makedirs(RESULTS_DIR, exist_ok=True)
+
+
+def pyplot():
+    """matplotlib.pyplot on the non-interactive Agg backend, imported on first use."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_path(scenario: str, filename: str | None = None) -> str:
+    """Where plot_trajectory() saves the plot of *scenario*."""
+    return os.path.join(RESULTS_DIR, filename or scenario.replace(" ", "_").replace("/", "_") + ".png")
 
 
 def plot_trajectory(scenario: str,
@@ -17,22 +30,21 @@ def plot_trajectory(scenario: str,
                     gt_points: List[Tuple[float, float]],
                     endpoint_error: float,
                     filename: str | None = None):
+    plt = pyplot()
     fig, ax = plt.subplots(1, 1, figsize=(8, 8))
 
     # Ground truth
-    gx = [p[0] for p in gt_points]
-    gy = [p[1] for p in gt_points]
-    ax.plot(gx, gy, "g-o", linewidth=2, markersize=6, label="Ground Truth")
+    g = np.asarray(gt_points, dtype=np.float64).reshape(-1, 2)
+    ax.plot(g[:, 0], g[:, 1], "g-o", linewidth=2, markersize=6, label="Ground Truth")
 
-    # PDR trajectory
-    px = [p[0] for p in pdr_traj]
-    py = [p[1] for p in pdr_traj]
-    ax.plot(px, py, "r-", linewidth=1, alpha=0.8, label="PDR Estimate")
+    # PDR trajectory (a list of points or an (n, 2) array such as PDREngine.trajectory_array)
+    p = np.asarray(pdr_traj, dtype=np.float64).reshape(-1, 2)
+    ax.plot(p[:, 0], p[:, 1], "r-", linewidth=1, alpha=0.8, label="PDR Estimate")
 
     # Markers
-    ax.plot(px[0], py[0], "bs", markersize=10, label="Start")
-    ax.plot(px[-1], py[-1], "r^", markersize=10, label="PDR End")
-    ax.plot(gx[-1], gy[-1], "gD", markersize=10, label="GT End")
+    ax.plot(p[0, 0], p[0, 1], "bs", markersize=10, label="Start")
+    ax.plot(p[-1, 0], p[-1, 1], "r^", markersize=10, label="PDR End")
+    ax.plot(g[-1, 0], g[-1, 1], "gD", markersize=10, label="GT End")
 
     ax.set_title(f"{scenario}\nEndpoint Error: {endpoint_error:.2f} m")
     ax.set_xlabel("X (East) [m]")
@@ -41,8 +53,8 @@ def plot_trajectory(scenario: str,
     ax.set_aspect("equal")
     ax.grid(True, alpha=0.3)
 
-    fname = filename or scenario.replace(" ", "_").replace("/", "_") + ".png"
-    path = os.path.join(RESULTS_DIR, fname)
+    path = plot_path(scenario, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
     fig.savefig(path, dpi=100, bbox_inches="tight")
     plt.close(fig)
     return path